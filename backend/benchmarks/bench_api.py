@@ -0,0 +1,353 @@
+"""Carga na API completa (uvicorn + FastAPI) contra o PostgREST falso.
+
+Sobe o PostgREST falso e o backend em processos separados e dispara cenários
+realistas com concorrência configurável. Para cada cenário mostra vazão,
+latência p50/p95/p99, respostas com erro e chamadas ao Supabase por requisição.
+
+    python -m benchmarks.bench_api                                  # todos os cenários
+    python -m benchmarks.bench_api --scenarios list,crud --concurrency 50 --latency 0.05
+    python -m benchmarks.bench_api --scenarios import-10k,import-100k
+    python -m benchmarks.bench_api --scenarios export-csv --seed 200000   # memória do backend no download
+    python -m benchmarks.bench_api --save base.json                 # antes da mudança
+    python -m benchmarks.bench_api --baseline base.json             # depois: falha se regredir
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks.bench_startup import _memory
+from benchmarks.fake_postgrest import start_server_process, seed_rows, call_stats, reset_stats
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEADERS = {"Authorization": "Bearer bench-token"}
+CATEGORIAS = ["Bebidas", "Mercearia", "Limpeza", "Higiene", "Padaria"]
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def _product(i: int) -> dict:
+    return {"nome": f"Produto {i}", "preco": round(5 + (i % 200) * 1.5, 2), "estoque": i % 100,
+            "categoria": CATEGORIAS[i % len(CATEGORIAS)], "descricao": f"Descrição {i}", "tags": ["bench"]}
+
+
+def _import_csv(rows: int, offset: int) -> bytes:
+    # Metade das linhas já existe no banco (atualização), metade é nova
+    out = io.StringIO()
+    out.write("nome;categoria;descricao;tags;preco;estoque\n")
+    for i in range(offset, offset + rows):
+        preco = f"{(5 + i % 300) * 1.25:.2f}".replace(".", ",")
+        out.write(f"Produto {i};{CATEGORIAS[i % len(CATEGORIAS)]};Descrição {i};bench, csv;{preco};{i % 50}\n")
+    return out.getvalue().encode("utf-8")
+
+
+class Scenario:
+    """Um cenário: `step` faz uma "iteração" de usuário e devolve [(operação, status, segundos)]"""
+
+    def __init__(self, name: str, iterations: int, concurrency: int):
+        self.name = name
+        self.iterations = iterations
+        self.concurrency = concurrency
+
+    async def setup(self, client: httpx.AsyncClient):
+        pass
+
+    async def step(self, client: httpx.AsyncClient, i: int):
+        raise NotImplementedError
+
+
+async def _timed(client: httpx.AsyncClient, operation: str, method: str, url: str, **kwargs):
+    started = time.perf_counter()
+    response = await client.request(method, url, headers=HEADERS, **kwargs)
+    return response, (operation, response.status_code, time.perf_counter() - started)
+
+
+class ListScenario(Scenario):
+    """Listagens paginadas com filtros variados (parte delas repetidas: exercita o cache e o 304)"""
+
+    async def step(self, client, i):
+        rng = random.Random(i)
+        params = {"limit": rng.choice([20, 50, 100]), "order_by": rng.choice(["id", "name", "price"]),
+                  "direction": rng.choice(["asc", "desc"])}
+        if rng.random() < 0.4:
+            params["categoria"] = rng.choice(CATEGORIAS)
+        if rng.random() < 0.2:
+            params["q"] = f"Produto {rng.randint(1, 99)}"
+        response, sample = await _timed(client, "list", "GET", "/products/", params=params)
+        samples = [sample]
+
+        # Um terço dos clientes segue para a próxima página
+        cursor = response.json().get("next_cursor") if response.status_code == 200 else None
+        if cursor and rng.random() < 0.33:
+            _, sample = await _timed(client, "list-next", "GET", "/products/", params=dict(params, cursor=cursor))
+            samples.append(sample)
+        return samples
+
+
+class CrudScenario(Scenario):
+    """Ciclo de vida de um produto: cria, ajusta estoque, atualiza, lista e remove"""
+
+    async def step(self, client, i):
+        samples = []
+        product = _product(10_000_000 + i)
+        product["nome"] = f"CRUD {i} {random.random():.6f}"
+        response, sample = await _timed(client, "create", "POST", "/products/", json=product)
+        samples.append(sample)
+        if response.status_code != 200 or not response.json():
+            return samples
+        product_id = response.json()[0]["id"]
+
+        _, sample = await _timed(client, "patch", "PATCH", f"/products/{product_id}", json={"estoque_delta": -1})
+        samples.append(sample)
+        _, sample = await _timed(client, "update", "PUT", f"/products/{product_id}",
+                                 json=dict(product, preco=product["preco"] + 1))
+        samples.append(sample)
+        _, sample = await _timed(client, "list", "GET", "/products/", params={"limit": 20, "q": product["nome"]})
+        samples.append(sample)
+        _, sample = await _timed(client, "delete", "DELETE", f"/products/{product_id}")
+        samples.append(sample)
+        return samples
+
+
+class ImportScenario(Scenario):
+    """Upload síncrono de um CSV com `rows` linhas (metade atualização, metade criação)"""
+
+    def __init__(self, name: str, rows: int, seeded: int):
+        super().__init__(name, iterations=1, concurrency=1)
+        self.rows = rows
+        self.content = _import_csv(rows, offset=max(seeded - rows // 2, 0))
+
+    async def step(self, client, i):
+        files = {"file": ("bench.csv", self.content, "text/csv")}
+        response, sample = await _timed(client, "upload", "POST", "/products/upload/", files=files, timeout=None)
+        if response.status_code == 200:
+            details = response.json()["details"]
+            print(f"    {details['rows']} linhas: {details['created']} criadas, {details['updated']} atualizadas, "
+                  f"{details['unchanged']} iguais, {details['errors']} erros, {details['round_trips']} chamadas")
+        return [sample]
+
+
+class ExportScenario(Scenario):
+    """Downloads simultâneos do catálogo inteiro (GET /products/export), lidos em streaming.
+
+    Ao final mostra o tamanho de cada arquivo e a memória do backend: com a exportação
+    por páginas o RSS não deve acompanhar o tamanho do catálogo (--seed).
+    """
+
+    def __init__(self, name: str, fmt: str, backend_pid: int, downloads: int = 4):
+        super().__init__(name, iterations=downloads, concurrency=downloads)
+        self.fmt = fmt
+        self.backend_pid = backend_pid
+        self.finished = 0
+
+    async def setup(self, client):
+        self.rss_before = sum(rss for _, rss, _ in _memory(self.backend_pid))
+
+    async def step(self, client, i):
+        started = time.perf_counter()
+        lines = size = 0
+        async with client.stream("GET", "/products/export", params={"format": self.fmt},
+                                 headers=HEADERS, timeout=None) as response:
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                lines += chunk.count(b"\n")
+        self.finished += 1
+        if self.finished == self.iterations:
+            rss_after = sum(rss for _, rss, _ in _memory(self.backend_pid))
+            print(f"    {lines} linhas, {size / 1e6:.1f} MB por download; RSS do backend "
+                  f"{self.rss_before / 1024:.0f} MB -> {rss_after / 1024:.0f} MB")
+        return [("export", response.status_code, time.perf_counter() - started)]
+
+
+def _errors_by_operation(samples) -> dict:
+    errors = {}
+    for operation, status, _ in samples:
+        if status >= 400:
+            key = f"{operation} {status}"
+            errors[key] = errors.get(key, 0) + 1
+    return errors
+
+
+async def run_scenario(scenario: Scenario, api_url: str, supabase_url: str) -> dict:
+    limits = httpx.Limits(max_connections=scenario.concurrency, max_keepalive_connections=scenario.concurrency)
+    async with httpx.AsyncClient(base_url=api_url, limits=limits, timeout=60) as client:
+        await scenario.setup(client)
+        reset_stats(supabase_url)
+
+        semaphore = asyncio.Semaphore(scenario.concurrency)
+        samples = []
+
+        async def one(i):
+            async with semaphore:
+                samples.extend(await scenario.step(client, i))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(scenario.iterations)))
+        elapsed = time.perf_counter() - started
+
+    calls = call_stats(supabase_url)
+    latencies = sorted(s[2] for s in samples)
+    by_operation = {}
+    for operation, _, seconds in samples:
+        by_operation.setdefault(operation, []).append(seconds)
+
+    return {
+        "scenario": scenario.name,
+        "requests": len(samples),
+        "errors": sum(1 for _, status, _ in samples if status >= 400),
+        "errors_by_operation": _errors_by_operation(samples),
+        "elapsed_s": round(elapsed, 3),
+        "req_per_s": round(len(samples) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "operations": {op: round(_percentile(sorted(v), 0.50) * 1000, 2) for op, v in by_operation.items()},
+        "supabase_calls": sum(calls.values()),
+        "supabase_calls_per_request": round(sum(calls.values()) / max(len(samples), 1), 2),
+        "supabase_calls_by_route": calls,
+    }
+
+
+def _print_result(result: dict):
+    print(f"{result['scenario']:<12} {result['requests']:>6} req  {result['req_per_s']:>8.1f} req/s   "
+          f"p50 {result['p50_ms']:>8.1f} ms  p95 {result['p95_ms']:>8.1f} ms  p99 {result['p99_ms']:>8.1f} ms   "
+          f"erros {result['errors']:>4}   supabase {result['supabase_calls']:>6} "
+          f"({result['supabase_calls_per_request']}/req)")
+    operations = "  ".join(f"{op} {ms:.1f} ms" for op, ms in result["operations"].items())
+    print(f"{'':<12} p50 por operação: {operations}")
+    if result["errors_by_operation"]:
+        errors = "  ".join(f"{key}: {count}" for key, count in result["errors_by_operation"].items())
+        print(f"{'':<12} erros: {errors}")
+
+
+def _compare(results, baseline_path: str, tolerance: float) -> bool:
+    """Compara com uma execução salva; True se algum cenário regrediu além da tolerância"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["scenario"]: r for r in json.load(f)}
+
+    regressed = False
+    print(f"\nComparação com {baseline_path} (tolerância {tolerance:.0%}):")
+    for result in results:
+        base = baseline.get(result["scenario"])
+        if not base:
+            continue
+        checks = [
+            ("req/s", base["req_per_s"], result["req_per_s"], result["req_per_s"] < base["req_per_s"] * (1 - tolerance)),
+            ("p95", base["p95_ms"], result["p95_ms"], result["p95_ms"] > base["p95_ms"] * (1 + tolerance)),
+            ("supabase/req", base["supabase_calls_per_request"], result["supabase_calls_per_request"],
+             result["supabase_calls_per_request"] > base["supabase_calls_per_request"] * (1 + tolerance)),
+        ]
+        for label, before, after, worse in checks:
+            flag = "REGRESSÃO" if worse else "ok"
+            print(f"  {result['scenario']:<12} {label:<13} {before:>10} -> {after:<10} {flag}")
+            regressed = regressed or worse
+    return regressed
+
+
+def _wait_port(host: str, port: int, proc: subprocess.Popen):
+    for _ in range(200):
+        if proc.poll() is not None:
+            raise RuntimeError("backend encerrou durante a inicialização")
+        try:
+            with socket.create_connection((host, port), timeout=0.1):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("backend não iniciou")
+
+
+def start_backend(supabase_url: str, port: int, args) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "SUPABASE_URL": supabase_url,
+        "SUPABASE_KEY": "bench",
+        # Rate limit alto: medimos a API, não o bloqueio
+        "RATE_LIMIT_READ": "100000000/minute",
+        "RATE_LIMIT_WRITE": "100000000/minute",
+        "CACHE_BACKEND": args.cache,
+        "AUTH_VERIFY_MODE": "remote",
+    })
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                             "--log-level", "warning", "--workers", str(args.workers)],
+                            cwd=BACKEND_DIR, env=env)
+    _wait_port("127.0.0.1", port, proc)
+    return proc
+
+
+def build_scenarios(args, backend_pid: int):
+    available = {
+        "list": lambda: ListScenario("list", args.requests, args.concurrency),
+        "crud": lambda: CrudScenario("crud", max(args.requests // 5, 1), args.concurrency),
+        "import-10k": lambda: ImportScenario("import-10k", 10_000, args.seed),
+        "import-100k": lambda: ImportScenario("import-100k", 100_000, args.seed),
+        "export-csv": lambda: ExportScenario("export-csv", "csv", backend_pid),
+        "export-ndjson": lambda: ExportScenario("export-ndjson", "ndjson", backend_pid),
+    }
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in available]
+    if unknown:
+        raise SystemExit(f"Cenários desconhecidos: {', '.join(unknown)} (opções: {', '.join(available)})")
+    return [available[n]() for n in names]
+
+
+async def main(args):
+    supabase_proc, supabase_url = start_server_process(latency=args.latency, port=args.supabase_port)
+    backend = None
+    try:
+        seed_rows(supabase_url, (_product(i) for i in range(args.seed)))
+        backend = start_backend(supabase_url, args.port, args)
+        api_url = f"http://127.0.0.1:{args.port}"
+
+        print(f"backend {api_url} ({args.workers} worker(s), cache {args.cache}); Supabase falso com "
+              f"{args.latency * 1000:.0f} ms de latência e {args.seed} produtos; concorrência {args.concurrency}")
+
+        results = []
+        for scenario in build_scenarios(args, backend.pid):
+            result = await run_scenario(scenario, api_url, supabase_url)
+            _print_result(result)
+            results.append(result)
+    finally:
+        if backend:
+            backend.terminate()
+            backend.wait()
+        supabase_proc.terminate()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados salvos em {args.save}")
+
+    if args.baseline and _compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default="list,crud,import-10k,import-100k")
+    parser.add_argument("--requests", type=int, default=2000, help="iterações do cenário list (crud usa 1/5)")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="latência injetada por chamada ao Supabase (s)")
+    parser.add_argument("--seed", type=int, default=5000,
+                        help="produtos pré-carregados (o PostgREST falso varre a tabela inteira a cada consulta)")
+    parser.add_argument("--cache", default="memory", choices=["memory", "none"])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--supabase-port", type=int, default=54321)
+    parser.add_argument("--save", help="salva os resultados (JSON) para comparar depois")
+    parser.add_argument("--baseline", help="JSON salvo com --save; sai com código 1 se houver regressão")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="piora tolerada na comparação (0.2 = 20%%)")
+    asyncio.run(main(parser.parse_args()))
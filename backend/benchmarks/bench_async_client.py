@@ -0,0 +1,91 @@
+"""Compara a vazão da listagem síncrona anterior (threadpool) com o AsyncProductService.
+
+Roda os dois serviços contra o PostgREST falso (em outro processo) com latência
+injetada, no mesmo esquema usado pelo FastAPI: handlers `def` vão para o threadpool do anyio
+(40 threads por padrão), handlers `async def` rodam direto no event loop.
+
+    python -m benchmarks.bench_async_client --requests 1000 --concurrency 100 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_postgrest import start_server_process, seed_rows
+
+
+def _report(name: str, latencies, elapsed: float):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<6} {len(latencies) / elapsed:>9.1f} req/s   "
+          f"p50 {statistics.median(latencies) * 1000:>7.1f} ms   p95 {p95 * 1000:>7.1f} ms")
+
+
+async def _drive(call, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies, time.perf_counter() - started
+
+
+def legacy_list_products(limit: int):
+    """Listagem com o cliente síncrono usada antes pelas rotas (referência para a comparação)"""
+    from core.config import supabase
+    from core.metrics import execute
+    from services.product_service import _list_spec, _build_list_query, _list_result
+
+    spec = _list_spec("id", "asc", limit, None, None, None, None)
+    return _list_result(execute(_build_list_query(supabase, spec), "select"), spec)
+
+
+async def main(args):
+    from fastapi.concurrency import run_in_threadpool
+    from services.async_product_service import AsyncProductService
+
+    # Aquecimento (conexões e criação do cliente assíncrono)
+    await AsyncProductService.list_products(limit=10)
+    legacy_list_products(limit=10)
+
+    latencies, elapsed = await _drive(
+        lambda: run_in_threadpool(legacy_list_products, limit=20),
+        args.requests, args.concurrency)
+    _report("sync", latencies, elapsed)
+
+    latencies, elapsed = await _drive(
+        lambda: AsyncProductService.list_products(limit=20),
+        args.requests, args.concurrency)
+    _report("async", latencies, elapsed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2, help="latência injetada por chamada (s)")
+    parser.add_argument("--port", type=int, default=54321)
+    args = parser.parse_args()
+
+    proc, base_url = start_server_process(latency=args.latency, port=args.port)
+    seed_rows(base_url, ({"nome": f"Produto {i}", "preco": 10.0 + i, "estoque": i, "categoria": "Bench",
+                          "descricao": "", "tags": []} for i in range(200)))
+
+    # Configuração lida na importação de core.config: definir antes de importar os serviços
+    os.environ.update({"SUPABASE_URL": base_url, "SUPABASE_KEY": "bench", "CACHE_BACKEND": "none"})
+    print(f"{args.requests} listagens, concorrência {args.concurrency}, "
+          f"latência {args.latency * 1000:.0f} ms")
+    try:
+        asyncio.run(main(args))
+    finally:
+        proc.terminate()
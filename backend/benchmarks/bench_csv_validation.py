@@ -0,0 +1,125 @@
+"""Compara a validação coluna a coluna do import com o laço linha a linha anterior.
+
+    python -m benchmarks.bench_csv_validation                  # 500k linhas, 5% inválidas
+    python -m benchmarks.bench_csv_validation --rows 100000 --invalid 0.2
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def legacy_parse_row(row_raw):
+    """Validação linha a linha usada antes (referência para a comparação)"""
+    row = {k.strip().lower(): (v or "").strip() for k, v in row_raw.items() if k}
+
+    nome = row.get('nome')
+    categoria = row.get('categoria')
+    preco_str = row.get('preco')
+    estoque_str = row.get('estoque')
+
+    missing_fields = []
+    if not nome: missing_fields.append('nome')
+    if not categoria: missing_fields.append('categoria')
+    if not preco_str: missing_fields.append('preco')
+    if not estoque_str: missing_fields.append('estoque')
+
+    if missing_fields:
+        raise ValueError(f"Campos obrigatórios vazios: {', '.join(missing_fields)}")
+
+    try:
+        preco = float(preco_str.replace(',', '.'))
+        if preco < 0: raise ValueError
+    except ValueError:
+        raise ValueError(f"Preço inválido: {preco_str}")
+
+    try:
+        estoque = int(float(estoque_str))
+        if estoque < 0: raise ValueError
+    except ValueError:
+        raise ValueError(f"Estoque inválido: {estoque_str}")
+
+    tags_str = row.get('tags') or ""
+    return {
+        "nome": nome,
+        "preco": preco,
+        "estoque": estoque,
+        "categoria": categoria,
+        "descricao": row.get('descricao') or "",
+        "tags": [t.strip() for t in tags_str.split(',') if t.strip()],
+    }
+
+
+def generate_csv(rows: int, invalid_ratio: float, seed: int = 42) -> str:
+    rng = random.Random(seed)
+    out = io.StringIO()
+    out.write("Nome;Categoria;Descricao;Tags;Preco;Estoque\n")
+    for i in range(rows):
+        preco, estoque = f"{rng.uniform(1, 500):.2f}".replace('.', ','), str(rng.randint(0, 1000))
+        if rng.random() < invalid_ratio:
+            preco = rng.choice(["abc", "-3", "1,2,3", "1.234,50"])
+        out.write(f"Produto {i};Categoria {i % 20};Descrição do produto {i};tag{i % 7}, promo;{preco};{estoque}\n")
+    return out.getvalue()
+
+
+def run_legacy(content: str):
+    from services import csv_import
+
+    reader = csv.DictReader(io.StringIO(content), delimiter=csv_import.detect_delimiter(content.split("\n", 1)[0]))
+    valid = errors = 0
+    for row_raw in reader:
+        try:
+            legacy_parse_row(row_raw)
+            valid += 1
+        except ValueError:
+            errors += 1
+    return valid, errors
+
+
+def run_columnar(content: str, chunk_size: int):
+    from services import csv_import
+
+    source = csv_import.open_reader(io.StringIO(content))
+    valid = errors = 0
+    read = 0
+    for rows in csv_import.chunked(source.rows, chunk_size):
+        result = csv_import.validate_batch(rows, source.columns, range(read + 1, read + len(rows) + 1))
+        read += len(rows)
+        valid += len(result.payloads)
+        errors += len(result.errors)
+    return valid, errors
+
+
+def measure(label, fn, rows, repeat):
+    best, outcome = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        outcome = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<14} {best:7.3f} s   {rows / best:>10,.0f} linhas/s   válidas {outcome[0]:,}  erros {outcome[1]:,}")
+    return best, outcome
+
+
+def main(args):
+    content = generate_csv(args.rows, args.invalid)
+    print(f"{args.rows:,} linhas ({args.invalid:.0%} inválidas), lote de {args.chunk_size}, melhor de {args.repeat}")
+    legacy, legacy_out = measure("linha a linha", lambda: run_legacy(content), args.rows, args.repeat)
+    columnar, columnar_out = measure("colunar", lambda: run_columnar(content, args.chunk_size), args.rows, args.repeat)
+    if legacy_out != columnar_out:
+        print(f"ATENÇÃO: resultados diferentes {legacy_out} != {columnar_out}")
+    print(f"ganho: {legacy / columnar:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--invalid", type=float, default=0.05)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
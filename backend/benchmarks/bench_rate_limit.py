@@ -0,0 +1,52 @@
+"""Mede o custo por requisição do rate limit (chave + verificação no armazenamento).
+
+    python -m benchmarks.bench_rate_limit                       # memory://
+    python -m benchmarks.bench_rate_limit --storage redis://localhost:6379/0
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from limits import parse, storage, strategies
+from starlette.requests import Request
+
+
+def main(args):
+    from core.rate_limit import user_or_ip
+
+    store = storage.storage_from_string(args.storage)
+    limiter = strategies.STRATEGIES[args.strategy](store)
+    # Limite alto: medimos o custo da verificação, não o bloqueio
+    item = parse("1000000000/minute")
+
+    requests = []
+    for i in range(args.keys):
+        scope = {"type": "http", "client": (f"10.1.{i // 250}.{i % 250}", 1234),
+                 "headers": [(b"authorization", f"Bearer token-{i}".encode())]}
+        requests.append(Request(scope))
+
+    timings = []
+    for i in range(args.iterations):
+        request = requests[i % len(requests)]
+        started = time.perf_counter()
+        limiter.hit(item, "bench", user_or_ip(request))
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    print(f"{args.storage} ({args.strategy}), {args.iterations} verificações, {args.keys} chaves")
+    print(f"média {statistics.mean(timings) * 1e6:8.1f} µs   p50 {timings[len(timings) // 2] * 1e6:8.1f} µs   "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1e6:8.1f} µs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--storage", default="memory://")
+    parser.add_argument("--strategy", default="sliding-window-counter",
+                        choices=sorted(strategies.STRATEGIES))
+    parser.add_argument("--iterations", type=int, default=50000)
+    parser.add_argument("--keys", type=int, default=1000)
+    main(parser.parse_args())
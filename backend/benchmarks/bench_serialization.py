@@ -0,0 +1,85 @@
+"""Custo de gerar e validar JSON de produtos: caminho antigo x modelos de resposta/orjson.
+
+Saída (resposta com N produtos):
+  - jsonable_encoder + json.dumps: o que o FastAPI faz com uma rota sem modelo (antes)
+  - TypeAdapter(List[Product]): validação + dump_json no pydantic-core, o que o FastAPI
+    faz com response_model declarado (listagem, criação, atualização, busca)
+  - orjson: OrjsonResponse, para linhas do PostgREST repassadas sem modelo (changes, fields=)
+
+Entrada (corpo de POST /products/batch com N itens, a partir dos bytes):
+  - ProductCreate(**item) um a um
+  - TypeAdapter(List[ProductCreate]): um único validador compilado para a lista
+    (o que o FastAPI usa no corpo List[ProductCreate]), com json.loads ou validate_json
+
+    python -m benchmarks.bench_serialization                 # 10 mil produtos
+    python -m benchmarks.bench_serialization --products 100000 --repeat 3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from schemas.product import Product, ProductCreate
+
+
+def _row(i: int) -> dict:
+    # Linha como o PostgREST devolve (select *), com as colunas internas do change_tracking.sql
+    return {"id": i, "nome": f"Produto {i}", "descricao": f"Descrição do produto {i}, ótimo para o dia a dia",
+            "categoria": f"Categoria {i % 20}", "tags": ["promoção", f"tag{i % 7}"],
+            "preco": round(1 + i * 0.37 % 500, 2), "estoque": i % 1000,
+            "versao": str(100000 + i), "updated_at": "2026-10-17T12:00:00.000000+00:00"}
+
+
+def _payload(i: int) -> dict:
+    return {"nome": f"  Produto {i} ", "preco": 10.555, "estoque": i % 1000, "categoria": "Mercearia",
+            "descricao": " Descrição ", "tags": ["promoção"]}
+
+
+def measure(label: str, fn, products: int, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<48} {best * 1000:9.1f} ms   {best / products * 1e6:7.2f} µs/produto")
+    return best
+
+
+def main(args):
+    n, repeat = args.products, args.repeat
+    rows = [_row(i) for i in range(n)]
+    body = orjson.dumps([_payload(i) for i in range(n)])
+    products = TypeAdapter(List[Product])
+    creates = TypeAdapter(List[ProductCreate])
+
+    print(f"{n:,} produtos, melhor de {repeat}\n\nsaída (resposta JSON)")
+    before = measure("jsonable_encoder + json.dumps (antes)",
+                     lambda: json.dumps(jsonable_encoder(rows)).encode("utf-8"), n, repeat)
+    model = measure("TypeAdapter(List[Product]) validate + dump_json",
+                    lambda: products.dump_json(products.validate_python(rows)), n, repeat)
+    raw = measure("orjson.dumps (sem modelo)", lambda: orjson.dumps(rows), n, repeat)
+    print(f"  ganho: modelo {before / model:.1f}x, orjson {before / raw:.1f}x")
+
+    print("\nentrada (corpo em lote)")
+    per_item = measure("json.loads + ProductCreate(**item)",
+                       lambda: [ProductCreate(**item) for item in json.loads(body)], n, repeat)
+    bulk = measure("json.loads + TypeAdapter.validate_python",
+                   lambda: creates.validate_python(json.loads(body)), n, repeat)
+    from_bytes = measure("TypeAdapter.validate_json (bytes)", lambda: creates.validate_json(body), n, repeat)
+    print(f"  ganho: lista {per_item / bulk:.1f}x, direto dos bytes {per_item / from_bytes:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,140 @@
+"""Tempo de inicialização e memória (RSS/PSS) do backend em cada modo de servidor.
+
+Para cada configuração sobe o servidor contra o PostgREST falso e mede:
+  - import: tempo de `import main` em um processo novo
+  - pronto: do início do processo até a primeira resposta de GET / (mediana de --runs subidas)
+  - 1ª consulta: primeira GET /products/ (cria o cliente Supabase sob demanda)
+  - memória do master e de cada worker (RSS e PSS; PSS divide as páginas
+    compartilhadas copy-on-write, então mostra o ganho real do --preload)
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --configs uvicorn,gunicorn:4:preload,gunicorn:4:no-preload
+
+Somente Linux (lê /proc).
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_postgrest import start_server_process
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _proc_kb(pid: int, path: str, field: str) -> int:
+    try:
+        with open(f"/proc/{pid}/{path}") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _children(pid: int):
+    pids = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                pids.extend(int(p) for p in f.read().split())
+    except OSError:
+        pass
+    return pids
+
+
+def _memory(pid: int):
+    """[(pid, rss_kb, pss_kb)] do processo e dos filhos diretos (workers)"""
+    return [(p, _proc_kb(p, "status", "VmRSS"), _proc_kb(p, "smaps_rollup", "Pss"))
+            for p in [pid] + _children(pid)]
+
+
+def _wait_http(url: str, proc: subprocess.Popen, timeout: float = 30.0) -> float:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("servidor encerrou durante a inicialização")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                response.read()
+                return time.perf_counter()
+        except OSError:
+            time.sleep(0.01)
+    raise RuntimeError(f"{url} não respondeu em {timeout}s")
+
+
+def measure_import(env) -> float:
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def server_command(config: str, port: int):
+    parts = config.split(":")
+    if parts[0] == "uvicorn":
+        return [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"], {}
+    workers = parts[1] if len(parts) > 1 else "2"
+    preload = "false" if "no-preload" in parts else "true"
+    env = {"WEB_CONCURRENCY": workers, "PRELOAD": preload, "PORT": str(port)}
+    return [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py",
+            "--log-level", "warning", "--access-logfile", "/dev/null"], env
+
+
+def measure_server(config: str, env, port: int, settle: float):
+    command, extra_env = server_command(config, port)
+    started = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=BACKEND_DIR, env=dict(env, **extra_env))
+    try:
+        ready = _wait_http(f"http://127.0.0.1:{port}/", proc) - started
+        first_started = time.perf_counter()
+        _wait_http(f"http://127.0.0.1:{port}/products/?limit=1", proc)
+        first_query = time.perf_counter() - first_started
+        # Workers restantes terminam de subir (gunicorn responde assim que o primeiro fica pronto)
+        time.sleep(settle)
+        memory = _memory(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return ready, first_query, memory
+
+
+def main(args):
+    supabase_proc, supabase_url = start_server_process(latency=0.0, port=args.supabase_port)
+    env = dict(os.environ, SUPABASE_URL=supabase_url, SUPABASE_KEY="bench")
+    try:
+        imports = sorted(measure_import(env) for _ in range(args.repeat))
+        print(f"import main: mediana {imports[len(imports) // 2] * 1000:.0f} ms ({args.repeat} execuções)\n")
+
+        print(f"{'configuração':<26} {'pronto':>9} {'1ª consulta':>12} {'processos':>10} "
+              f"{'RSS total':>10} {'PSS total':>10} {'PSS/worker':>11}")
+        for config in [c.strip() for c in args.configs.split(",") if c.strip()]:
+            # Mediana de várias subidas: uma só varia centenas de ms em máquina com poucas CPUs
+            runs = [measure_server(config, env, args.port, args.settle) for _ in range(args.runs)]
+            ready = sorted(r[0] for r in runs)[len(runs) // 2]
+            first_query = sorted(r[1] for r in runs)[len(runs) // 2]
+            memory = runs[-1][2]
+            workers = memory[1:] or memory
+            rss = sum(m[1] for m in memory) / 1024
+            pss = sum(m[2] for m in memory) / 1024
+            pss_worker = sum(m[2] for m in workers) / len(workers) / 1024
+            print(f"{config:<26} {ready * 1000:>7.0f}ms {first_query * 1000:>10.0f}ms {len(memory):>10} "
+                  f"{rss:>8.1f}MB {pss:>8.1f}MB {pss_worker:>9.1f}MB")
+    finally:
+        supabase_proc.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configs", default="uvicorn,gunicorn:1:preload,gunicorn:2:preload,gunicorn:2:no-preload")
+    parser.add_argument("--repeat", type=int, default=5, help="execuções do `import main`")
+    parser.add_argument("--runs", type=int, default=5, help="subidas de cada configuração (mediana)")
+    parser.add_argument("--settle", type=float, default=1.0, help="espera (s) antes de medir a memória")
+    parser.add_argument("--port", type=int, default=8124)
+    parser.add_argument("--supabase-port", type=int, default=54322)
+    main(parser.parse_args())
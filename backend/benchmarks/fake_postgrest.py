@@ -0,0 +1,547 @@
+"""Servidor PostgREST/Supabase falso, em memória, para benchmarks locais.
+
+Implementa o subconjunto da API REST usado pelo backend (select com filtros,
+order/limit/offset, or=(), insert/upsert, update, delete, as RPCs e
+/auth/v1/user) e
+injeta uma latência fixa por requisição para simular a rede até o Supabase.
+
+Uso isolado:
+    python -m benchmarks.fake_postgrest --port 54321 --latency 0.02
+"""
+import argparse
+import csv
+import difflib
+import json
+import operator
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import unicodedata
+import urllib.request
+from collections import Counter
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+def _split_top_level(text: str):
+    # Divide por vírgulas fora de parênteses e aspas
+    parts, depth, quoted, current = [], 0, False, ""
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0 and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += ch
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+
+def _coerce(current, raw: str):
+    if isinstance(current, bool):
+        return raw == "true"
+    if isinstance(current, (int, float)):
+        try:
+            return type(current)(float(raw)) if isinstance(current, float) else int(float(raw))
+        except ValueError:
+            return raw
+    return raw
+
+
+@lru_cache(maxsize=256)
+def _in_options(raw: str, kind: type) -> frozenset:
+    # Lista do in.(...) interpretada uma vez por filtro, não uma vez por linha
+    options = next(csv.reader([raw.strip("()")], skipinitialspace=True), [])
+    sample = kind() if kind in (bool, int, float) else None
+    return frozenset(_coerce(sample, o) for o in options)
+
+
+_COMPARISONS = {"eq": operator.eq, "neq": operator.ne, "gt": operator.gt,
+                "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+
+@lru_cache(maxsize=1024)
+def _compile(column: str, expr: str):
+    """Filtro do PostgREST (ex: preco=gt.10) interpretado uma vez e devolvido como predicado"""
+    negate = expr.startswith("not.")
+    if negate:
+        expr = expr[4:]
+    op, _, raw = expr.partition(".")
+
+    if op == "in":
+        def test(value):
+            return value in _in_options(raw, type(value))
+    elif op == "is":
+        expected = None if raw == "null" else raw == "true"
+        def test(value):
+            return value is None if expected is None else value == expected
+    elif op in ("like", "ilike"):
+        pattern = _unquote(raw).replace("*", "%").strip("%")
+        if op == "ilike":
+            pattern = pattern.lower()
+        def test(value):
+            text = str(value or "")
+            return pattern in (text.lower() if op == "ilike" else text)
+    elif op == "cs":
+        wanted = [w.strip('"') for w in raw.strip("{}").split(",") if w]
+        def test(value):
+            return all(w in (value or []) for w in wanted)
+    else:
+        compare = _COMPARISONS.get(op)
+        text = _unquote(raw)
+        def test(value):
+            if value is None:
+                return None
+            try:
+                return compare(value, _coerce(value, text)) if compare else False
+            except TypeError:
+                return False
+
+    def predicate(row: dict) -> bool:
+        result = test(row.get(column))
+        if result is None:
+            # Comparação com NULL é sempre falsa (mesmo com not.)
+            return False
+        return not result if negate else result
+
+    return predicate
+
+
+def _match(row: dict, column: str, expr: str) -> bool:
+    return _compile(column, expr)(row)
+
+
+def _match_logic(row: dict, items, mode: str) -> bool:
+    results = []
+    for item in items:
+        if item.startswith("and(") or item.startswith("or("):
+            inner_mode, inner = item.split("(", 1)
+            results.append(_match_logic(row, _split_top_level(inner[:-1]), inner_mode))
+        else:
+            column, _, expr = item.partition(".")
+            results.append(_match(row, column, expr))
+    return all(results) if mode == "and" else any(results)
+
+
+class PostgrestError(Exception):
+    """Erro do banco com o status HTTP e o corpo que o PostgREST devolveria"""
+
+    def __init__(self, status: int, code: str, message: str, details=None, hint=None):
+        super().__init__(message)
+        self.status = status
+        self.body = {"code": code, "message": message, "details": details, "hint": hint}
+
+
+def _unique_error(table: str, column: str, value) -> PostgrestError:
+    return PostgrestError(409, "23505", f'duplicate key value violates unique constraint "{table}_{column}_key"',
+                          f"Key ({column})=({value}) already exists.")
+
+
+def _ajustar_estoque(db, params):
+    # Como estoque_atomico.sql: tudo ou nada, estoque nunca negativo
+    row = db.tables["produtos"].get(params.get("p_id"))
+    if not row:
+        return []
+    data = params.get("p_dados") or {}
+    estoque = (row.get("estoque") or 0) + params.get("p_delta", 0)
+    if estoque < 0:
+        raise PostgrestError(400, "23514", f"Estoque insuficiente para o produto {row['id']}")
+    column = db.unique_violation("produtos", {**row, **data}, row["id"])
+    if column:
+        raise _unique_error("produtos", column, data[column])
+    row.update(data)
+    row["estoque"] = estoque
+    db.touch(row, db.next_version())
+    return [dict(row)]
+
+
+def _produtos_alteracoes(db, params):
+    # Cada requisição de escrita é uma "transação" já confirmada: o horizonte é a próxima versão
+    after = (int(params.get("p_versao") or 0), int(params.get("p_id") or 0))
+    changes = [(row["versao"], row["id"], False, row) for row in db.tables["produtos"].values()]
+    changes += [(t["versao"], t["id"], True, None) for t in db.tables["produtos_removidos"].values()]
+    changes = sorted(c for c in changes if (c[0], c[1]) > after)[:int(params.get("p_limite") or 1000)]
+    return {"horizonte": str(db.version + 1),
+            "alteracoes": [{"versao": str(v), "id": i, "removido": removed,
+                            "produto": dict(row, versao=str(v)) if row else None}
+                           for v, i, removed, row in changes]}
+
+
+def _normalize(text) -> str:
+    # Equivalente a produtos_normalizar (busca.sql): minúsculas e sem acentos
+    decomposed = unicodedata.normalize("NFKD", str(text or "").lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _buscar_produtos(db, params):
+    # Aproximação de busca.sql: palavras (ou começos de palavra) em nome > tags > descrição,
+    # e semelhança com as palavras do nome para erros de digitação; "-termo" exclui
+    tokens = _normalize(params.get("p_q")).replace('"', " ").split()
+    terms = [t for t in tokens if not t.startswith("-")]
+    excluded = [t[1:] for t in tokens if t.startswith("-") and len(t) > 1]
+    if not terms:
+        return []
+    results = []
+    for row in db.tables["produtos"].values():
+        fields = [(_normalize(row.get("nome")).split(), 1.0),
+                  (_normalize(" ".join(row.get("tags") or [])).split(), 0.4),
+                  (_normalize(row.get("descricao")).split(), 0.1)]
+        if any(word.startswith(term) for term in excluded for words, _ in fields for word in words):
+            continue
+        score, matched = 0.0, True
+        for term in terms:
+            weight = max((w for words, w in fields if any(word.startswith(term) for word in words)), default=0.0)
+            if not weight:
+                similar = difflib.get_close_matches(term, fields[0][0], n=1, cutoff=0.75)
+                weight = 0.5 if similar else 0.0
+            matched = matched and weight > 0
+            score += weight
+        if matched:
+            results.append((score, row["id"], row))
+    results.sort(key=lambda r: (-r[0], r[1]))
+    offset = int(params.get("p_offset") or 0)
+    page = results[offset:offset + int(params.get("p_limite") or 20)]
+    return [{"produto": dict(row), "relevancia": round(score, 4)} for score, _, row in page]
+
+
+class FakeDatabase:
+    """Tabelas em memória + contadores de chamadas"""
+
+    def __init__(self, latency: float = 0.0, unique_columns=("nome",)):
+        self.latency = latency
+        self.unique_columns = unique_columns
+        self.tables = {"produtos": {}, "produtos_removidos": {}}
+        self.next_id = 1
+        # Versão da última escrita (no Postgres: o id da transação, ver change_tracking.sql)
+        self.version = 0
+        self.calls = Counter()
+        self.rpc_handlers = {"ajustar_estoque": _ajustar_estoque,
+                             "produtos_alteracoes": _produtos_alteracoes,
+                             "buscar_produtos": _buscar_produtos}
+        self.lock = threading.Lock()
+
+    def next_version(self) -> int:
+        self.version += 1
+        return self.version
+
+    @staticmethod
+    def touch(row: dict, version: int):
+        row["versao"] = version
+        row["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+    def seed(self, rows):
+        with self.lock:
+            version = self.next_version()
+            for row in rows:
+                row = dict(row)
+                self.touch(row, version)
+                row.setdefault("id", self.next_id)
+                self.next_id = max(self.next_id, row["id"]) + 1
+                self.tables["produtos"][row["id"]] = row
+
+    def facet_rows(self):
+        """produtos_facetas (mantida por triggers no Postgres) calculada na hora"""
+        counts = Counter({("total", ""): 0})
+        for row in self.tables["produtos"].values():
+            counts["total", ""] += 1
+            if row.get("categoria"):
+                counts["categoria", row["categoria"]] += 1
+            for tag in set(row.get("tags") or []):
+                if tag:
+                    counts["tag", tag] += 1
+        return [{"tipo": t, "valor": v, "total": n} for (t, v), n in counts.items()]
+
+    def filter_rows(self, table: str, params):
+        if table == "produtos_facetas":
+            rows = self.facet_rows()
+        else:
+            rows = list(self.tables.setdefault(table, {}).values())
+        for key, value in params:
+            if key in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+                continue
+            if key in ("or", "and"):
+                items = _split_top_level(value[1:-1])
+                rows = [r for r in rows if _match_logic(r, items, key)]
+            else:
+                predicate = _compile(key, value)
+                rows = [r for r in rows if predicate(r)]
+        return rows
+
+    def unique_index(self, table: str) -> dict:
+        """{coluna: {valor: id}} das colunas únicas (montado uma vez por requisição)"""
+        rows = self.tables.setdefault(table, {}).values()
+        return {column: {r.get(column): r["id"] for r in rows} for column in self.unique_columns}
+
+    def unique_violation(self, table: str, row: dict, ignore_id=None, index=None):
+        index = index if index is not None else self.unique_index(table)
+        for column in self.unique_columns:
+            if column not in row:
+                continue
+            other_id = index[column].get(row[column])
+            if other_id is not None and other_id != ignore_id:
+                return column
+        return None
+
+
+def _plan_insert(db, rows, table: str, conflict: str, upsert: bool, index: dict, by_conflict: dict):
+    """Valida o lote inteiro antes de gravar: [(linha, existente ou None)]"""
+    plan, keys = [], set()
+    for n, row in enumerate(rows):
+        key = row.get(conflict)
+        existing = by_conflict.get(key) if key is not None else None
+        if upsert and key is not None:
+            if key in keys:
+                raise PostgrestError(500, "21000", "ON CONFLICT DO UPDATE command cannot affect row a second time",
+                                     hint="Ensure that no rows proposed for insertion within the same command "
+                                          "have duplicate constrained values.")
+            keys.add(key)
+        target_id = existing["id"] if existing else ("novo", n)
+        column = db.unique_violation(table, row, target_id, index)
+        if column:
+            raise _unique_error(table, column, row[column])
+        for column in db.unique_columns:
+            if column in row:
+                index[column][row[column]] = target_id
+        plan.append((row, existing))
+    return plan
+
+
+def _project(row: dict, select: str) -> dict:
+    if not select or select == "*":
+        return dict(row)
+    return {c: row.get(c) for c in select.split(",")}
+
+
+def _sort(rows, order: str):
+    for part in reversed(order.split(",")):
+        column, _, modifiers = part.partition(".")
+        desc = modifiers.startswith("desc")
+        # Como no Postgres: nulos por último no asc e primeiro no desc, salvo nullsfirst/nullslast
+        nulls_first = "nullsfirst" in modifiers or (desc and "nullslast" not in modifiers)
+        present = sorted((r for r in rows if r.get(column) is not None), key=lambda r: r[column], reverse=desc)
+        missing = [r for r in rows if r.get(column) is None]
+        rows[:] = missing + present if nulls_first else present + missing
+    return rows
+
+
+def make_handler(db: FakeDatabase):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, payload=None, headers=None):
+            body = json.dumps(payload if payload is not None else []).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            return json.loads(self._raw) if self._raw else None
+
+        def _route(self):
+            # Corpo sempre consumido (o cliente manda "{}" até em DELETE): sobras no socket
+            # corromperiam a próxima requisição da mesma conexão keep-alive
+            length = int(self.headers.get("Content-Length") or 0)
+            self._raw = self.rfile.read(length) if length else b""
+            parts = urlsplit(self.path)
+            db.calls[f"{self.command} {parts.path}"] += 1
+            if db.latency:
+                time.sleep(db.latency)
+            return parts.path, parse_qsl(parts.query, keep_blank_values=True)
+
+        def do_GET(self):
+            if self.path == "/__stats":
+                # Contadores de chamadas (usados pelos benchmarks em outro processo)
+                return self._send(200, dict(db.calls))
+            path, params = self._route()
+            if path == "/auth/v1/user":
+                return self._send(200, {"id": "bench-user", "aud": "authenticated",
+                                        "email": "bench@example.com", "app_metadata": {},
+                                        "user_metadata": {}, "created_at": "2024-01-01T00:00:00Z"})
+            table = path.rsplit("/", 1)[-1]
+            query = dict(params)
+            with db.lock:
+                rows = _sort(db.filter_rows(table, params), query.get("order", "id.asc"))
+            total = len(rows)
+            offset = int(query.get("offset", 0))
+            rows = rows[offset:]
+            if "limit" in query:
+                rows = rows[:int(query["limit"])]
+            headers = {}
+            if "count=" in (self.headers.get("Prefer") or ""):
+                headers["Content-Range"] = f"{offset}-{offset + max(len(rows) - 1, 0)}/{total}"
+            self._send(200, [_project(r, query.get("select", "*")) for r in rows], headers)
+
+        def do_POST(self):
+            if self.path == "/__reset":
+                db.calls.clear()
+                return self._send(200, {})
+            path, params = self._route()
+            body = self._body()
+            if "/rpc/" in path:
+                handler = db.rpc_handlers.get(path.rsplit("/", 1)[-1])
+                if not handler:
+                    return self._send(404, {"code": "PGRST202", "message": "function not found",
+                                            "details": None, "hint": None})
+                with db.lock:
+                    try:
+                        return self._send(200, handler(db, body or {}))
+                    except PostgrestError as e:
+                        return self._send(e.status, e.body)
+
+            table = path.rsplit("/", 1)[-1]
+            query = dict(params)
+            rows = body if isinstance(body, list) else [body]
+            upsert = "merge-duplicates" in (self.headers.get("Prefer") or "")
+            conflict = query.get("on_conflict", "id")
+            written = []
+            with db.lock:
+                store = db.tables.setdefault(table, {})
+                # Índices por requisição: O(linhas da tabela + linhas enviadas), não o produto dos dois
+                index = db.unique_index(table)
+                by_conflict = {r.get(conflict): r for r in store.values()} if upsert else {}
+                try:
+                    plan = _plan_insert(db, rows, table, conflict, upsert, index, by_conflict)
+                except PostgrestError as e:
+                    # Uma linha inválida rejeita o lote inteiro (um único INSERT no PostgREST)
+                    return self._send(e.status, e.body)
+                version = db.next_version()
+                for row, existing in plan:
+                    if existing:
+                        # Como o trigger: upsert sem mudança mantém a versão
+                        if any(existing.get(k) != v for k, v in row.items()):
+                            existing.update(row)
+                            db.touch(existing, version)
+                        target = existing
+                    else:
+                        target = dict(row)
+                        db.touch(target, version)
+                        if target.get("id") is None:
+                            target["id"] = db.next_id
+                        db.next_id = max(db.next_id, target["id"]) + 1
+                        store[target["id"]] = target
+                    written.append(dict(target))
+            self._send(201, written)
+
+        def do_PATCH(self):
+            path, params = self._route()
+            body = self._body() or {}
+            table = path.rsplit("/", 1)[-1]
+            with db.lock:
+                rows = db.filter_rows(table, params)
+                for row in rows:
+                    column = db.unique_violation(table, {**row, **body}, row["id"])
+                    if column:
+                        error = _unique_error(table, column, body[column])
+                        return self._send(error.status, error.body)
+                version = db.next_version()
+                for row in rows:
+                    row.update(body)
+                    db.touch(row, version)
+            self._send(200, [dict(r) for r in rows])
+
+        def do_DELETE(self):
+            path, params = self._route()
+            table = path.rsplit("/", 1)[-1]
+            with db.lock:
+                rows = db.filter_rows(table, params)
+                version = db.next_version()
+                for row in rows:
+                    del db.tables[table][row["id"]]
+                    if table == "produtos":
+                        db.tables["produtos_removidos"][row["id"]] = {"id": row["id"], "versao": version}
+            self._send(200, rows)
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # O padrão (5) derruba conexões sob concorrência alta e distorce as medições
+    request_queue_size = 1024
+
+
+def start_server(latency: float = 0.0, port: int = 0, host: str = "127.0.0.1"):
+    """Inicia o servidor em uma thread daemon. Retorna (servidor, banco, url_base)."""
+    db = FakeDatabase(latency=latency)
+    server = _Server((host, port), make_handler(db))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, db, f"http://{host}:{server.server_address[1]}"
+
+
+def start_server_process(latency: float = 0.0, port: int = 54321, host: str = "127.0.0.1"):
+    """Inicia o servidor em outro processo (sem disputar o GIL com o cliente medido).
+
+    Retorna (processo, url_base). Popular dados com seed_rows(); encerrar com proc.terminate().
+    """
+    proc = subprocess.Popen([sys.executable, "-m", "benchmarks.fake_postgrest", "--port", str(port),
+                             "--latency", str(latency), "--host", host],
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            stdout=subprocess.DEVNULL)
+    base_url = f"http://{host}:{port}"
+    for _ in range(100):
+        try:
+            with socket.create_connection((host, port), timeout=0.1):
+                return proc, base_url
+        except OSError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise RuntimeError("PostgREST falso não iniciou")
+
+
+def seed_rows(base_url: str, rows, chunk: int = 5000):
+    rows = list(rows)
+    for i in range(0, len(rows), chunk):
+        body = json.dumps(rows[i:i + chunk]).encode("utf-8")
+        request = urllib.request.Request(f"{base_url}/rest/v1/produtos", data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        urllib.request.urlopen(request).read()
+    reset_stats(base_url)
+
+
+def call_stats(base_url: str) -> dict:
+    with urllib.request.urlopen(f"{base_url}/__stats") as response:
+        return json.loads(response.read())
+
+
+def reset_stats(base_url: str):
+    request = urllib.request.Request(f"{base_url}/__reset", data=b"", method="POST")
+    urllib.request.urlopen(request).read()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--latency", type=float, default=0.02, help="latência por requisição (s)")
+    args = parser.parse_args()
+
+    server, _, base_url = start_server(args.latency, args.port, args.host)
+    print(f"PostgREST falso em {base_url} (latência {args.latency * 1000:.0f} ms). Ctrl+C para sair.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,267 @@
+-- =========================================
+-- SCRIPT: Busca de produtos (GET /products/search?q=)
+-- =========================================
+-- Busca em nome, tags e descrição com índice, ordenada por relevância:
+--   - texto completo em português (radicais: "camisetas" acha "camiseta"),
+--     sem acentos ("cafe" acha "Café") e com pesos nome > tags > descrição
+--   - erros de digitação ("camizeta", "luminaira") e começos de palavra
+--     ("liquidif"): cada palavra desconhecida é trocada pela mais parecida do
+--     vocabulário do catálogo (trigramas) antes de consultar o índice
+--
+-- O documento de busca fica em produtos_busca (uma linha por produto, mantida
+-- por trigger), e não numa coluna de produtos: as listagens com select * e o
+-- GET /products/changes continuam iguais, e o ranking lê o tsvector pronto
+-- em vez de recalculá-lo para cada resultado.
+--
+-- No Supabase as extensões ficam no schema "extensions".
+--
+-- COMO USAR:
+-- 1. Abra Supabase Dashboard → SQL Editor
+-- 2. Cole este arquivo e clique em RUN (a carga inicial leva alguns segundos por 100 mil produtos)
+-- =========================================
+
+-- PASSO 1: Extensões
+CREATE EXTENSION IF NOT EXISTS unaccent WITH SCHEMA extensions;
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA extensions;
+
+-- PASSO 2: Configuração de texto em português sem acentos
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'produtos_pt') THEN
+        CREATE TEXT SEARCH CONFIGURATION produtos_pt (COPY = pg_catalog.portuguese);
+        ALTER TEXT SEARCH CONFIGURATION produtos_pt
+            ALTER MAPPING FOR hword, hword_part, word WITH extensions.unaccent, portuguese_stem;
+    END IF;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION produtos_normalizar(texto text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE PARALLEL SAFE STRICT
+AS $$
+    SELECT lower(extensions.unaccent('extensions.unaccent'::regdictionary, texto));
+$$;
+
+-- PASSO 3: Documento de busca por produto e vocabulário
+CREATE TABLE IF NOT EXISTS produtos_busca (
+    id bigint PRIMARY KEY REFERENCES produtos (id) ON DELETE CASCADE,
+    documento tsvector NOT NULL
+);
+
+-- Só o nome, com índice próprio: os produtos com os termos no nome entram no ranking
+-- mesmo quando o termo aparece em dezenas de milhares de descrições
+ALTER TABLE produtos_busca ADD COLUMN IF NOT EXISTS documento_nome tsvector;
+
+-- Palavras distintas (sem acento) de todos os produtos: algumas dezenas de
+-- milhares num catálogo real, contra milhões de nomes. Corrigir o termo aqui
+-- custa menos de 1 ms; comparar trigramas com cada produto custaria centenas.
+-- Palavras de produtos removidos ficam (no máximo viram uma sugestão sem resultado).
+CREATE TABLE IF NOT EXISTS produtos_vocabulario (
+    palavra text PRIMARY KEY
+);
+
+ALTER TABLE produtos_busca ENABLE ROW LEVEL SECURITY;
+ALTER TABLE produtos_vocabulario ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Permitir leitura pública da busca" ON produtos_busca;
+CREATE POLICY "Permitir leitura pública da busca"
+ON produtos_busca
+FOR SELECT
+TO public
+USING (true);
+
+DROP POLICY IF EXISTS "Permitir leitura pública do vocabulário" ON produtos_vocabulario;
+CREATE POLICY "Permitir leitura pública do vocabulário"
+ON produtos_vocabulario
+FOR SELECT
+TO public
+USING (true);
+
+-- Pesos: nome (A) > tags (B) > descrição (C)
+CREATE OR REPLACE FUNCTION produtos_documento(p_nome text, p_descricao text, p_tags text[])
+RETURNS tsvector
+LANGUAGE sql
+STABLE PARALLEL SAFE
+SET search_path = public, extensions
+AS $$
+    SELECT setweight(to_tsvector('produtos_pt', COALESCE(p_nome, '')), 'A')
+        || setweight(to_tsvector('produtos_pt', COALESCE(array_to_string(p_tags, ' '), '')), 'B')
+        || setweight(to_tsvector('produtos_pt', COALESCE(p_descricao, '')), 'C');
+$$;
+
+-- Palavras de 3+ letras (números e códigos não entram: não há o que corrigir neles)
+CREATE OR REPLACE FUNCTION produtos_palavras(p_texto text)
+RETURNS SETOF text
+LANGUAGE sql
+IMMUTABLE PARALLEL SAFE STRICT
+SET search_path = public, extensions
+AS $$
+    SELECT DISTINCT palavra
+    FROM regexp_split_to_table(produtos_normalizar(p_texto), '[^a-z]+') AS palavra
+    WHERE length(palavra) >= 3;
+$$;
+
+-- SECURITY DEFINER: quem grava produtos não precisa de permissão de escrita nas tabelas da busca
+CREATE OR REPLACE FUNCTION produtos_busca_atualizar()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, extensions
+AS $$
+BEGIN
+    INSERT INTO produtos_busca (id, documento, documento_nome)
+    VALUES (NEW.id, produtos_documento(NEW.nome, NEW.descricao, NEW.tags),
+            to_tsvector('produtos_pt', COALESCE(NEW.nome, '')))
+    ON CONFLICT (id) DO UPDATE SET documento = EXCLUDED.documento, documento_nome = EXCLUDED.documento_nome;
+
+    INSERT INTO produtos_vocabulario (palavra)
+    SELECT produtos_palavras(concat_ws(' ', NEW.nome, array_to_string(NEW.tags, ' '), NEW.descricao))
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$;
+
+-- Só quando mudam as colunas pesquisadas (ajustes de estoque/preço não pagam o to_tsvector)
+DROP TRIGGER IF EXISTS produtos_busca_atualizar ON produtos;
+CREATE TRIGGER produtos_busca_atualizar
+AFTER INSERT OR UPDATE OF nome, descricao, tags ON produtos
+FOR EACH ROW EXECUTE FUNCTION produtos_busca_atualizar();
+
+-- Carga inicial dos produtos existentes
+INSERT INTO produtos_busca (id, documento, documento_nome)
+SELECT id, produtos_documento(nome, descricao, tags), to_tsvector('produtos_pt', COALESCE(nome, ''))
+FROM produtos
+ON CONFLICT (id) DO UPDATE SET documento = EXCLUDED.documento, documento_nome = EXCLUDED.documento_nome;
+
+INSERT INTO produtos_vocabulario (palavra)
+SELECT DISTINCT palavra
+FROM produtos p, produtos_palavras(concat_ws(' ', p.nome, array_to_string(p.tags, ' '), p.descricao)) AS palavra
+ON CONFLICT DO NOTHING;
+
+-- PASSO 4: Índices
+CREATE INDEX IF NOT EXISTS produtos_busca_documento_idx ON produtos_busca USING gin (documento);
+CREATE INDEX IF NOT EXISTS produtos_busca_nome_idx ON produtos_busca USING gin (documento_nome);
+-- Nome idêntico ao termo buscado (sem acentos, maiúsculas nem plural): "cafe" acha "Café"
+CREATE INDEX IF NOT EXISTS produtos_busca_nome_exato_idx ON produtos_busca (documento_nome);
+CREATE INDEX IF NOT EXISTS produtos_vocabulario_trgm_idx ON produtos_vocabulario USING gin (palavra extensions.gin_trgm_ops);
+
+-- PASSO 5: Termo digitado → tsquery
+-- Palavras que não existem no catálogo são trocadas pela mais parecida do vocabulário
+-- e a consulta vira "original OU corrigida" ("luminaira" → 'luminaira' | 'luminaria').
+-- Aspas, OR e -exclusão continuam valendo (websearch_to_tsquery).
+CREATE OR REPLACE FUNCTION produtos_consulta(p_q text)
+RETURNS tsquery
+LANGUAGE sql
+STABLE
+SET search_path = public, extensions
+-- Tolerância a erros de digitação: 0.5 aceita ~1 letra errada em palavras de 6+ letras
+-- e começos de palavra ("liquidif" → "liquidificador")
+SET pg_trgm.word_similarity_threshold = 0.5
+AS $$
+    WITH termos AS (
+        SELECT t.termo, t.n, t.termo LIKE '-%' AS exclui,
+               regexp_replace(produtos_normalizar(t.termo), '[^a-z]', '', 'g') AS palavra
+        FROM regexp_split_to_table(btrim(p_q), '\s+') WITH ORDINALITY AS t(termo, n)
+    ),
+    sugestoes AS (
+        -- Só a palavra é trocada: "-" de exclusão e aspas de frase continuam no lugar
+        SELECT t.n, t.termo, t.exclui,
+               substring(t.termo from '^[^[:alpha:]]*') || s.sugestao
+                   || substring(t.termo from '[^[:alpha:]]*$') AS corrigido
+        FROM termos t
+        LEFT JOIN LATERAL (
+            SELECT v.palavra AS sugestao
+            FROM produtos_vocabulario v
+            WHERE length(t.palavra) >= 3
+              AND NOT EXISTS (SELECT 1 FROM produtos_vocabulario e WHERE e.palavra = t.palavra)
+              AND t.palavra <% v.palavra
+            ORDER BY t.palavra <<-> v.palavra, v.palavra
+            LIMIT 1
+        ) s ON true
+    ),
+    consultas AS (
+        -- Exclusão com erro de digitação exclui as duas formas nas duas consultas: numa
+        -- só, o OR abaixo traria de volta o que a outra excluiu
+        SELECT string_agg(CASE WHEN exclui AND corrigido IS NOT NULL THEN termo || ' ' || corrigido
+                               ELSE termo END, ' ' ORDER BY n) AS original,
+               string_agg(CASE WHEN exclui AND corrigido IS NOT NULL THEN termo || ' ' || corrigido
+                               ELSE COALESCE(corrigido, termo) END, ' ' ORDER BY n) AS corrigida
+        FROM sugestoes
+    )
+    SELECT CASE
+        WHEN c.corrigida = c.original THEN websearch_to_tsquery('produtos_pt', c.original)
+        ELSE websearch_to_tsquery('produtos_pt', c.original) || websearch_to_tsquery('produtos_pt', c.corrigida)
+    END
+    FROM consultas c;
+$$;
+
+-- PASSO 6: Busca paginada (p_limite itens a partir de p_offset), mais relevantes primeiro
+-- Relevância: 2 se o nome é o próprio termo, 1 se todos os termos estão no nome, mais
+-- ts_rank_cd com os pesos do documento (nome > tags > descrição), entre 0 e 1.
+-- Termos muito comuns casam dezenas de milhares de produtos: o ranking usa no máximo
+-- 1000 candidatos, primeiro os de nome idêntico e os com os termos no nome, completados
+-- com os que têm os termos só em tags/descrição. A paginação desses termos termina ali.
+CREATE OR REPLACE FUNCTION buscar_produtos(p_q text, p_limite integer DEFAULT 20, p_offset integer DEFAULT 0)
+RETURNS TABLE (produto jsonb, relevancia real)
+LANGUAGE sql
+STABLE
+SET search_path = public, extensions
+AS $$
+    WITH consulta AS MATERIALIZED (
+        SELECT produtos_consulta(p_q) AS tsq, to_tsvector('produtos_pt', p_q) AS nome_exato
+    ),
+    nome AS MATERIALIZED (
+        -- OFFSET 0: só o índice do nome é lido; o documento completo (exclusões em tags e
+        -- descrição) é conferido depois, nas linhas encontradas
+        SELECT n.id,
+               (CASE WHEN n.documento_nome = n.nome_exato THEN 2 ELSE 1 END
+                + ts_rank_cd(n.documento, n.tsq, 32))::real AS relevancia
+        FROM (
+            SELECT b.id, b.documento, b.documento_nome, c.tsq, c.nome_exato
+            FROM produtos_busca b, consulta c
+            WHERE b.documento_nome @@ c.tsq
+            OFFSET 0
+        ) n
+        WHERE n.documento @@ n.tsq
+        LIMIT 1000
+    ),
+    -- A relevância é calculada na leitura de cada grupo, sem reler os candidatos
+    candidatos AS (
+        SELECT b.id, (2 + ts_rank_cd(b.documento, c.tsq, 32))::real AS relevancia
+        FROM produtos_busca b, consulta c
+        WHERE b.documento_nome = c.nome_exato AND b.documento @@ c.tsq
+        UNION ALL
+        SELECT id, relevancia FROM nome
+        UNION ALL
+        -- Completa até 1000; quem também tem os termos no nome já veio do grupo anterior
+        (SELECT b.id, ts_rank_cd(b.documento, c.tsq, 32) AS relevancia
+         FROM produtos_busca b, consulta c
+         WHERE b.documento @@ c.tsq
+         LIMIT (SELECT 1000 - count(*) FROM nome))
+    ),
+    pagina AS (
+        SELECT id, max(relevancia) AS relevancia
+        FROM candidatos
+        GROUP BY id
+        ORDER BY relevancia DESC, id
+        LIMIT p_limite OFFSET p_offset
+    )
+    -- Só os produtos da página são lidos da tabela principal
+    SELECT to_jsonb(p), pg.relevancia
+    FROM pagina pg JOIN produtos p ON p.id = pg.id
+    ORDER BY pg.relevancia DESC, pg.id;
+$$;
+
+-- =========================================
+-- VERIFICAÇÃO (Opcional - Execute depois)
+-- =========================================
+
+-- Deve listar produtos mesmo com o termo sem acento
+SELECT produto->>'nome' AS nome, relevancia FROM buscar_produtos('cafe', 5);
+
+-- Mostra a correção aplicada a um termo com erro de digitação
+SELECT produtos_consulta('camizeta');
+
+-- Exclusão com erro de digitação continua excluindo (as duas formas)
+SELECT produtos_consulta('blusa -camizeta');
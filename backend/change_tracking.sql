@@ -0,0 +1,130 @@
+-- =========================================
+-- SCRIPT: Rastreamento de alterações (GET /products/changes)
+-- =========================================
+-- Clientes que mantêm uma cópia local do catálogo pedem só o que mudou desde
+-- a última sincronização, em vez de baixar a tabela inteira de novo.
+--
+-- Cada linha guarda em `versao` o id da transação que a gravou por último
+-- (xid8, monotônico) e em `updated_at` o horário. Exclusões deixam uma
+-- lápide em produtos_removidos com o id e a versão da transação que excluiu.
+--
+-- Por que id de transação e não uma sequence: valores de sequence são
+-- reservados no início e confirmados fora de ordem (a transação 11 pode
+-- confirmar antes da 10), e um cliente que já leu a 11 perderia a 10.
+-- A função produtos_alteracoes só devolve transações anteriores ao xmin do
+-- snapshot atual (todas já terminadas), então o token nunca pula nada.
+-- Uma transação longa em andamento só atrasa a sincronização até terminar.
+--
+-- Requer PostgreSQL 13+ (xid8). Updates que não mudam nada não geram versão nova.
+--
+-- COMO USAR:
+-- 1. Abra Supabase Dashboard → SQL Editor
+-- 2. Cole este arquivo e clique em RUN
+-- =========================================
+
+-- PASSO 1: Colunas de versão na tabela produtos (linhas existentes ficam com a versão desta transação)
+ALTER TABLE produtos
+    ADD COLUMN IF NOT EXISTS versao xid8 NOT NULL DEFAULT pg_current_xact_id(),
+    ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS produtos_versao_idx ON produtos (versao, id);
+
+-- PASSO 2: Lápides das exclusões
+CREATE TABLE IF NOT EXISTS produtos_removidos (
+    id bigint PRIMARY KEY,
+    versao xid8 NOT NULL DEFAULT pg_current_xact_id(),
+    deleted_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS produtos_removidos_versao_idx ON produtos_removidos (versao, id);
+
+-- Mesma regra de leitura da tabela produtos (enable_rls.sql); só os triggers gravam aqui
+ALTER TABLE produtos_removidos ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Permitir leitura pública de produtos removidos" ON produtos_removidos;
+CREATE POLICY "Permitir leitura pública de produtos removidos"
+ON produtos_removidos
+FOR SELECT
+TO public
+USING (true);
+
+-- PASSO 3: Triggers
+CREATE OR REPLACE FUNCTION produtos_marcar_versao()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Upsert da importação que não muda nada: mantém a versão (não reenvia a linha aos clientes)
+    IF TG_OP = 'UPDATE' AND NEW IS NOT DISTINCT FROM OLD THEN
+        RETURN NEW;
+    END IF;
+    NEW.versao := pg_current_xact_id();
+    NEW.updated_at := now();
+    RETURN NEW;
+END;
+$$;
+
+-- SECURITY DEFINER: quem exclui um produto não precisa de permissão de escrita nas lápides
+CREATE OR REPLACE FUNCTION produtos_registrar_remocao()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    INSERT INTO produtos_removidos (id, versao, deleted_at)
+    VALUES (OLD.id, pg_current_xact_id(), now())
+    ON CONFLICT (id) DO UPDATE SET versao = EXCLUDED.versao, deleted_at = EXCLUDED.deleted_at;
+    RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS produtos_versao ON produtos;
+CREATE TRIGGER produtos_versao
+BEFORE INSERT OR UPDATE ON produtos
+FOR EACH ROW EXECUTE FUNCTION produtos_marcar_versao();
+
+DROP TRIGGER IF EXISTS produtos_remocao ON produtos;
+CREATE TRIGGER produtos_remocao
+AFTER DELETE ON produtos
+FOR EACH ROW EXECUTE FUNCTION produtos_registrar_remocao();
+
+-- PASSO 4: Alterações depois de (p_versao, p_id), em ordem de versão
+-- Retorna {"horizonte": "<xmin>", "alteracoes": [{"versao", "id", "removido", "produto"}, ...]}
+CREATE OR REPLACE FUNCTION produtos_alteracoes(p_versao text DEFAULT '0', p_id bigint DEFAULT 0,
+                                               p_limite integer DEFAULT 1000)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+    WITH horizonte AS (
+        SELECT pg_snapshot_xmin(pg_current_snapshot()) AS xmin
+    ),
+    alteracoes AS (
+        SELECT p.versao, p.id, false AS removido, to_jsonb(p) AS produto
+        FROM produtos p, horizonte h
+        WHERE (p.versao, p.id) > (p_versao::xid8, p_id) AND p.versao < h.xmin
+        UNION ALL
+        SELECT r.versao, r.id, true, NULL
+        FROM produtos_removidos r, horizonte h
+        WHERE (r.versao, r.id) > (p_versao::xid8, p_id) AND r.versao < h.xmin
+        ORDER BY 1, 2
+        LIMIT p_limite
+    )
+    SELECT jsonb_build_object(
+        'horizonte', (SELECT xmin::text FROM horizonte),
+        'alteracoes', COALESCE(
+            (SELECT jsonb_agg(jsonb_build_object('versao', versao::text, 'id', id,
+                                                 'removido', removido, 'produto', produto)
+                              ORDER BY versao, id)
+             FROM alteracoes),
+            '[]'::jsonb)
+    );
+$$;
+
+-- =========================================
+-- VERIFICAÇÃO (Opcional - Execute depois)
+-- =========================================
+
+-- Primeiras 5 alterações desde o início (deve listar produtos com removido = false)
+SELECT produtos_alteracoes('0', 0, 5);
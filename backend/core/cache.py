@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from .config import cache_backend, cache_ttl, cache_max_entries, redis_url
+
+
+class CacheBackend:
+    """Interface comum dos backends de cache (chave -> valor serializável em JSON)"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, version: Optional[str] = None) -> Optional[Any]:
+        """Lê a entrada. `version` é a versão já lida pela requisição (evita lê-la de novo)"""
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, version: Optional[str] = None):
+        """Grava a entrada. Com `version` (lida antes da consulta ao banco), descarta o valor
+        se houve uma invalidação no meio: o resultado pode ser anterior à escrita"""
+        raise NotImplementedError
+
+    def invalidate(self):
+        """Descarta todas as entradas e avança a versão (chamado pelas rotas de escrita)"""
+        raise NotImplementedError
+
+    def version(self) -> str:
+        """Versão atual do catálogo: muda a cada invalidação (base dos ETags)"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+        }
+
+
+class LocalVersion:
+    """Contador de versão do processo (backends sem estado compartilhado).
+
+    O id aleatório de inicialização evita repetir versões de um processo anterior.
+    A janela de tempo (`window`, o TTL do cache) também faz parte da versão: com
+    vários workers ou réplicas, uma escrita em outro processo não avança este
+    contador, e sem a janela um ETag antigo valeria para sempre.
+    """
+
+    def __init__(self, window: float = 0):
+        self.window = window
+        self._boot = uuid.uuid4().hex[:8]
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def bump(self):
+        with self._lock:
+            self._counter += 1
+
+    def __str__(self):
+        return f"{self._boot}.{self._counter}.{int(time.time() // self.window) if self.window else 0}"
+
+
+class NullCache(CacheBackend):
+    """Cache desativado (CACHE_BACKEND=none). A versão ainda serve aos ETags"""
+
+    def __init__(self, ttl: float):
+        super().__init__()
+        self._version = LocalVersion(window=ttl)
+
+    def get(self, key, version=None):
+        self.misses += 1
+        return None
+
+    def set(self, key, value, ttl=None, version=None):
+        pass
+
+    def invalidate(self):
+        self._version.bump()
+
+    def version(self):
+        return str(self._version)
+
+
+class MemoryCache(CacheBackend):
+    """Cache em memória do processo com TTL e despejo LRU por quantidade de entradas"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        super().__init__()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = LocalVersion(window=ttl)
+
+    def get(self, key, version=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None, version=None):
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            if version is not None and version != self.version():
+                return
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._version.bump()
+
+    def version(self):
+        return str(self._version)
+
+    def stats(self):
+        data = super().stats()
+        data.update({"entries": len(self._entries), "max_entries": self.max_entries,
+                     "evictions": self.evictions})
+        return data
+
+
+class RedisCache(CacheBackend):
+    """Cache compartilhado entre réplicas (Redis ou compatível).
+
+    A invalidação incrementa um contador de geração que faz parte de todas as
+    chaves: entradas antigas deixam de ser lidas e expiram sozinhas pelo TTL.
+    """
+
+    def __init__(self, url: str, ttl: float, prefix: str = "produtos:cache"):
+        super().__init__()
+        try:
+            import redis  # Dependência opcional: só carregada com CACHE_BACKEND=redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requer o pacote 'redis' instalado")
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def version(self):
+        generation = self._client.get(f"{self.prefix}:generation") or b"0"
+        return generation.decode()
+
+    def _key(self, key: str, version: Optional[str] = None) -> str:
+        return f"{self.prefix}:{version or self.version()}:{key}"
+
+    def get(self, key, version=None):
+        raw = self._client.get(self._key(key, version))
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=None, version=None):
+        ttl = ttl if ttl is not None else self.ttl
+        # Gravada na geração lida antes da consulta: se já houve invalidação, fica
+        # numa geração antiga que ninguém lê mais
+        self._client.set(self._key(key, version), json.dumps(value), px=int(ttl * 1000))
+
+    def invalidate(self):
+        self._client.incr(f"{self.prefix}:generation")
+
+
+def create_cache(backend: str) -> CacheBackend:
+    if backend == "none":
+        return NullCache(ttl=cache_ttl)
+    if backend == "redis":
+        return RedisCache(redis_url, ttl=cache_ttl)
+    return MemoryCache(ttl=cache_ttl, max_entries=cache_max_entries)
+
+
+# Cache das listagens de produtos (invalidado por todas as rotas de escrita)
+product_cache = create_cache(cache_backend)
@@ -1,8 +1,10 @@
 import os
+import threading
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from supabase import Client, AsyncClient
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -11,12 +13,104 @@ url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_KEY")
 rate_limit_read: str = os.environ.get("RATE_LIMIT_READ", "10/minute")
 rate_limit_write: str = os.environ.get("RATE_LIMIT_WRITE", "5/minute")
+# Armazenamento do rate limit: memory:// (por réplica) ou redis://host:6379 (compartilhado)
+rate_limit_storage_uri: str = os.environ.get("RATE_LIMIT_STORAGE_URI", "memory://")
+rate_limit_strategy: str = os.environ.get("RATE_LIMIT_STRATEGY", "sliding-window-counter")
+# IPs/redes dos proxies (ex: Traefik) cujo X-Forwarded-For é confiável
+trusted_proxies = [p for p in os.environ.get("TRUSTED_PROXIES", "").split(",") if p.strip()]
+import_chunk_size: int = int(os.environ.get("IMPORT_CHUNK_SIZE", "500"))
+import_workers: int = int(os.environ.get("IMPORT_WORKERS", "2"))
+import_job_retention: int = int(os.environ.get("IMPORT_JOB_RETENTION", "100"))
+# Jobs de importação: memory (por processo) ou redis (status e relatório visíveis em todos os
+# workers e réplicas, usa REDIS_URL); no Redis cada job expira IMPORT_JOB_TTL segundos após
+# a última atualização
+import_jobs_backend: str = os.environ.get("IMPORT_JOBS_BACKEND", "memory").lower()
+import_job_ttl: float = float(os.environ.get("IMPORT_JOB_TTL", "86400"))
+# Máximo de erros por linha guardados no relatório de cada importação
+import_error_limit: int = int(os.environ.get("IMPORT_ERROR_LIMIT", "1000"))
+batch_chunk_size: int = int(os.environ.get("BATCH_CHUNK_SIZE", "500"))
+# Produtos por leitura no GET /products/export (o Supabase limita cada resposta a 1000 linhas por padrão)
+export_page_size: int = int(os.environ.get("EXPORT_PAGE_SIZE", "1000"))
+compression_min_size: int = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+# Prepara o cliente Supabase em segundo plano logo após a inicialização (a 1ª consulta não paga o import)
+supabase_warmup: bool = os.environ.get("SUPABASE_WARMUP", "true").lower() in ("1", "true", "yes")
+# Cabeçalho Server-Timing nas respostas (tempo de auth/Supabase visível no DevTools do navegador)
+server_timing_enabled: bool = os.environ.get("SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+
+# Cache das listagens: memory (padrão), redis (várias réplicas) ou none
+cache_backend: str = os.environ.get("CACHE_BACKEND", "memory").lower()
+cache_ttl: float = float(os.environ.get("CACHE_TTL", "30"))
+cache_max_entries: int = int(os.environ.get("CACHE_MAX_ENTRIES", "256"))
+redis_url: str = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+# Eventos SSE (GET /products/stream): memory (por processo) ou redis (pub/sub entre réplicas, usa REDIS_URL)
+events_backend: str = os.environ.get("EVENTS_BACKEND", "memory").lower()
+# Eventos pendentes por cliente antes de ele receber um "resync"
+events_queue_size: int = int(os.environ.get("EVENTS_QUEUE_SIZE", "256"))
+events_heartbeat: float = float(os.environ.get("EVENTS_HEARTBEAT", "15"))
+
+# Autenticação: remote (supabase.auth.get_user) ou local (assinatura do JWT)
+auth_verify_mode: str = os.environ.get("AUTH_VERIFY_MODE", "remote").lower()
+supabase_jwt_secret: str = os.environ.get("SUPABASE_JWT_SECRET")
+supabase_jwks_url: str = os.environ.get("SUPABASE_JWKS_URL")
+auth_cache_ttl: float = float(os.environ.get("AUTH_CACHE_TTL", "60"))
+auth_cache_max_entries: int = int(os.environ.get("AUTH_CACHE_MAX_ENTRIES", "1024"))
 
 if not url or not key:
     print("Aviso: SUPABASE_URL e SUPABASE_KEY são necessários no arquivo .env")
 
-# Inicializar cliente Supabase
-supabase: Client = create_client(url, key) if url and key else None
+class LazySupabase:
+    """Cliente Supabase síncrono criado no primeiro uso, não no import.
+
+    O pacote supabase (auth, storage, realtime...) só é carregado quando alguma rota
+    precisa dele. Com `--preload` o módulo é importado antes do fork e cada worker
+    cria o próprio cliente (nenhum socket compartilhado entre processos).
+    """
+
+    def __init__(self, url: str, key: str):
+        self._url = url
+        self._key = key
+        self._client: Optional["Client"] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> "Client":
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from supabase import create_client
+                    self._client = create_client(self._url, self._key)
+        return self._client
+
+    def reset(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+# Inicializar cliente Supabase (sob demanda)
+supabase: Optional[LazySupabase] = LazySupabase(url, key) if url and key else None
+
+# Cliente assíncrono: criado sob demanda dentro do event loop e compartilhado por todas
+# as requisições (um único pool de conexões HTTP keep-alive por processo)
+_async_supabase: Optional["AsyncClient"] = None
+
+async def get_async_supabase() -> Optional["AsyncClient"]:
+    global _async_supabase
+    if _async_supabase is None and url and key:
+        from supabase import acreate_client
+        _async_supabase = await acreate_client(url, key)
+    return _async_supabase
+
+
+def _reset_clients_after_fork():
+    # Processo filho (worker do gunicorn) nunca reaproveita clientes/conexões do pai
+    global _async_supabase
+    _async_supabase = None
+    if supabase is not None:
+        supabase.reset()
+
 
-# Inicializar o Limiter
-limiter = Limiter(key_func=get_remote_address)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_clients_after_fork)
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import threading
+from typing import Dict, List, Optional
+
+from .config import events_backend, events_queue_size, events_heartbeat, redis_url
+from .metrics import registry
+
+events_published = registry.counter(
+    "catalog_events_published_total", "Eventos de alteração do catálogo publicados", ("op",))
+events_resyncs = registry.counter(
+    "catalog_events_resync_total", "Clientes SSE lentos que perderam eventos e receberam resync")
+
+# Enviado a um cliente cuja fila encheu: os eventos pendentes foram descartados e ele
+# deve recarregar o catálogo (ou usar GET /products/changes com o último token)
+RESYNC = {"op": "resync"}
+
+
+def change_event(op: str, product_id, fields: Optional[List[str]] = None) -> Dict:
+    """Evento compacto de alteração: {"op": created|updated|deleted, "id", "fields"}"""
+    event = {"op": op, "id": product_id}
+    if fields is not None:
+        event["fields"] = sorted(fields)
+    return event
+
+
+class EventHub:
+    """Distribui eventos para as conexões SSE deste processo.
+
+    Cada cliente tem uma fila limitada; publicar nunca bloqueia quem grava. Se um
+    cliente não acompanha, a fila dele é esvaziada e recebe um único RESYNC.
+    `publish` pode ser chamado de qualquer thread (importação CSV roda em threads):
+    a entrega é agendada no event loop dono de cada fila.
+    """
+
+    def __init__(self, queue_size: int, bridge=None):
+        self.queue_size = queue_size
+        self._bridge = bridge
+        self._subscribers: Dict[asyncio.Queue, asyncio.AbstractEventLoop] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, events: List[Dict]):
+        if not events:
+            return
+        if len(events) > self.queue_size:
+            # Lote maior que a fila de um cliente (ex: importação): um único resync em vez de milhares
+            events = [RESYNC]
+        for event in events:
+            events_published.inc(op=event["op"])
+        if self._bridge:
+            # Com ponte, todas as réplicas (inclusive esta) recebem pelo canal compartilhado
+            try:
+                self._bridge.publish(events)
+            except Exception as e:
+                # A escrita já foi confirmada: falha na ponte não pode virar erro da requisição
+                print(f"Aviso: falha ao publicar eventos do catálogo: {e}")
+        else:
+            self.deliver(events)
+
+    def deliver(self, events: List[Dict]):
+        """Entrega local: uma chamada por event loop, não uma por cliente"""
+        with self._lock:
+            by_loop: Dict[asyncio.AbstractEventLoop, List[asyncio.Queue]] = {}
+            for queue, loop in self._subscribers.items():
+                by_loop.setdefault(loop, []).append(queue)
+        for loop, queues in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(self._put, queues, events)
+            except RuntimeError:
+                # Loop encerrado (worker desligando): descarta as filas dele
+                for queue in queues:
+                    self.unsubscribe(queue)
+
+    @staticmethod
+    def _put(queues: List[asyncio.Queue], events: List[Dict]):
+        for queue in queues:
+            for event in events:
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(RESYNC)
+                    events_resyncs.inc()
+                    break
+
+    def subscribe(self) -> asyncio.Queue:
+        """Nova fila no event loop atual (chamar de dentro de uma corrotina)"""
+        if self._bridge:
+            self._bridge.start(self)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def stats(self) -> Dict:
+        return {"backend": type(self._bridge).__name__ if self._bridge else "memory",
+                "clients": len(self._subscribers)}
+
+
+class RedisEventBridge:
+    """Pub/sub no Redis para que eventos de uma réplica cheguem aos clientes de todas.
+
+    A thread de escuta só começa na primeira conexão SSE (depois do fork dos workers).
+    """
+
+    def __init__(self, url: str, channel: str = "produtos:eventos"):
+        try:
+            import redis  # Dependência opcional: só carregada com EVENTS_BACKEND=redis
+        except ImportError:
+            raise RuntimeError("EVENTS_BACKEND=redis requer o pacote 'redis' instalado")
+        self.channel = channel
+        self._client = redis.Redis.from_url(url)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def publish(self, events: List[Dict]):
+        self._client.publish(self.channel, json.dumps(events, separators=(",", ":")))
+
+    def start(self, hub: EventHub):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._listen, args=(hub,), daemon=True)
+                self._thread.start()
+
+    def _listen(self, hub: EventHub):
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        for message in pubsub.listen():
+            hub.deliver(json.loads(message["data"]))
+
+
+def create_event_hub(backend: str) -> EventHub:
+    bridge = RedisEventBridge(redis_url) if backend == "redis" else None
+    return EventHub(events_queue_size, bridge)
+
+
+def format_sse(event: Dict) -> str:
+    return f"event: {event['op']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+async def sse_stream(hub: EventHub, is_disconnected, heartbeat: float = events_heartbeat):
+    """Gera a resposta text/event-stream de um cliente até ele desconectar"""
+    queue = hub.subscribe()
+    try:
+        # Reconexão automática do EventSource em 3 s
+        yield "retry: 3000\n\n"
+        while not await is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                # Comentário SSE: mantém a conexão viva em proxies com timeout de ociosidade
+                yield ": ping\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        hub.unsubscribe(queue)
+
+
+# Eventos de alteração do catálogo (publicados por ProductService._after_write)
+event_hub = create_event_hub(events_backend)
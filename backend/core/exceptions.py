@@ -11,3 +11,7 @@ class ProductAlreadyExistsError(ServiceError):
 class ResourceNotFoundError(ServiceError):
     """Levantado quando um recurso não é encontrado"""
     pass
+
+class InvalidParameterError(ServiceError):
+    """Levantado quando um parâmetro da requisição é inválido (ex: cursor, campos)"""
+    pass
@@ -0,0 +1,228 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .config import server_timing_enabled
+
+# Buckets em segundos (de 5 ms a 10 s): cobre cache, Supabase e importações pequenas
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Tempos da requisição atual (para o cabeçalho Server-Timing); None fora de uma requisição
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Contador monotônico com labels (formato texto do Prometheus)"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[n]) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[n]) for n in self.labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in items]
+
+
+class Histogram:
+    """Histograma com buckets fixos e labels (formato texto do Prometheus)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Por combinação de labels: [contagens por bucket..., soma, total]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[n]) for n in self.labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(tuple(str(labels[n]) for n in self.labels))
+        return state[-1] if state else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+
+        lines = []
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas expostas em /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP por rota",
+    ("method", "route", "status"))
+supabase_request_duration = registry.histogram(
+    "supabase_request_duration_seconds", "Latência das chamadas ao Supabase (PostgREST e Auth)",
+    ("operation", "table", "outcome"))
+supabase_errors = registry.counter(
+    "supabase_errors_total", "Chamadas ao Supabase que falharam, por código de erro",
+    ("operation", "table", "error"))
+auth_duration = registry.histogram(
+    "auth_verify_duration_seconds", "Tempo para autenticar a requisição (inclui acertos de cache)",
+    ("source",))
+
+
+def record_timing(name: str, seconds: float):
+    """Acumula um tempo no Server-Timing da requisição atual (se houver uma)"""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def _error_label(error: Exception) -> str:
+    # APIError do PostgREST traz o código do Postgres (ex: 23505); senão, o tipo da exceção
+    return str(getattr(error, "code", None) or type(error).__name__)
+
+
+@contextmanager
+def supabase_call(operation: str, table: str):
+    """Mede uma chamada ao Supabase: `with supabase_call("select", "produtos"): query.execute()`"""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception as e:
+        outcome = "error"
+        supabase_errors.inc(operation=operation, table=table, error=_error_label(e))
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        supabase_request_duration.observe(elapsed, operation=operation, table=table, outcome=outcome)
+        record_timing(f"db-{operation}", elapsed)
+
+
+def execute(query, operation: str, table: str = "produtos"):
+    """query.execute() do cliente síncrono, medido"""
+    with supabase_call(operation, table):
+        return query.execute()
+
+
+async def execute_async(query, operation: str, table: str = "produtos"):
+    """await query.execute() do cliente assíncrono, medido"""
+    with supabase_call(operation, table):
+        return await query.execute()
+
+
+def _server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    # Chamadas com o mesmo nome são somadas (ex: 3 selects viram um único db-select com desc="3x")
+    grouped: Dict[str, List[float]] = {}
+    for name, seconds in timings:
+        grouped.setdefault(name, []).append(seconds)
+    parts = [f'{name};dur={sum(values) * 1000:.2f};desc="{len(values)}x"' for name, values in grouped.items()]
+    parts.append(f"app;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: histograma de latência por rota e cabeçalho Server-Timing opcional"""
+
+    def __init__(self, app, server_timing: bool = server_timing_enabled):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        status_code = 500
+
+        async def send_with_metrics(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    header = _server_timing_header(timings, time.perf_counter() - started)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            _request_timings.reset(token)
+            # Rota do roteador (/products/{product_id}), nunca o path cru: cardinalidade limitada
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started, method=scope["method"],
+                route=getattr(route, "path", "unmatched"), status=status_code)
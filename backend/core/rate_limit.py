@@ -0,0 +1,75 @@
+import hashlib
+import ipaddress
+from typing import List
+
+from fastapi import Request
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+from .config import rate_limit_storage_uri, rate_limit_strategy, trusted_proxies
+
+
+def _parse_networks(values: List[str]):
+    networks = []
+    for value in values:
+        try:
+            networks.append(ipaddress.ip_network(value.strip(), strict=False))
+        except ValueError:
+            print(f"Aviso: TRUSTED_PROXIES ignorou valor inválido '{value}'")
+    return networks
+
+
+_trusted_networks = _parse_networks(trusted_proxies)
+
+
+def _is_trusted(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_networks)
+
+
+def client_ip(request: Request) -> str:
+    """IP real do cliente.
+
+    Atrás do Traefik o endereço remoto é o do proxy. O X-Forwarded-For só é
+    considerado quando a conexão vem de um proxy confiável (TRUSTED_PROXIES),
+    senão qualquer cliente poderia escolher o próprio balde de limite.
+    """
+    remote = get_remote_address(request)
+    if not _trusted_networks or not _is_trusted(remote):
+        return remote
+
+    # Da direita para a esquerda: o primeiro endereço que não é proxy confiável é o cliente
+    forwarded = request.headers.get("x-forwarded-for", "")
+    for hop in reversed([h.strip() for h in forwarded.split(",") if h.strip()]):
+        if not _is_trusted(hop):
+            return hop
+    return remote
+
+
+def user_or_ip(request: Request) -> str:
+    """Chave por usuário nas rotas autenticadas (preenchida por get_current_user), senão por IP"""
+    user_id = getattr(request.state, "user_id", None)
+    if user_id:
+        return f"user:{user_id}"
+
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        # Token ainda não verificado: agrupa pelo hash do token, nunca pelo token em si
+        return "token:" + hashlib.sha256(authorization[7:].encode("utf-8")).hexdigest()[:16]
+    return client_ip(request)
+
+
+# Inicializar o Limiter
+# memory:// (padrão) conta por réplica; redis://... compartilha os contadores entre réplicas.
+# As estratégias moving-window e sliding-window-counter no Redis usam um script Lua:
+# uma única ida ao Redis por verificação.
+limiter = Limiter(
+    key_func=client_ip,
+    storage_uri=rate_limit_storage_uri,
+    strategy=rate_limit_strategy,
+    key_prefix="produtos",
+    in_memory_fallback_enabled=not rate_limit_storage_uri.startswith("memory://"),
+)
@@ -0,0 +1,14 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class OrjsonResponse(JSONResponse):
+    """JSON serializado pelo orjson, sem passar pelo jsonable_encoder do FastAPI.
+
+    Para conteúdo que já é JSON puro (linhas devolvidas pelo PostgREST) e não tem
+    modelo de resposta: a rota devolve esta resposta direto e evita a conversão
+    recursiva item a item (~30 ms por mil produtos, contra ~0,5 ms do orjson).
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
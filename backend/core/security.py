@@ -1,22 +1,149 @@
-from fastapi import HTTPException, status, Depends
+import base64
+import hashlib
+import json
+import threading
+import time
+from typing import Optional
+
+from fastapi import HTTPException, Request, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from .config import supabase
+
+from .cache import MemoryCache
+from .metrics import auth_duration, record_timing, supabase_call
+from .config import (supabase, auth_verify_mode, supabase_jwt_secret, supabase_jwks_url,
+                     auth_cache_ttl, auth_cache_max_entries)
 
 security = HTTPBearer()
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+# Tokens já verificados (chave = hash do token, nunca o token em si).
+# Fica sempre em memória do processo: tokens não devem ir para um cache compartilhado.
+token_cache = MemoryCache(ttl=auth_cache_ttl, max_entries=auth_cache_max_entries)
+
+
+class VerificationStats:
+    """Latência das verificações que não vieram do cache"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, elapsed_ms: float):
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def to_dict(self):
+        return {
+            "verifications": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+verification_stats = VerificationStats()
+_jwks_client = None
+
+
+def _token_expiration(token: str) -> Optional[float]:
+    # Lê o claim exp sem validar a assinatura (só para limitar o tempo em cache)
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except Exception:
+        return None
+
+
+def _verify_local(token: str):
+    global _jwks_client
+    try:
+        import jwt  # PyJWT só é necessário (e carregado) com AUTH_VERIFY_MODE=local
+    except ImportError:
+        raise RuntimeError("AUTH_VERIFY_MODE=local requer o pacote PyJWT")
+
+    if supabase_jwks_url:
+        if _jwks_client is None:
+            _jwks_client = jwt.PyJWKClient(supabase_jwks_url)
+        signing_key = _jwks_client.get_signing_key_from_jwt(token).key
+        algorithms = ["RS256", "ES256"]
+    elif supabase_jwt_secret:
+        signing_key = supabase_jwt_secret
+        algorithms = ["HS256"]
+    else:
+        raise RuntimeError("Defina SUPABASE_JWT_SECRET ou SUPABASE_JWKS_URL para verificação local")
+
+    claims = jwt.decode(token, signing_key, algorithms=algorithms, audience="authenticated")
+    return {"id": claims.get("sub"), "email": claims.get("email"), "role": claims.get("role")}
+
+
+def _verify_remote(token: str):
+    if not supabase:
+        raise HTTPException(status_code=500, detail="Supabase não configurado")
+    with supabase_call("auth.get_user", "auth"):
+        return supabase.auth.get_user(token)
+
+
+def verify_token(token: str):
+    started = time.perf_counter()
+    token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    cached = token_cache.get(token_hash)
+    if cached is not None:
+        _record_auth_time("cache", started)
+        return cached
+
+    try:
+        user = _verify_local(token) if auth_verify_mode == "local" else _verify_remote(token)
+    finally:
+        elapsed = _record_auth_time(auth_verify_mode, started)
+    verification_stats.record(elapsed * 1000)
+
+    if user:
+        # Nunca manter em cache além da expiração do próprio JWT
+        exp = _token_expiration(token)
+        if exp is not None:
+            ttl = min(auth_cache_ttl, exp - time.time())
+            if ttl > 0:
+                token_cache.set(token_hash, user, ttl=ttl)
+    return user
+
+
+def _record_auth_time(source: str, started: float) -> float:
+    # Histograma do /metrics + entrada "auth" no Server-Timing da requisição
+    elapsed = time.perf_counter() - started
+    auth_duration.observe(elapsed, source=source)
+    record_timing("auth", elapsed)
+    return elapsed
+
+
+def auth_stats():
+    data = token_cache.stats()
+    data.update(verification_stats.to_dict())
+    data["mode"] = auth_verify_mode
+    return data
+
+
+def _user_id(user) -> Optional[str]:
+    # Modo local devolve os claims (dict); modo remoto devolve o UserResponse do Supabase
+    if isinstance(user, dict):
+        return user.get("id")
+    return getattr(getattr(user, "user", None), "id", None)
+
+
+def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
     try:
-        if not supabase:
-             raise HTTPException(status_code=500, detail="Supabase não configurado")
-        
-        user = supabase.auth.get_user(token)
+        user = verify_token(token)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token inválido ou expirado",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        # Usado pelo rate limit por usuário (core.rate_limit.user_or_ip)
+        request.state.user_id = _user_id(user)
         return user
     except Exception as e:
         print(f"Erro Auth: {e}")
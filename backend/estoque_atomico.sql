@@ -0,0 +1,54 @@
+-- =========================================
+-- SCRIPT: Ajuste atômico de estoque (PATCH /products/{id} com estoque_delta)
+-- =========================================
+-- Entradas e saídas de estoque não precisam mais ler o valor atual, somar
+-- no cliente e gravar de volta (read-modify-write). A função soma o delta
+-- no próprio UPDATE, então movimentos simultâneos nunca se sobrescrevem.
+--
+-- Outras colunas enviadas no mesmo PATCH (nome, preço...) vêm em p_dados e
+-- são gravadas no mesmo UPDATE: ou tudo é gravado, ou nada (por exemplo,
+-- quando falta estoque ou o novo nome já existe).
+--
+-- Retorna o produto atualizado, ou nenhuma linha se o id não existir.
+-- Se o estoque ficar negativo, levanta erro 23514 (a API responde 400).
+-- Estoque NULL conta como 0: uma entrada positiva é aceita normalmente.
+--
+-- COMO USAR:
+-- 1. Abra Supabase Dashboard → SQL Editor
+-- 2. Cole este arquivo e clique em RUN
+-- =========================================
+
+-- PASSO 1: Remove a versão anterior (só id e delta), que conflitaria com a nova
+DROP FUNCTION IF EXISTS ajustar_estoque(bigint, integer);
+
+-- PASSO 2: Delta de estoque + colunas opcionais num único comando
+CREATE OR REPLACE FUNCTION ajustar_estoque(p_id bigint, p_delta integer, p_dados jsonb DEFAULT '{}')
+RETURNS SETOF produtos
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE produtos p
+    SET nome = CASE WHEN p_dados ? 'nome' THEN d.nome ELSE p.nome END,
+        descricao = CASE WHEN p_dados ? 'descricao' THEN d.descricao ELSE p.descricao END,
+        categoria = CASE WHEN p_dados ? 'categoria' THEN d.categoria ELSE p.categoria END,
+        tags = CASE WHEN p_dados ? 'tags' THEN d.tags ELSE p.tags END,
+        preco = CASE WHEN p_dados ? 'preco' THEN d.preco ELSE p.preco END,
+        estoque = COALESCE(p.estoque, 0) + p_delta
+    FROM jsonb_populate_record(NULL::produtos, p_dados) d
+    WHERE p.id = p_id AND COALESCE(p.estoque, 0) + p_delta >= 0
+    RETURNING p.*;
+
+    IF NOT FOUND AND EXISTS (SELECT 1 FROM produtos WHERE id = p_id) THEN
+        RAISE EXCEPTION 'Estoque insuficiente para o produto %', p_id
+            USING ERRCODE = '23514';
+    END IF;
+END;
+$$;
+
+-- =========================================
+-- VERIFICAÇÃO (Opcional - Execute depois)
+-- =========================================
+
+-- Soma 0 ao estoque do produto 1 (não altera nada, só confirma que a função existe)
+SELECT id, nome, estoque FROM ajustar_estoque(1, 0);
@@ -0,0 +1,136 @@
+-- =========================================
+-- SCRIPT: Contagem de categorias e tags (GET /products/facets)
+-- =========================================
+-- Os filtros do painel precisam de "categoria → quantos produtos" e
+-- "tag → quantos produtos". Em vez de agregar a tabela inteira a cada
+-- consulta, a tabela produtos_facetas guarda as contagens prontas e é
+-- atualizada pelos próprios comandos de escrita (triggers por comando,
+-- não por linha: uma importação de 500 linhas aplica um único agregado).
+--
+-- A leitura custa o mesmo com 100 ou 1 milhão de produtos: só percorre
+-- as categorias e tags distintas. A linha ('total', '') guarda o total de produtos.
+--
+-- Tags repetidas dentro do mesmo produto contam uma vez. Categorias e
+-- tags vazias não entram nas contagens.
+--
+-- COMO USAR:
+-- 1. Abra Supabase Dashboard → SQL Editor
+-- 2. Cole este arquivo e clique em RUN
+-- =========================================
+
+-- PASSO 1: Tabela de contagens
+CREATE TABLE IF NOT EXISTS produtos_facetas (
+    tipo text NOT NULL CHECK (tipo IN ('total', 'categoria', 'tag')),
+    valor text NOT NULL,
+    total integer NOT NULL,
+    PRIMARY KEY (tipo, valor)
+);
+
+ALTER TABLE produtos_facetas ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Permitir leitura pública das facetas" ON produtos_facetas;
+CREATE POLICY "Permitir leitura pública das facetas"
+ON produtos_facetas
+FOR SELECT
+TO public
+USING (true);
+
+-- PASSO 2: Aplica a diferença entre as linhas antigas e novas de um comando
+-- (chamada pelos triggers com as tabelas de transição já convertidas em jsonb)
+CREATE OR REPLACE FUNCTION produtos_facetas_aplicar(p_antigos jsonb, p_novos jsonb)
+RETURNS void
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    WITH linhas AS (
+        SELECT r.id, r.categoria, r.tags, -1 AS sinal
+        FROM jsonb_to_recordset(COALESCE(p_antigos, '[]'::jsonb)) AS r(id bigint, categoria text, tags text[])
+        UNION ALL
+        SELECT r.id, r.categoria, r.tags, 1
+        FROM jsonb_to_recordset(COALESCE(p_novos, '[]'::jsonb)) AS r(id bigint, categoria text, tags text[])
+    ),
+    deltas AS (
+        SELECT 'total' AS tipo, '' AS valor, sinal FROM linhas
+        UNION ALL
+        SELECT 'categoria', categoria, sinal FROM linhas WHERE COALESCE(categoria, '') <> ''
+        UNION ALL
+        SELECT DISTINCT ON (l.id, l.sinal, t.tag) 'tag', t.tag, l.sinal
+        FROM linhas l CROSS JOIN LATERAL unnest(l.tags) AS t(tag)
+        WHERE COALESCE(t.tag, '') <> ''
+    ),
+    agregado AS (
+        SELECT tipo, valor, SUM(sinal)::integer AS total
+        FROM deltas
+        GROUP BY tipo, valor
+        HAVING SUM(sinal) <> 0
+        -- Ordem fixa: comandos simultâneos travam as mesmas linhas na mesma ordem (sem deadlock)
+        ORDER BY tipo, valor
+    )
+    INSERT INTO produtos_facetas (tipo, valor, total)
+    SELECT tipo, valor, total FROM agregado
+    ON CONFLICT (tipo, valor) DO UPDATE SET total = produtos_facetas.total + EXCLUDED.total;
+
+    DELETE FROM produtos_facetas WHERE total <= 0 AND tipo <> 'total';
+$$;
+
+CREATE OR REPLACE FUNCTION produtos_facetas_trigger()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Cada tabela de transição só existe no trigger do evento correspondente
+    IF TG_OP = 'INSERT' THEN
+        PERFORM produtos_facetas_aplicar(NULL, (SELECT jsonb_agg(n) FROM novos n));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM produtos_facetas_aplicar((SELECT jsonb_agg(a) FROM antigos a), (SELECT jsonb_agg(n) FROM novos n));
+    ELSE
+        PERFORM produtos_facetas_aplicar((SELECT jsonb_agg(a) FROM antigos a), NULL);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- PASSO 3: Triggers por comando (um por evento: tabelas de transição não aceitam vários eventos)
+DROP TRIGGER IF EXISTS produtos_facetas_insert ON produtos;
+CREATE TRIGGER produtos_facetas_insert
+AFTER INSERT ON produtos
+REFERENCING NEW TABLE AS novos
+FOR EACH STATEMENT EXECUTE FUNCTION produtos_facetas_trigger();
+
+DROP TRIGGER IF EXISTS produtos_facetas_update ON produtos;
+CREATE TRIGGER produtos_facetas_update
+AFTER UPDATE ON produtos
+REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+FOR EACH STATEMENT EXECUTE FUNCTION produtos_facetas_trigger();
+
+DROP TRIGGER IF EXISTS produtos_facetas_delete ON produtos;
+CREATE TRIGGER produtos_facetas_delete
+AFTER DELETE ON produtos
+REFERENCING OLD TABLE AS antigos
+FOR EACH STATEMENT EXECUTE FUNCTION produtos_facetas_trigger();
+
+-- PASSO 4: Contagem inicial (e recálculo completo, se um dia divergir)
+CREATE OR REPLACE FUNCTION produtos_facetas_recalcular()
+RETURNS void
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    DELETE FROM produtos_facetas;
+    INSERT INTO produtos_facetas (tipo, valor, total) VALUES ('total', '', 0);
+    SELECT produtos_facetas_aplicar(NULL, (SELECT jsonb_agg(p) FROM produtos p));
+$$;
+
+-- Trava as escritas durante o recálculo: nenhum comando fica contado duas vezes ou de fora
+BEGIN;
+LOCK TABLE produtos IN SHARE MODE;
+SELECT produtos_facetas_recalcular();
+COMMIT;
+
+-- =========================================
+-- VERIFICAÇÃO (Opcional - Execute depois)
+-- =========================================
+
+-- Total de produtos e as 10 categorias/tags mais usadas
+SELECT tipo, valor, total FROM produtos_facetas ORDER BY tipo, total DESC LIMIT 10;
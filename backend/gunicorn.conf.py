@@ -0,0 +1,33 @@
+"""Configuração do gunicorn (workers uvicorn) usada pelo Dockerfile.
+
+Variáveis de ambiente:
+    WEB_CONCURRENCY  número de workers (padrão 1; ex: 1 por CPU do container)
+    PRELOAD          "true" carrega o app antes do fork (workers compartilham memória copy-on-write)
+    PORT             porta HTTP (padrão 8000)
+    GUNICORN_TIMEOUT segundos sem resposta antes de reiniciar um worker (importações grandes: aumente)
+    GRACEFUL_TIMEOUT segundos para as requisições em andamento terminarem num restart (padrão 30)
+
+Estado em memória é por worker: cache, rate limit memory:// e os jobs de importação
+(GET /products/upload/{job_id} e ?retry_of= podem cair em outro worker e responder 404).
+Com mais de um worker use CACHE_BACKEND=redis, IMPORT_JOBS_BACKEND=redis e
+RATE_LIMIT_STORAGE_URI=redis://. Com EVENTS_BACKEND=redis os eventos de
+GET /products/stream chegam aos clientes de todos os workers e réplicas.
+
+Conexões SSE abertas só terminam no graceful_timeout: um restart espera até lá.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = os.environ.get("PRELOAD", "true").lower() in ("1", "true", "yes")
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+accesslog = "-"
+
+if preload_app and workers > 1:
+    # Pacote do cliente carregado no master: páginas compartilhadas (copy-on-write) pelos workers.
+    # Só o módulo; os clientes e conexões são criados em cada worker depois do fork.
+    # Com um worker não há o que compartilhar e o import só atrasaria a inicialização.
+    import supabase  # noqa: F401
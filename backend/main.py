@@ -1,14 +1,40 @@
+import asyncio
+import importlib
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
-from core.config import limiter
-from core.exceptions import ProductAlreadyExistsError, ServiceError, ResourceNotFoundError
+from core.cache import product_cache
+from core.config import compression_min_size, supabase_warmup, get_async_supabase
+from core.events import event_hub
+from core.metrics import MetricsMiddleware, registry
+from core.rate_limit import limiter
+from core.security import auth_stats
+from core.exceptions import ProductAlreadyExistsError, ServiceError, ResourceNotFoundError, InvalidParameterError
 from routers import product_routes, upload_routes
 
-app = FastAPI()
+async def _warm_up_supabase():
+    try:
+        # Import numa thread: o event loop continua atendendo enquanto o pacote carrega
+        await run_in_threadpool(importlib.import_module, "supabase")
+        await get_async_supabase()
+    except Exception as e:
+        print(f"Aviso: falha ao preparar o cliente Supabase: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if supabase_warmup:
+        # Em segundo plano: o servidor já aceita requisições (health check) enquanto isso
+        app.state.warm_up = asyncio.create_task(_warm_up_supabase())
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 # Configuração do Limiter
 app.state.limiter = limiter
@@ -37,6 +63,13 @@ async def resource_not_found_handler(request: Request, exc: ResourceNotFoundErro
         content={"detail": exc.message}
     )
 
+@app.exception_handler(InvalidParameterError)
+async def invalid_parameter_handler(request: Request, exc: InvalidParameterError):
+    return JSONResponse(
+        status_code=400,
+        content={"detail": exc.message}
+    )
+
 @app.exception_handler(ServiceError)
 async def service_error_handler(request: Request, exc: ServiceError):
     return JSONResponse(
@@ -53,6 +86,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compressão das respostas grandes (listagens). Brotli se o pacote estiver instalado
+# (o middleware dele também serve gzip para clientes sem suporte a br)
+try:
+    from brotli_asgi import BrotliMiddleware
+    # SSE fora da compressão: o buffer do compressor seguraria os eventos
+    app.add_middleware(BrotliMiddleware, minimum_size=compression_min_size,
+                       excluded_handlers=["/products/stream"])
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=compression_min_size)
+
+# Latência por rota (/metrics) e Server-Timing opcional: por último, envolve toda a pilha
+app.add_middleware(MetricsMiddleware)
+
 # Rotas
 app.include_router(product_routes.router)
 app.include_router(upload_routes.router)
@@ -60,3 +106,13 @@ app.include_router(upload_routes.router)
 @app.get("/")
 def read_root():
     return {"message": "API de Produtos Rodando!"}
+
+@app.get("/stats")
+def read_stats():
+    # Contadores para dimensionar os caches (hits/misses/despejos), latência da autenticação e clientes SSE
+    return {"cache": product_cache.stats(), "auth": auth_stats(), "events": event_hub.stats()}
+
+@app.get("/metrics")
+def read_metrics():
+    # Formato texto do Prometheus (latência por rota, chamadas ao Supabase e autenticação)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
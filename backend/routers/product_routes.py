@@ -1,28 +1,128 @@
-from fastapi import APIRouter, Depends, Request
-from core.config import limiter, rate_limit_read, rate_limit_write
+from typing import List, Optional, Union
+from fastapi import APIRouter, Body, Depends, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from core.cache import product_cache
+from core.config import rate_limit_read, rate_limit_write
+from core.events import event_hub, sse_stream
+from core.rate_limit import limiter, user_or_ip
+from core.responses import OrjsonResponse
 from core.security import get_current_user
-from schemas.product import ProductCreate
-from services.product_service import ProductService
+from schemas.product import (Product, ProductPage, ProductSearchPage, ProductCreate, ProductUpdate,
+                             ProductBatchUpdate, ProductBatchDelete, BATCH_MAX_ITEMS)
+from services.async_product_service import AsyncProductService
+from services.product_service import listing_etag, facets_etag, EXPORT_FORMATS
 
 router = APIRouter(prefix="/products", tags=["products"])
 
-@router.get("/")
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Comparação fraca (RFC 9110): proxies que comprimem podem devolver o ETag como W/"..."
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in [t[2:] if t.startswith("W/") else t for t in tags]
+
+# Respostas com modelo declarado: o FastAPI valida e gera o JSON direto no pydantic-core (Rust),
+# sem o jsonable_encoder. As que repassam linhas do PostgREST sem modelo usam o orjson.
+@router.get("/", response_model=Union[ProductPage, List[Product]])
+@limiter.limit(rate_limit_read)
+async def get_products(request: Request, response: Response, order_by: str = "id", direction: str = "asc",
+                       limit: Optional[int] = Query(None, ge=1, le=500), cursor: Optional[str] = None,
+                       categoria: Optional[str] = None, q: Optional[str] = None,
+                       fields: Optional[str] = None):
+    params = dict(limit=limit, cursor=cursor, categoria=categoria, q=q, fields=fields)
+
+    # GET condicional: catálogo sem alterações responde 304 sem consultar o Supabase.
+    # A versão é lida uma vez e serve ao ETag e ao cache (com Redis, cada leitura é uma ida à rede)
+    version = product_cache.version()
+    etag = listing_etag(order_by, direction, **params, version=version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    result = await AsyncProductService.list_products(order_by, direction, **params, version=version)
+    if fields:
+        # Só algumas colunas: não é um Product completo, segue como veio do banco
+        return OrjsonResponse(result, headers=headers)
+    response.headers.update(headers)
+    return result
+
+# Busca com índice (busca.sql): ?q=termo, resultados mais relevantes primeiro
+@router.get("/search", response_model=ProductSearchPage)
+@limiter.limit(rate_limit_read)
+async def search_products(request: Request, q: str = Query(..., min_length=1, max_length=200),
+                          limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None):
+    return await AsyncProductService.search_products(q, limit, cursor)
+
+# Contagens para os filtros do painel (facetas.sql): não depende do tamanho do catálogo
+@router.get("/facets")
+@limiter.limit(rate_limit_read)
+async def get_facets(request: Request, response: Response):
+    version = product_cache.version()
+    etag = facets_etag(version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return await AsyncProductService.get_facets(version)
+
+# Catálogo inteiro para download: csv (mesmas colunas da importação) ou ndjson, enviado por páginas
+@router.get("/export")
+@limiter.limit(rate_limit_read)
+async def export_products(request: Request, format: str = "csv"):
+    chunks = await AsyncProductService.export_products(format)
+    return StreamingResponse(chunks, media_type=EXPORT_FORMATS[format],
+                             headers={"Content-Disposition": f'attachment; filename="produtos.{format}"'})
+
+# Sincronização incremental (change_tracking.sql): declarada antes das rotas com /{product_id}
+@router.get("/changes")
+@limiter.limit(rate_limit_read)
+async def get_changes(request: Request, since: Optional[str] = None,
+                      limit: int = Query(1000, ge=1, le=5000)):
+    return OrjsonResponse(await AsyncProductService.list_changes(since, limit))
+
+# Alterações ao vivo (Server-Sent Events): {"op", "id", "fields"} a cada gravação, "resync" se o cliente ficar para trás
+@router.get("/stream")
 @limiter.limit(rate_limit_read)
-def get_products(request: Request, order_by: str = "id", direction: str = "asc"):
-    return ProductService.list_products(order_by, direction)
+async def stream_changes(request: Request):
+    return StreamingResponse(sse_stream(event_hub, request.is_disconnected), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.post("/", response_model=List[Product], dependencies=[Depends(get_current_user)])
+@limiter.limit(rate_limit_write, key_func=user_or_ip)
+async def create_product(request: Request, product: ProductCreate):
+    return await AsyncProductService.create_product(product)
+
+# Rotas em lote: declaradas antes de /{product_id} para não colidirem com o path param
+@router.post("/batch", dependencies=[Depends(get_current_user)])
+@limiter.limit(rate_limit_write, key_func=user_or_ip)
+async def create_products_batch(request: Request,
+                                products: List[ProductCreate] = Body(..., min_length=1, max_length=BATCH_MAX_ITEMS)):
+    return await AsyncProductService.create_products(products)
+
+@router.patch("/batch", dependencies=[Depends(get_current_user)])
+@limiter.limit(rate_limit_write, key_func=user_or_ip)
+async def update_products_batch(request: Request,
+                                products: List[ProductBatchUpdate] = Body(..., min_length=1, max_length=BATCH_MAX_ITEMS)):
+    return await AsyncProductService.update_products(products)
+
+@router.delete("/batch", dependencies=[Depends(get_current_user)])
+@limiter.limit(rate_limit_write, key_func=user_or_ip)
+async def delete_products_batch(request: Request, payload: ProductBatchDelete):
+    return await AsyncProductService.delete_products(payload.ids)
 
-@router.post("/", dependencies=[Depends(get_current_user)])
-@limiter.limit(rate_limit_write)
-def create_product(request: Request, product: ProductCreate):
-    return ProductService.create_product(product)
+@router.put("/{product_id}", response_model=List[Product], dependencies=[Depends(get_current_user)])
+@limiter.limit(rate_limit_write, key_func=user_or_ip)
+async def update_product(request: Request, product_id: int, product: ProductCreate):
+    return await AsyncProductService.update_product(product_id, product)
 
-@router.put("/{product_id}", dependencies=[Depends(get_current_user)])
-@limiter.limit(rate_limit_write)
-def update_product(request: Request, product_id: int, product: ProductCreate):
-    return ProductService.update_product(product_id, product)
+@router.patch("/{product_id}", response_model=List[Product], dependencies=[Depends(get_current_user)])
+@limiter.limit(rate_limit_write, key_func=user_or_ip)
+async def patch_product(request: Request, product_id: int, changes: ProductUpdate):
+    return await AsyncProductService.patch_product(product_id, changes)
 
 @router.delete("/{product_id}", dependencies=[Depends(get_current_user)])
-@limiter.limit(rate_limit_write)
-def delete_product(request: Request, product_id: int):
-    ProductService.delete_product(product_id)
+@limiter.limit(rate_limit_write, key_func=user_or_ip)
+async def delete_product(request: Request, product_id: int):
+    await AsyncProductService.delete_product(product_id)
     return {"message": "Produto deletado com sucesso"}
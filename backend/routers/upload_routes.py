@@ -1,18 +1,65 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from core.exceptions import ResourceNotFoundError
 from core.security import get_current_user
-from services.product_service import ProductService
+from services.import_jobs import import_jobs
 
 router = APIRouter(prefix="/products/upload", tags=["upload"])
 
+def _get_job(job_id: str):
+    job = import_jobs.get(job_id)
+    if not job:
+        raise ResourceNotFoundError(f"Importação {job_id} não encontrada.")
+    return job
+
 @router.post("/", dependencies=[Depends(get_current_user)])
-async def upload_csv(file: UploadFile = File(...)):
+async def upload_csv(file: UploadFile = File(...), background: bool = False, retry_of: Optional[str] = None,
+                     dry_run: bool = False):
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Arquivo deve ser um CSV (.csv)")
-    
-    content = await file.read()
-    stats = ProductService.bulk_import(content)
-    
+
+    # Reimportação: processa só as linhas que falharam no job informado (arquivo corrigido)
+    only_lines = import_jobs.retry_lines(retry_of) if retry_of else None
+
+    if background:
+        # Importação em segundo plano: responde na hora com o id do job
+        job = await run_in_threadpool(import_jobs.submit, file.file, file.filename, only_lines, retry_of, dry_run)
+        return JSONResponse(
+            status_code=202,
+            content={"message": "Importação iniciada!", "job_id": job.id, "status": job.status}
+        )
+
+    # Processa o arquivo em disco (SpooledTemporaryFile) em streaming, sem file.read(),
+    # numa thread do pool para não travar o event loop
+    # dry_run: só calcula o que seria criado/atualizado/mantido, sem gravar
+    job = await run_in_threadpool(import_jobs.run, file.file, file.filename, only_lines, retry_of, dry_run)
+
+    return {
+        "message": "Simulação concluída!" if dry_run else "Importação concluída!",
+        "job_id": job.id,
+        "details": job.stats
+    }
+
+@router.get("/{job_id}", dependencies=[Depends(get_current_user)])
+def get_upload_status(job_id: str):
+    return _get_job(job_id).to_dict()
+
+@router.get("/{job_id}/errors", dependencies=[Depends(get_current_user)])
+def get_upload_errors(job_id: str, format: str = Query("json", pattern="^(json|csv)$")):
+    report = _get_job(job_id).report
+    if format == "csv":
+        # BOM para o Excel reconhecer UTF-8 (acentos nos nomes)
+        return Response(
+            content=report.to_csv().encode("utf-8-sig"),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="erros-{job_id}.csv"'}
+        )
+
     return {
-        "message": "Importação concluída!",
-        "details": stats
+        "job_id": job_id,
+        "total": report.total,
+        "truncated": report.truncated,
+        "errors": list(report.errors)
     }
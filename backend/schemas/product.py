@@ -1,26 +1,36 @@
-from pydantic import BaseModel, Field, field_validator, PositiveFloat, NonNegativeInt
+from pydantic import BaseModel, Field, field_validator, model_validator, PositiveFloat, NonNegativeInt
 from typing import Optional, List
 
-# Modelo de Produto (Visualização)
+# Modelo de Produto (Visualização): formato das respostas das rotas de produtos.
+# Colunas internas (versao, updated_at) ficam de fora; preço e estoque aceitam nulo
+# para que uma linha antiga gravada direto no banco não derrube a listagem inteira.
 class Product(BaseModel):
     id: Optional[int] = None
     nome: str
     descricao: Optional[str] = None
     categoria: Optional[str] = None
     tags: Optional[List[str]] = None
-    preco: float
-    estoque: int
+    preco: Optional[float] = None
+    estoque: Optional[int] = None
 
-# Modelo de Criação com Validações
-class ProductCreate(BaseModel):
-    nome: str = Field(..., min_length=1, max_length=200, description="Nome do produto")
-    preco: PositiveFloat = Field(..., description="Preço deve ser maior que zero")
-    categoria: Optional[str] = Field(None, max_length=50)
-    descricao: Optional[str] = Field(None, max_length=1000)
-    estoque: NonNegativeInt = Field(0, description="Estoque não pode ser negativo")
-    tags: Optional[List[str]] = Field(default_factory=list, description="Lista de tags do produto")
-    
-    @field_validator('nome')
+# Página da listagem com limit (paginação por cursor). total: produtos com os filtros
+# aplicados, só na primeira página (nas seguintes, com cursor, vem nulo)
+class ProductPage(BaseModel):
+    items: List[Product]
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+# Resultado da busca: o produto com a relevância calculada pelo banco
+class ProductSearchResult(Product):
+    relevancia: float
+
+class ProductSearchPage(BaseModel):
+    items: List[ProductSearchResult]
+    next_cursor: Optional[str] = None
+
+# Validações compartilhadas entre criação e atualização parcial
+class ProductValidators(BaseModel):
+    @field_validator('nome', check_fields=False)
     @classmethod
     def validar_nome(cls, v: str) -> str:
         v = v.strip()
@@ -30,12 +40,12 @@ class ProductCreate(BaseModel):
             raise ValueError('Nome não pode conter caracteres especiais < ou >')
         return v
     
-    @field_validator('preco')
+    @field_validator('preco', check_fields=False)
     @classmethod
     def validar_preco(cls, v: float) -> float:
         return round(v, 2)
     
-    @field_validator('categoria')
+    @field_validator('categoria', check_fields=False)
     @classmethod
     def validar_categoria(cls, v: Optional[str]) -> Optional[str]:
         if v:
@@ -44,9 +54,48 @@ class ProductCreate(BaseModel):
                 raise ValueError('Categoria não pode conter caracteres especiais')
         return v
     
-    @field_validator('descricao')
+    @field_validator('descricao', check_fields=False)
     @classmethod
     def validar_descricao(cls, v: Optional[str]) -> Optional[str]:
         if v:
             v = v.strip()
         return v
+
+# Modelo de Criação com Validações
+class ProductCreate(ProductValidators):
+    nome: str = Field(..., min_length=1, max_length=200, description="Nome do produto")
+    preco: PositiveFloat = Field(..., description="Preço deve ser maior que zero")
+    categoria: Optional[str] = Field(None, max_length=50)
+    descricao: Optional[str] = Field(None, max_length=1000)
+    estoque: NonNegativeInt = Field(0, description="Estoque não pode ser negativo")
+    tags: Optional[List[str]] = Field(default_factory=list, description="Lista de tags do produto")
+
+# Atualização parcial (PATCH): só os campos enviados são gravados
+class ProductUpdate(ProductValidators):
+    nome: str = Field(None, min_length=1, max_length=200, description="Nome do produto")
+    preco: PositiveFloat = Field(None, description="Preço deve ser maior que zero")
+    categoria: Optional[str] = Field(None, max_length=50)
+    descricao: Optional[str] = Field(None, max_length=1000)
+    estoque: NonNegativeInt = Field(None, description="Estoque não pode ser negativo")
+    tags: Optional[List[str]] = None
+    estoque_delta: Optional[int] = Field(None, description="Soma (ou subtrai) do estoque atual de forma atômica")
+
+    @model_validator(mode='after')
+    def validar_alteracoes(self):
+        if not self.model_fields_set:
+            raise ValueError('Informe ao menos um campo para atualizar')
+        if 'estoque' in self.model_fields_set and self.estoque_delta is not None:
+            raise ValueError('Use estoque ou estoque_delta, não os dois')
+        if 'estoque_delta' in self.model_fields_set and self.estoque_delta is None:
+            raise ValueError('estoque_delta não pode ser nulo')
+        return self
+
+# Limite de itens por requisição nas rotas em lote
+BATCH_MAX_ITEMS = 1000
+
+# Item de atualização em lote (mesmas validações da criação + id)
+class ProductBatchUpdate(ProductCreate):
+    id: int = Field(..., gt=0)
+
+class ProductBatchDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
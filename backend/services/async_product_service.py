@@ -0,0 +1,387 @@
+from typing import AsyncIterator, Dict, List, Optional
+
+from postgrest.exceptions import APIError
+
+from core.cache import product_cache
+from core.events import change_event
+from core.config import get_async_supabase, batch_chunk_size, export_page_size
+from core.metrics import execute_async
+from schemas.product import ProductCreate, ProductUpdate, ProductBatchUpdate
+from core.exceptions import (ProductAlreadyExistsError, ServiceError, ResourceNotFoundError,
+                             InvalidParameterError)
+from services.csv_import import chunked
+from services.product_service import (ProductService, PRODUCT_COLUMNS, EXPORT_FORMATS, _list_spec,
+                                      _build_list_query, _list_result, _is_unique_violation,
+                                      _decode_sync_token, _changes_result, _facets_result,
+                                      _decode_search_cursor, _search_result, _export_chunk)
+
+
+async def _client():
+    client = await get_async_supabase()
+    if not client:
+        raise ServiceError("Supabase não configurado")
+    return client
+
+
+def _batch_summary(results: List[Dict]) -> Dict:
+    summary: Dict[str, int] = {}
+    for item in results:
+        summary[item["status"]] = summary.get(item["status"], 0) + 1
+    return {"results": results, "summary": summary}
+
+
+def _group_by_columns(products, indexes: List[int]) -> List[List[int]]:
+    # Um comando por conjunto de colunas enviadas: num INSERT/UPSERT em lote o PostgREST
+    # grava NULL nas colunas ausentes de um item, apagando valores que não vieram
+    groups: Dict[frozenset, List[int]] = {}
+    for i in indexes:
+        groups.setdefault(frozenset(products[i].model_fields_set), []).append(i)
+    return list(groups.values())
+
+
+async def _create_one(client, index: int, product: ProductCreate) -> Dict:
+    try:
+        response = await execute_async(client.table("produtos").insert(product.model_dump(exclude_unset=True)), "insert")
+        return {"index": index, "status": "created", "id": response.data[0]["id"]}
+    except APIError as e:
+        if not _is_unique_violation(e):
+            raise
+        return {"index": index, "status": "error",
+                "detail": f"Já existe um produto com o nome '{product.nome}'."}
+
+
+async def _update_one(client, index: int, product: ProductBatchUpdate) -> Dict:
+    try:
+        data = product.model_dump(exclude_unset=True, exclude={"id"})
+        await execute_async(client.table("produtos").update(data).eq("id", product.id), "update")
+        return {"index": index, "id": product.id, "status": "updated"}
+    except APIError as e:
+        if not _is_unique_violation(e):
+            raise
+        return {"index": index, "id": product.id, "status": "error",
+                "detail": f"Já existe outro produto com o nome '{product.nome}'."}
+
+
+class AsyncProductService:
+    """Listagem, busca e escrita de produtos usadas pelas rotas async.
+
+    Usa o cliente Supabase assíncrono (pool de conexões compartilhado), então um
+    único worker mantém centenas de chamadas ao banco em andamento sem ocupar
+    threads. A importação de CSV continua no ProductService, executada em threads.
+    """
+
+    @staticmethod
+    async def list_products(order_by: str = "id", direction: str = "asc", limit: Optional[int] = None,
+                            cursor: Optional[str] = None, categoria: Optional[str] = None,
+                            q: Optional[str] = None, fields: Optional[str] = None,
+                            version: Optional[str] = None):
+        """`version`: versão do catálogo já lida pela rota (ETag); sem ela, lida aqui uma vez"""
+        client = await _client()
+
+        spec = _list_spec(order_by, direction, limit, cursor, categoria, q, fields)
+        version = version or product_cache.version()
+        cached = product_cache.get(spec.cache_key, version=version)
+        if cached is not None:
+            return cached
+
+        try:
+            result = _list_result(await execute_async(_build_list_query(client, spec), "select"), spec)
+            product_cache.set(spec.cache_key, result, version=version)
+            return result
+        except InvalidParameterError:
+            raise
+        except Exception as e:
+            raise ServiceError(f"Erro ao listar produtos: {str(e)}")
+
+    @staticmethod
+    async def search_products(q: str, limit: int = 20, cursor: Optional[str] = None):
+        """Busca ranqueada em nome, tags e descrição (sem acentos, tolera erros de digitação)"""
+        client = await _client()
+
+        q = " ".join(q.split())
+        if not q:
+            raise InvalidParameterError("Informe o termo de busca.")
+        offset = _decode_search_cursor(cursor, q) if cursor else 0
+
+        cache_key = f"search:{limit}:{offset}:{q}"
+        version = product_cache.version()
+        cached = product_cache.get(cache_key, version=version)
+        if cached is not None:
+            return cached
+
+        try:
+            # Um item a mais indica se existe próxima página
+            params = {"p_q": q, "p_limite": limit + 1, "p_offset": offset}
+            response = await execute_async(client.rpc("buscar_produtos", params), "rpc", "buscar_produtos")
+            result = _search_result(response.data, q, offset, limit)
+            product_cache.set(cache_key, result, version=version)
+            return result
+        except Exception as e:
+            raise ServiceError(f"Erro ao buscar produtos: {str(e)}")
+
+    @staticmethod
+    async def export_products(fmt: str = "csv") -> AsyncIterator[str]:
+        """Catálogo inteiro em trechos de texto, lido em páginas por id (keyset).
+
+        Só uma página fica em memória por vez, qualquer que seja o tamanho do catálogo.
+        A primeira página é lida antes de devolver o gerador: se o banco falhar, a
+        rota responde com erro em vez de um arquivo 200 vazio. Produtos alterados
+        durante a exportação saem com os valores do momento em que a página foi lida.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise InvalidParameterError(f"Formato inválido: {fmt}. Use {' ou '.join(EXPORT_FORMATS)}.")
+        client = await _client()
+
+        async def fetch(after_id: int) -> List[Dict]:
+            query = (client.table("produtos").select(",".join(PRODUCT_COLUMNS))
+                     .gt("id", after_id).order("id").limit(export_page_size))
+            return (await execute_async(query, "select")).data
+
+        try:
+            rows = await fetch(0)
+        except Exception as e:
+            raise ServiceError(f"Erro ao exportar produtos: {str(e)}")
+
+        async def chunks():
+            yield _export_chunk(rows, fmt, first=True)
+            page = rows
+            # Para na página vazia, não na incompleta: o PostgREST pode devolver menos
+            # linhas que export_page_size (max-rows do servidor) sem ser o fim
+            while page:
+                page = await fetch(page[-1]["id"])
+                if page:
+                    yield _export_chunk(page, fmt, first=False)
+
+        return chunks()
+
+    @staticmethod
+    async def get_facets(version: Optional[str] = None):
+        """Categorias e tags com a quantidade de produtos (tabela mantida por triggers, em cache)"""
+        client = await _client()
+
+        version = version or product_cache.version()
+        cached = product_cache.get("facets", version=version)
+        if cached is not None:
+            return cached
+
+        try:
+            query = client.table("produtos_facetas").select("tipo,valor,total")
+            result = _facets_result((await execute_async(query, "select", "produtos_facetas")).data)
+            product_cache.set("facets", result, version=version)
+            return result
+        except Exception as e:
+            raise ServiceError(f"Erro ao buscar categorias e tags: {str(e)}")
+
+    @staticmethod
+    async def list_changes(since: Optional[str] = None, limit: int = 1000):
+        """Produtos gravados e ids removidos depois do token (sem token: o catálogo inteiro, paginado).
+
+        since="now" devolve só o token atual: quem carregou a lista pela listagem pede as
+        alterações a partir dele (lido antes da listagem, nada se perde no meio).
+        """
+        client = await _client()
+
+        versao, last_id = _decode_sync_token(since) if since else ("0", 0)
+        try:
+            params = {"p_versao": versao, "p_id": last_id, "p_limite": limit}
+            response = await execute_async(client.rpc("produtos_alteracoes", params), "rpc", "produtos_alteracoes")
+            return _changes_result(response.data, limit)
+        except Exception as e:
+            raise ServiceError(f"Erro ao buscar alterações: {str(e)}")
+
+    @staticmethod
+    async def create_product(product: ProductCreate):
+        client = await _client()
+
+        try:
+            # Unicidade do nome garantida pelo banco (unique_nome.sql): um único comando
+            data = product.model_dump(exclude_unset=True)
+            response = await execute_async(client.table("produtos").insert(data), "insert")
+            ProductService._after_write([change_event("created", response.data[0]["id"], list(data))])
+            return response.data
+        except APIError as e:
+            if _is_unique_violation(e):
+                raise ProductAlreadyExistsError(f"Já existe um produto com o nome '{product.nome}'. Escolha outro nome.")
+            raise ServiceError(f"Erro ao criar produto: {str(e)}")
+        except Exception as e:
+            raise ServiceError(f"Erro ao criar produto: {str(e)}")
+
+    @staticmethod
+    async def update_product(product_id: int, product: ProductCreate):
+        client = await _client()
+
+        try:
+            data = product.model_dump(exclude_unset=True)
+            response = await execute_async(client.table("produtos").update(data).eq("id", product_id), "update")
+
+            if not response.data:
+                raise ResourceNotFoundError(f"Produto {product_id} não encontrado.")
+
+            ProductService._after_write([change_event("updated", product_id, list(data))])
+            return response.data
+        except APIError as e:
+            if _is_unique_violation(e):
+                raise ProductAlreadyExistsError(f"Já existe outro produto com o nome '{product.nome}'.")
+            raise ServiceError(f"Erro ao atualizar produto: {str(e)}")
+        except ResourceNotFoundError:
+            raise
+        except Exception as e:
+            raise ServiceError(f"Erro ao atualizar produto: {str(e)}")
+
+    @staticmethod
+    async def patch_product(product_id: int, changes: ProductUpdate):
+        """Grava só as colunas enviadas; estoque_delta é aplicado de forma atômica no banco"""
+        client = await _client()
+
+        data = changes.model_dump(exclude_unset=True, exclude={"estoque_delta"})
+        fields = list(data)
+        try:
+            if changes.estoque_delta is not None:
+                # Delta e demais colunas no mesmo UPDATE (estoque_atomico.sql): se faltar
+                # estoque ou o nome já existir, nada é gravado
+                params = {"p_id": product_id, "p_delta": changes.estoque_delta}
+                if data:
+                    params["p_dados"] = data
+                response = await execute_async(client.rpc("ajustar_estoque", params), "rpc", "ajustar_estoque")
+                fields.append("estoque")
+            else:
+                # Sem verificação prévia de nome: só um nome alterado pode violar a restrição única
+                response = await execute_async(client.table("produtos").update(data).eq("id", product_id), "update")
+            if not response.data:
+                raise ResourceNotFoundError(f"Produto {product_id} não encontrado.")
+
+            ProductService._after_write([change_event("updated", product_id, fields)])
+            return response.data
+        except APIError as e:
+            if _is_unique_violation(e):
+                raise ProductAlreadyExistsError(f"Já existe outro produto com o nome '{changes.nome}'.")
+            if getattr(e, "code", None) == "23514":
+                raise InvalidParameterError(f"Estoque insuficiente para o produto {product_id}.")
+            raise ServiceError(f"Erro ao atualizar produto: {str(e)}")
+        except ResourceNotFoundError:
+            raise
+        except Exception as e:
+            raise ServiceError(f"Erro ao atualizar produto: {str(e)}")
+
+    @staticmethod
+    async def delete_product(product_id: int):
+        client = await _client()
+
+        try:
+            response = await execute_async(client.table("produtos").delete().eq("id", product_id), "delete")
+            if not response.data:
+                raise ResourceNotFoundError(f"Produto {product_id} não encontrado.")
+            ProductService._after_write([change_event("deleted", product_id)])
+            return True
+        except ResourceNotFoundError:
+            raise
+        except Exception as e:
+            raise ServiceError(f"Erro ao deletar produto: {str(e)}")
+
+    @staticmethod
+    async def create_products(products: List[ProductCreate]):
+        """Cria vários produtos com um INSERT por lote; resultado por item, na ordem recebida"""
+        client = await _client()
+        results: List[Optional[Dict]] = [None] * len(products)
+
+        # Nomes repetidos dentro da própria requisição
+        first_index: Dict[str, int] = {}
+        pending = []
+        for i, product in enumerate(products):
+            if product.nome in first_index:
+                results[i] = {"index": i, "status": "error",
+                              "detail": f"Nome '{product.nome}' repetido no lote (item {first_index[product.nome]})."}
+            else:
+                first_index[product.nome] = i
+                pending.append(i)
+
+        try:
+            for chunk in chunked(pending, batch_chunk_size):
+                for group in _group_by_columns(products, chunk):
+                    rows = [products[i].model_dump(exclude_unset=True) for i in group]
+                    try:
+                        response = await execute_async(client.table("produtos").insert(rows), "insert")
+                        ids = {row["nome"]: row["id"] for row in response.data}
+                        for i in group:
+                            results[i] = {"index": i, "status": "created", "id": ids.get(products[i].nome)}
+                    except APIError as e:
+                        if not _is_unique_violation(e):
+                            raise
+                        # Algum nome já existe: o lote inteiro foi recusado, refaz item a item
+                        for i in group:
+                            results[i] = await _create_one(client, i, products[i])
+        except Exception as e:
+            raise ServiceError(f"Erro ao criar produtos em lote: {str(e)}")
+        finally:
+            ProductService._after_write([change_event("created", r["id"], list(products[r["index"]].model_fields_set))
+                                         for r in results if r and r["status"] == "created"])
+
+        return _batch_summary(results)
+
+    @staticmethod
+    async def update_products(products: List[ProductBatchUpdate]):
+        """Atualiza vários produtos (por id) com um UPSERT por lote"""
+        client = await _client()
+        results: List[Optional[Dict]] = [None] * len(products)
+
+        # Ids repetidos: vale a última ocorrência
+        last_index = {product.id: i for i, product in enumerate(products)}
+        for i, product in enumerate(products):
+            if last_index[product.id] != i:
+                results[i] = {"index": i, "id": product.id, "status": "error",
+                              "detail": f"Produto {product.id} repetido no lote (vale o item {last_index[product.id]})."}
+
+        try:
+            for chunk in chunked(list(last_index.values()), batch_chunk_size):
+                ids = [products[i].id for i in chunk]
+                existing = await execute_async(client.table("produtos").select("id").in_("id", ids), "select")
+                found = {row["id"] for row in existing.data}
+
+                to_update = []
+                for i in chunk:
+                    if products[i].id in found:
+                        to_update.append(i)
+                    else:
+                        results[i] = {"index": i, "id": products[i].id, "status": "not_found",
+                                      "detail": f"Produto {products[i].id} não encontrado."}
+
+                for group in _group_by_columns(products, to_update):
+                    rows = [products[i].model_dump(exclude_unset=True) for i in group]
+                    try:
+                        # Só ids existentes chegam aqui: o upsert por id nunca cria linhas novas
+                        await execute_async(client.table("produtos").upsert(rows, on_conflict="id"), "upsert")
+                        for i in group:
+                            results[i] = {"index": i, "id": products[i].id, "status": "updated"}
+                    except APIError as e:
+                        if not _is_unique_violation(e):
+                            raise
+                        for i in group:
+                            results[i] = await _update_one(client, i, products[i])
+        except Exception as e:
+            raise ServiceError(f"Erro ao atualizar produtos em lote: {str(e)}")
+        finally:
+            ProductService._after_write([change_event("updated", r["id"], list(products[r["index"]].model_fields_set - {"id"}))
+                                         for r in results if r and r["status"] == "updated"])
+
+        return _batch_summary(results)
+
+    @staticmethod
+    async def delete_products(ids: List[int]):
+        """Remove vários produtos com um DELETE ... IN (...) por lote"""
+        client = await _client()
+        unique_ids = list(dict.fromkeys(ids))
+        deleted = set()
+
+        try:
+            for chunk in chunked(unique_ids, batch_chunk_size):
+                response = await execute_async(client.table("produtos").delete().in_("id", chunk), "delete")
+                deleted.update(row["id"] for row in response.data)
+        except Exception as e:
+            raise ServiceError(f"Erro ao deletar produtos em lote: {str(e)}")
+        finally:
+            ProductService._after_write([change_event("deleted", pid) for pid in deleted])
+
+        return _batch_summary([
+            {"index": i, "id": pid, "status": "deleted" if pid in deleted else "not_found"}
+            for i, pid in enumerate(unique_ids)
+        ])
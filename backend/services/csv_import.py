@@ -0,0 +1,258 @@
+import csv
+import io
+import math
+import re
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, TextIO
+
+REQUIRED_COLUMNS = {'nome', 'categoria', 'descricao', 'tags', 'preco', 'estoque'}
+# Colunas da exportação, na ordem do modelo de importação
+EXPORT_COLUMNS = ('nome', 'categoria', 'descricao', 'tags', 'preco', 'estoque')
+
+# Número decimal simples (sem nan/inf/sublinhados), já com vírgula trocada por ponto
+_NUMBER = re.compile(r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+
+
+def detect_delimiter(first_line: str) -> str:
+    # Detecção inteligente de delimitador a partir da primeira linha
+    try:
+        dialect = csv.Sniffer().sniff(first_line, delimiters=';,')
+        return dialect.delimiter
+    except csv.Error:
+        # Fallback se o Sniffer falhar
+        return ';' if ';' in first_line else ','
+
+
+def _normalize_headers(fieldnames) -> List[str]:
+    return [h.strip().lower() for h in fieldnames or []]
+
+
+def _parse_header(first_line: str, delimiter: str) -> List[str]:
+    return next(csv.reader([first_line], delimiter=delimiter), [])
+
+
+class CsvSource(NamedTuple):
+    """Linhas cruas do CSV (listas) e a posição de cada coluna normalizada"""
+    rows: Iterator[List[str]]
+    columns: Dict[str, int]
+
+
+class BatchValidation(NamedTuple):
+    """Resultado da validação de um lote: payloads prontos (e suas linhas) e erros por linha"""
+    payloads: List[Dict]
+    lines: List[int]
+    errors: List[Dict]
+
+
+class ErrorReport:
+    """Erros por linha de uma importação, com memória limitada (guarda os `limit` primeiros)"""
+
+    FIELDS = ("linha", "nome", "campo", "motivo")
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.errors: List[Dict] = []
+        self.total = 0
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > len(self.errors)
+
+    def extend(self, errors: List[Dict]):
+        self.total += len(errors)
+        room = self.limit - len(self.errors)
+        if room > 0:
+            self.errors.extend(errors[:room])
+
+    def failed_lines(self) -> Set[int]:
+        return {e["linha"] for e in self.errors}
+
+    def to_csv(self) -> str:
+        # Mesmo delimitador do arquivo de importação (abre direto no Excel pt-BR)
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=self.FIELDS, delimiter=';', lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(list(self.errors))
+        return output.getvalue()
+
+
+def open_reader(text: TextIO) -> CsvSource:
+    """Abre o CSV validando as colunas obrigatórias (levanta ValueError se faltar alguma).
+
+    Só o cabeçalho é lido aqui; as linhas de dados continuam sendo consumidas
+    sob demanda do arquivo, sem carregar o conteúdo inteiro em memória.
+    """
+    first_line = text.readline()
+    delimiter = detect_delimiter(first_line)
+
+    fieldnames = _parse_header(first_line, delimiter)
+    headers = _normalize_headers(fieldnames)
+    missing = REQUIRED_COLUMNS - set(headers)
+
+    # Se faltar colunas, pode ser que o delimitador detectado esteja errado (ex: ; vs ,)
+    # Provavelmente leu tudo como uma coluna só. Tentar o outro.
+    if missing and len(headers) <= 1:
+        alt_delimiter = ',' if delimiter == ';' else ';'
+        alt_headers = _normalize_headers(_parse_header(first_line, alt_delimiter))
+        alt_missing = REQUIRED_COLUMNS - set(alt_headers)
+        if len(alt_missing) < len(missing):
+            delimiter, headers, missing = alt_delimiter, alt_headers, alt_missing
+
+    if missing:
+        raise ValueError(f"Arquivo inválido. Faltam as colunas: {', '.join(sorted(missing))}")
+
+    # Cabeçalhos normalizados uma única vez: cada coluna vira um índice fixo
+    columns = {h: i for i, h in enumerate(headers) if h}
+    # Linhas em branco são ignoradas (como no csv.DictReader)
+    rows = (row for row in csv.reader(text, delimiter=delimiter) if row)
+    return CsvSource(rows, columns)
+
+
+class _ReadOnlyStream(io.RawIOBase):
+    """Qualquer objeto com read() como arquivo binário legível.
+
+    O SpooledTemporaryFile do UploadFile no Python 3.9 não tem readable()/seekable(),
+    que o TextIOWrapper exige; o arquivo original continua sendo lido sob demanda.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+@contextmanager
+def open_stream(stream: BinaryIO) -> Iterator[CsvSource]:
+    """Decodifica um arquivo binário (upload) de forma incremental, com suporte a BOM do Excel"""
+    text = io.TextIOWrapper(io.BufferedReader(_ReadOnlyStream(stream)), encoding='utf-8-sig', newline='')
+    try:
+        yield open_reader(text)
+    finally:
+        # Não fechar o arquivo original (pertence a quem chamou)
+        text.detach()
+
+
+def _transpose(rows: List[List[str]], columns: Dict[str, int]) -> Dict[str, List[str]]:
+    width = max(columns.values()) + 1
+    if min(map(len, rows)) < width:
+        # Linhas curtas: completa com vazio (raro, só nesses lotes)
+        rows = [row + [""] * (width - len(row)) if len(row) < width else row for row in rows]
+    # Transposição em C: uma tupla por coluna
+    transposed = list(zip(*rows))
+    return {name: list(map(str.strip, transposed[index])) for name, index in columns.items()
+            if name in REQUIRED_COLUMNS}
+
+
+def _to_int(value: str):
+    number = float(value)
+    # Expoentes enormes viram inf, que não cabe em um inteiro
+    return int(number) if math.isfinite(number) else None
+
+
+def _split_tags(tags_str: str) -> List[str]:
+    if not tags_str:
+        return []
+    return [t.strip() for t in tags_str.split(',') if t.strip()]
+
+
+def row_error(line: int, nome: str, campo: str, motivo: str) -> Dict:
+    return {"linha": line, "nome": nome or "SemNome", "campo": campo, "motivo": motivo}
+
+
+def validate_batch(rows: List[List[str]], columns: Dict[str, int],
+                   lines: Optional[Sequence[int]] = None) -> BatchValidation:
+    """Valida e converte um lote de linhas coluna a coluna.
+
+    Cada coluna é extraída uma vez e os números são convertidos em bloco: a regex
+    monta a máscara de validade antes do float(), então nenhuma linha inválida
+    passa por exceção. `lines` são os números das linhas no arquivo (padrão: 1..n).
+    """
+    if not rows:
+        return BatchValidation([], [], [])
+    if lines is None:
+        lines = range(1, len(rows) + 1)
+
+    values = _transpose(rows, columns)
+    nomes, categorias, descricoes, tags_str = (values['nome'], values['categoria'],
+                                               values['descricao'], values['tags'])
+    precos_str, estoques_str = values['preco'], values['estoque']
+
+    match = _NUMBER.fullmatch
+    precos = [float(v) if match(v) else None for v in (p.replace(',', '.') for p in precos_str)]
+    # Estoque quase sempre é inteiro: int() direto, float() só para casos como "3.0"
+    estoques = [int(v) if v.isdecimal() else (_to_int(v) if match(v) else None) for v in estoques_str]
+
+    # Máscara de erros por linha (nome vazio ou números inválidos/negativos). Categoria é
+    # opcional, como na API; preço e estoque vazios mantêm os valores atuais do produto
+    # (o que a exportação grava para colunas nulas) e são resolvidos em _import_chunk
+    invalid = [
+        not nome
+        or (preco_str and (preco is None or preco < 0)) or (estoque_str and (estoque is None or estoque < 0))
+        for nome, preco_str, estoque_str, preco, estoque
+        in zip(nomes, precos_str, estoques_str, precos, estoques)
+    ]
+
+    payloads, payload_lines, errors = [], [], []
+    for i, bad in enumerate(invalid):
+        if not bad:
+            payload_lines.append(lines[i])
+            payloads.append({
+                "nome": nomes[i],
+                "preco": precos[i],
+                "estoque": estoques[i],
+                "categoria": categorias[i] or None,
+                "descricao": descricoes[i],
+                "tags": _split_tags(tags_str[i]),
+            })
+            continue
+
+        # Só as linhas com erro pagam a montagem da mensagem
+        line = lines[i]
+        if not nomes[i]:
+            errors.append(row_error(line, nomes[i], 'nome', "Campos obrigatórios vazios: nome"))
+        elif precos_str[i] and (precos[i] is None or precos[i] < 0):
+            errors.append(row_error(line, nomes[i], 'preco', f"Preço inválido: {precos_str[i]}"))
+        else:
+            errors.append(row_error(line, nomes[i], 'estoque', f"Estoque inválido: {estoques_str[i]}"))
+
+    return BatchValidation(payloads, payload_lines, errors)
+
+
+def _export_value(product: Dict, column: str):
+    value = product.get(column)
+    if value is None:
+        return ''
+    if column == 'tags':
+        return ','.join(value)
+    if column == 'preco':
+        # Vírgula decimal, como o Excel pt-BR grava (a importação aceita os dois formatos)
+        return str(value).replace('.', ',')
+    return value
+
+
+def format_rows(products: Iterable[Dict], header: bool = False) -> str:
+    """Produtos no formato que a importação lê de volta (;, tags separadas por vírgula)"""
+    output = io.StringIO()
+    writer = csv.writer(output, delimiter=';', lineterminator='\n')
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows([_export_value(p, c) for c in EXPORT_COLUMNS] for p in products)
+    return output.getvalue()
+
+
+def chunked(items: Iterable, size: int) -> Iterator[List]:
+    """Agrupa um iterável em listas de no máximo `size` itens"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
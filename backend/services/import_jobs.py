@@ -0,0 +1,242 @@
+import json
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Optional, Set
+
+from core.config import (import_workers, import_job_retention, import_error_limit, import_jobs_backend,
+                         import_job_ttl, redis_url)
+from core.exceptions import InvalidParameterError, ResourceNotFoundError
+from services.csv_import import ErrorReport
+from services.product_service import ProductService
+
+
+def _job_stats(stats: Dict) -> Dict:
+    """Contadores da importação sem os tempos por lote ("chunks"), que crescem com o arquivo.
+
+    O estado do job é gravado a cada lote (no Redis, serializado inteiro): com a lista,
+    o custo total seria quadrático no tamanho da importação.
+    """
+    return {key: value for key, value in stats.items() if key != "chunks"}
+
+
+class ImportJob:
+    """Estado de uma importação de CSV executada em segundo plano"""
+
+    def __init__(self, filename: str, retry_of: Optional[str] = None, dry_run: bool = False):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.retry_of = retry_of
+        self.dry_run = dry_run
+        self.status = "queued"
+        self.stats: Dict = {}
+        self.report = ErrorReport(import_error_limit)
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        rows = self.stats.get("rows", 0)
+        elapsed = None
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "rows_processed": rows,
+            "created": self.stats.get("created", 0),
+            "updated": self.stats.get("updated", 0),
+            "unchanged": self.stats.get("unchanged", 0),
+            "errors": self.stats.get("errors", 0),
+            "errors_truncated": self.report.truncated,
+            "skipped": self.stats.get("skipped", 0),
+            "retry_of": self.retry_of,
+            "dry_run": self.dry_run,
+            "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+            "rows_per_second": round(rows / elapsed, 1) if elapsed else None,
+            "error": self.error,
+        }
+
+    STATE_FIELDS = ("id", "filename", "retry_of", "dry_run", "status", "stats", "error",
+                    "created_at", "started_at", "finished_at")
+
+    def to_state(self) -> Dict:
+        """Estado completo (sem o relatório de erros) para guardar fora do processo"""
+        return {field: getattr(self, field) for field in self.STATE_FIELDS}
+
+    @classmethod
+    def from_state(cls, state: Dict, report: Optional[Dict] = None) -> "ImportJob":
+        job = cls(state["filename"], state["retry_of"], state["dry_run"])
+        for field in cls.STATE_FIELDS:
+            setattr(job, field, state[field])
+        if report:
+            job.report.limit = report["limit"]
+            job.report.total = report["total"]
+            job.report.errors = report["errors"]
+        return job
+
+
+class MemoryJobStore:
+    """Jobs no próprio processo (padrão): com vários workers, cada um só enxerga os seus"""
+
+    def __init__(self, retention: int):
+        self._jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._retention = retention
+        self._lock = threading.Lock()
+
+    def save(self, job: ImportJob, report: bool = True):
+        # O job é o próprio objeto em memória: as atualizações já estão nele
+        with self._lock:
+            if job.id not in self._jobs:
+                self._jobs[job.id] = job
+                self._evict()
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _evict(self):
+        # Mantém apenas os jobs mais recentes (nunca remove jobs em andamento)
+        finished = [jid for jid, j in self._jobs.items() if j.status in ("completed", "failed")]
+        excess = len(self._jobs) - self._retention
+        for jid in finished[:max(excess, 0)]:
+            del self._jobs[jid]
+
+
+class RedisJobStore:
+    """Jobs no Redis: status, relatório de erros e retry_of valem para todos os workers e réplicas.
+
+    O relatório fica numa chave própria e só é regravado quando ganha erros novos; as
+    duas chaves expiram `ttl` segundos depois da última atualização do job.
+    """
+
+    def __init__(self, url: str, ttl: float, prefix: str = "produtos:importacao"):
+        try:
+            import redis  # Dependência opcional: só carregada com IMPORT_JOBS_BACKEND=redis
+        except ImportError:
+            raise RuntimeError("IMPORT_JOBS_BACKEND=redis requer o pacote 'redis' instalado")
+        self.ttl_ms = int(ttl * 1000)
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def save(self, job: ImportJob, report: bool = True):
+        key = f"{self.prefix}:{job.id}"
+        pipe = self._client.pipeline(transaction=False)
+        pipe.set(key, json.dumps(job.to_state()), px=self.ttl_ms)
+        if report:
+            errors = {"limit": job.report.limit, "total": job.report.total, "errors": job.report.errors}
+            pipe.set(f"{key}:erros", json.dumps(errors), px=self.ttl_ms)
+        else:
+            pipe.pexpire(f"{key}:erros", self.ttl_ms)
+        pipe.execute()
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        key = f"{self.prefix}:{job_id}"
+        state, report = self._client.mget(key, f"{key}:erros")
+        if state is None:
+            return None
+        return ImportJob.from_state(json.loads(state), json.loads(report) if report else None)
+
+
+def create_job_store(backend: str):
+    if backend == "redis":
+        return RedisJobStore(redis_url, ttl=import_job_ttl)
+    return MemoryJobStore(retention=import_job_retention)
+
+
+class ImportJobManager:
+    """Executa importações em um pool de threads, fora do event loop do uvicorn.
+
+    O estado de cada job vai para o `store` a cada lote processado: com o Redis,
+    o status e a reimportação funcionam em qualquer worker, não só no que importa.
+    """
+
+    def __init__(self, max_workers: int, store):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="import")
+        self._store = store
+
+    def submit(self, upload: BinaryIO, filename: str, only_lines: Optional[Set[int]] = None,
+               retry_of: Optional[str] = None, dry_run: bool = False) -> ImportJob:
+        # O UploadFile é fechado ao fim da requisição: copiamos para um arquivo temporário
+        # próprio do job (cópia em disco, em blocos, sem carregar em memória)
+        spool = tempfile.TemporaryFile()
+        shutil.copyfileobj(upload, spool)
+        spool.seek(0)
+
+        job = self._register(ImportJob(filename, retry_of, dry_run))
+        self._executor.submit(self._run, job, spool, only_lines)
+        return job
+
+    def run(self, upload: BinaryIO, filename: str, only_lines: Optional[Set[int]] = None,
+            retry_of: Optional[str] = None, dry_run: bool = False) -> ImportJob:
+        """Importa na thread atual, registrando o job (para consultar o relatório de erros depois)"""
+        job = self._register(ImportJob(filename, retry_of, dry_run))
+        try:
+            self._execute(job, upload, only_lines)
+        except Exception as e:
+            job.error = getattr(e, "message", str(e))
+            job.status = "failed"
+            self._store.save(job)
+            raise
+        return job
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        return self._store.get(job_id)
+
+    def retry_lines(self, job_id: str) -> Set[int]:
+        """Linhas que falharam em uma importação concluída (para reimportar só elas)"""
+        job = self.get(job_id)
+        if not job:
+            raise ResourceNotFoundError(f"Importação {job_id} não encontrada.")
+        if job.status != "completed":
+            raise InvalidParameterError(f"Importação {job_id} ainda não foi concluída com sucesso.")
+        if job.report.truncated:
+            raise InvalidParameterError(
+                f"Relatório de erros da importação {job_id} está incompleto; reenvie o arquivo inteiro.")
+        lines = job.report.failed_lines()
+        if not lines:
+            raise InvalidParameterError(f"Importação {job_id} não tem linhas com erro.")
+        return lines
+
+    def _register(self, job: ImportJob) -> ImportJob:
+        self._store.save(job)
+        return job
+
+    def _execute(self, job: ImportJob, stream: BinaryIO, only_lines: Optional[Set[int]]):
+        job.status = "running"
+        job.started_at = time.time()
+        self._store.save(job, report=False)
+        errors_saved = job.report.total
+        try:
+            def progress(stats: Dict):
+                nonlocal errors_saved
+                job.stats = _job_stats(stats)
+                self._store.save(job, report=job.report.total != errors_saved)
+                errors_saved = job.report.total
+
+            job.stats = _job_stats(ProductService.bulk_import_stream(
+                stream, progress=progress, report=job.report, only_lines=only_lines, dry_run=job.dry_run))
+            job.status = "completed"
+        finally:
+            job.finished_at = time.time()
+        self._store.save(job)
+
+    def _run(self, job: ImportJob, spool: BinaryIO, only_lines: Optional[Set[int]]):
+        try:
+            self._execute(job, spool, only_lines)
+        except Exception as e:
+            job.error = getattr(e, "message", str(e))
+            job.status = "failed"
+            self._store.save(job)
+        finally:
+            spool.close()
+
+
+import_jobs = ImportJobManager(max_workers=import_workers, store=create_job_store(import_jobs_backend))
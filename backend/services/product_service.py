@@ -1,195 +1,413 @@
-from core.config import supabase
-from schemas.product import ProductCreate
-from core.exceptions import ProductAlreadyExistsError, ServiceError
+import base64
+import hashlib
+import io
+import json
+import time
+from typing import BinaryIO, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from postgrest.exceptions import APIError
+
+from core.cache import product_cache
+from core.events import event_hub, change_event
+from core.config import supabase, import_chunk_size, import_error_limit
+from core.metrics import execute
+from core.exceptions import ServiceError, InvalidParameterError
+from services import csv_import
+
+# Mapeamento de campos seguros para evitar SQL Injection (mesmo que supabase proteja)
+ALLOWED_SORT_COLUMNS = {"id": "id", "name": "nome", "price": "preco", "stock": "estoque"}
+PRODUCT_COLUMNS = ("id", "nome", "descricao", "categoria", "tags", "preco", "estoque")
+# Formatos do GET /products/export e o Content-Type de cada um
+EXPORT_FORMATS = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+# Colunas comparadas na importação para decidir se a linha mudou
+IMPORT_DIFF_COLUMNS = "nome,preco,estoque,categoria,descricao,tags"
+
+
+def _is_unique_violation(error: APIError) -> bool:
+    # 23505 = unique_violation do Postgres (restrição produtos_nome_key)
+    return getattr(error, "code", None) == "23505"
+
+
+def _changed_fields(payload: dict, current: dict) -> List[str]:
+    """Campos do payload do CSV que diferem da linha atual do banco"""
+    changed = []
+    for field, value in payload.items():
+        old = current.get(field)
+        if field == "preco":
+            same = old == value if old is None or value is None else float(old) == value
+        elif field in ("descricao", "categoria"):
+            # Nulo no banco equivale a vazio no CSV
+            same = (old or "") == (value or "")
+        elif field == "tags":
+            same = (old or []) == value
+        else:
+            same = old == value
+        if not same:
+            changed.append(field)
+    return changed
+
+
+def _encode_cursor(row: dict, column: str) -> str:
+    raw = json.dumps([row.get(column), row.get("id")], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return value, int(last_id)
+    except Exception:
+        raise InvalidParameterError("Cursor de paginação inválido.")
+
+
+def _encode_sync_token(versao: str, last_id: int) -> str:
+    raw = json.dumps([str(versao), last_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+# Maior xid8 possível: "since=now" não devolve alterações, só o token do horizonte atual
+_SYNC_NOW = (str(2 ** 64 - 1), 0)
+
+
+def _decode_sync_token(token: str):
+    if token == "now":
+        return _SYNC_NOW
+    try:
+        versao, last_id = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        if not str(versao).isdigit():
+            raise ValueError(versao)
+        return str(versao), int(last_id)
+    except Exception:
+        raise InvalidParameterError("Token de sincronização inválido.")
+
+
+def _changes_result(data: dict, limit: int) -> Dict:
+    """Resposta de produtos_alteracoes (change_tracking.sql) no formato do GET /products/changes"""
+    changes = data.get("alteracoes") or []
+    upserts = [c["produto"] for c in changes if not c["removido"]]
+    deletes = [c["id"] for c in changes if c["removido"]]
+    has_more = len(changes) >= limit
+    if has_more:
+        # Página cheia: continua logo depois da última alteração devolvida
+        next_token = _encode_sync_token(changes[-1]["versao"], changes[-1]["id"])
+    else:
+        # Em dia: a próxima consulta começa no horizonte (tudo antes dele já foi entregue)
+        next_token = _encode_sync_token(data["horizonte"], 0)
+    return {"upserts": upserts, "deletes": deletes, "next_token": next_token, "has_more": has_more}
+
+
+def _quote(value) -> str:
+    # Valores em filtros or=() do PostgREST precisam de aspas (vírgulas, parênteses...)
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def _select_columns(fields: Optional[str], column: str) -> str:
+    if not fields:
+        return "*"
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    invalid = [f for f in requested if f not in PRODUCT_COLUMNS]
+    if invalid:
+        raise InvalidParameterError(f"Campos inválidos: {', '.join(invalid)}")
+    # id e a coluna de ordenação são sempre necessários para montar o cursor
+    selected = [c for c in PRODUCT_COLUMNS if c in requested or c in ("id", column)]
+    return ",".join(selected)
+
+
+class ListSpec(NamedTuple):
+    """Parâmetros normalizados de uma listagem (compartilhados pelos serviços síncrono e assíncrono)"""
+    column: str
+    is_desc: bool
+    limit: Optional[int]
+    cursor: Optional[str]
+    categoria: Optional[str]
+    q: Optional[str]
+    columns: str
+
+    @property
+    def cache_key(self) -> str:
+        # Chave normalizada: parâmetros equivalentes compartilham a mesma entrada
+        return repr(("list",) + tuple(self))
+
+
+def _list_spec(order_by: str, direction: str, limit: Optional[int], cursor: Optional[str],
+               categoria: Optional[str], q: Optional[str], fields: Optional[str]) -> ListSpec:
+    column = ALLOWED_SORT_COLUMNS.get(order_by, "id")
+    # desc=True se direction for "desc"
+    is_desc = (direction.lower() == "desc")
+    return ListSpec(column, is_desc, limit, cursor, categoria or None, q or None,
+                    _select_columns(fields, column))
+
+
+def _build_list_query(client, spec: ListSpec):
+    # Funciona com o cliente síncrono e com o assíncrono (mesma API de query builder)
+    column, is_desc = spec.column, spec.is_desc
+    # Total só na primeira página: com o cursor, o count contaria só o que vem depois dele
+    count = "exact" if spec.limit and not spec.cursor else None
+    query = client.table("produtos").select(spec.columns, count=count)
+
+    if spec.categoria:
+        query = query.eq("categoria", spec.categoria)
+    if spec.q:
+        query = query.ilike("nome", f"%{spec.q}%")
+
+    if spec.cursor:
+        value, last_id = _decode_cursor(spec.cursor)
+        op = "lt" if is_desc else "gt"
+        if column == "id":
+            query = query.filter("id", op, last_id)
+        elif value is None:
+            # Nulos ficam no fim (nas duas direções): depois de um nulo, só outros nulos
+            query = query.is_(column, "null").filter("id", op, last_id)
+        else:
+            # Desempate pelo id para linhas com o mesmo valor na coluna ordenada;
+            # preço/estoque nulos (linhas antigas) vêm depois de todos os valores
+            query = query.or_(f"{column}.{op}.{_quote(value)},"
+                              f"and({column}.eq.{_quote(value)},id.{op}.{last_id}),"
+                              f"{column}.is.null")
+
+    query = query.order(column, desc=is_desc, nullsfirst=False if column != "id" else None)
+    if column != "id":
+        query = query.order("id", desc=is_desc)
+
+    if spec.limit:
+        # Um item a mais indica se existe próxima página
+        query = query.limit(spec.limit + 1)
+    return query
+
+
+def _list_result(response, spec: ListSpec):
+    if not spec.limit:
+        return response.data
+
+    items = response.data[:spec.limit]
+    has_more = len(response.data) > spec.limit
+    return {
+        "items": items,
+        "total": response.count,
+        "next_cursor": _encode_cursor(items[-1], spec.column) if has_more else None,
+    }
+
+
+def listing_etag(order_by: str = "id", direction: str = "asc", limit: Optional[int] = None,
+                 cursor: Optional[str] = None, categoria: Optional[str] = None,
+                 q: Optional[str] = None, fields: Optional[str] = None,
+                 version: Optional[str] = None) -> str:
+    """ETag forte da listagem: versão do catálogo + parâmetros normalizados.
+
+    Calculado sem consultar o Supabase; deve ser lido ANTES de buscar os dados
+    (se uma escrita ocorrer no meio, o cliente só perde um 304, nunca recebe dados velhos).
+    A rota passa a mesma `version` para o serviço: uma única leitura da versão por requisição.
+    """
+    spec = _list_spec(order_by, direction, limit, cursor, categoria, q, fields)
+    digest = hashlib.sha1(spec.cache_key.encode("utf-8")).hexdigest()[:16]
+    return f'"{version or product_cache.version()}-{digest}"'
+
+
+def _encode_search_cursor(q: str, offset: int) -> str:
+    raw = json.dumps([q, offset], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_search_cursor(cursor: str, q: str) -> int:
+    # O cursor guarda o termo: reaproveitá-lo com outra busca pularia resultados
+    try:
+        cursor_q, offset = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if cursor_q != q or int(offset) < 0:
+            raise ValueError(cursor_q)
+        return int(offset)
+    except Exception:
+        raise InvalidParameterError("Cursor de paginação inválido.")
+
+
+def _search_result(rows: List[dict], q: str, offset: int, limit: int) -> Dict:
+    """Resposta de buscar_produtos (busca.sql): produtos com a relevância, mais relevantes primeiro"""
+    items = [dict(row["produto"], relevancia=row["relevancia"]) for row in rows[:limit]]
+    has_more = len(rows) > limit
+    return {"items": items, "next_cursor": _encode_search_cursor(q, offset + limit) if has_more else None}
+
+
+def _export_chunk(rows: List[dict], fmt: str, first: bool) -> str:
+    """Trecho do arquivo exportado com uma página de produtos"""
+    if fmt == "ndjson":
+        return "".join(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n" for row in rows)
+    # BOM + cabeçalho no primeiro trecho: o Excel abre em UTF-8 e a importação aceita o arquivo como está
+    return ("\ufeff" if first else "") + csv_import.format_rows(rows, header=first)
+
+
+def facets_etag(version: Optional[str] = None) -> str:
+    """ETag das contagens de categorias/tags (muda a cada escrita, como o da listagem)"""
+    return f'"{version or product_cache.version()}-facets"'
+
+
+def _facets_result(rows: List[dict]) -> Dict:
+    """Linhas de produtos_facetas (facetas.sql) agrupadas por tipo, mais usadas primeiro"""
+    result = {"total": 0, "categorias": [], "tags": []}
+    groups = {"categoria": result["categorias"], "tag": result["tags"]}
+    for row in rows:
+        if row["tipo"] == "total":
+            result["total"] = row["total"]
+        elif row["tipo"] in groups and row["total"] > 0:
+            groups[row["tipo"]].append({"valor": row["valor"], "total": row["total"]})
+    for items in groups.values():
+        items.sort(key=lambda item: (-item["total"], item["valor"]))
+    return result
+
 
 class ProductService:
+    """Importação de CSV (síncrona, executada em threads) e o pós-escrita comum.
+
+    O CRUD das rotas fica no AsyncProductService.
+    """
+
     @staticmethod
-    def list_products(order_by: str = "id", direction: str = "asc"):
-        if not supabase:
-            raise ServiceError("Supabase não configurado")
-        
-        # Mapeamento de campos seguros para evitar SQL Injection (mesmo que supabase proteja)
-        allowed_columns = {"id": "id", "name": "nome", "price": "preco", "stock": "estoque"}
-        column = allowed_columns.get(order_by, "id")
-        
-        try:
-            # desc=True se direction for "desc"
-            is_desc = (direction.lower() == "desc")
-            response = supabase.table("produtos").select("*").order(column, desc=is_desc).execute()
-            return response.data
-        except Exception as e:
-            raise ServiceError(f"Erro ao listar produtos: {str(e)}")
+    def bulk_import(file_content: bytes, chunk_size: Optional[int] = None):
+        return ProductService.bulk_import_stream(io.BytesIO(file_content), chunk_size)
 
     @staticmethod
-    def create_product(product: ProductCreate):
+    def bulk_import_stream(stream: BinaryIO, chunk_size: Optional[int] = None,
+                           progress: Optional[Callable[[dict], None]] = None,
+                           report: Optional[csv_import.ErrorReport] = None,
+                           only_lines: Optional[Set[int]] = None, dry_run: bool = False):
+        """Importa o CSV em lotes; erros por linha vão para `report`.
+
+        Só linhas novas ou alteradas são gravadas (as idênticas contam em "unchanged").
+        Com `only_lines` (reimportação), só essas linhas do arquivo são processadas.
+        Com `dry_run`, nada é gravado: as estatísticas e o "plan" mostram o que seria feito.
+        """
         if not supabase:
             raise ServiceError("Supabase não configurado")
-        
+
+        chunk_size = chunk_size or import_chunk_size
+        if report is None:
+            report = csv_import.ErrorReport(import_error_limit)
+
         try:
-            # Verificar duplicidade
-            existing = supabase.table("produtos").select("id").eq("nome", product.nome).execute()
-            if existing.data:
-                raise ProductAlreadyExistsError(f"Já existe um produto com o nome '{product.nome}'. Escolha outro nome.")
-                
-            data = product.model_dump(exclude_unset=True)
-            
-            response = supabase.table("produtos").insert(data).execute()
-            return response.data
-        except ProductAlreadyExistsError:
-            raise
+            with csv_import.open_stream(stream) as source:
+                stats = {"rows": 0, "created": 0, "updated": 0, "unchanged": 0, "errors": 0, "skipped": 0,
+                         "round_trips": 0, "chunks": []}
+                if dry_run:
+                    stats["plan"] = []
+
+                # Linhas validadas e gravadas em lotes limitados: memória constante
+                # independente do tamanho do arquivo.
+                # Nomes repetidos no lote: vale a última ocorrência (como no upsert linha a linha)
+                batch = {}
+                read = 0
+                for rows in csv_import.chunked(source.rows, chunk_size):
+                    lines = range(read + 1, read + len(rows) + 1)
+                    read += len(rows)
+                    if only_lines is not None:
+                        kept = [i for i, line in enumerate(lines) if line in only_lines]
+                        stats["skipped"] += len(rows) - len(kept)
+                        rows, lines = [rows[i] for i in kept], [lines[i] for i in kept]
+
+                    validation = csv_import.validate_batch(rows, source.columns, lines)
+                    stats["rows"] += len(rows)
+                    stats["errors"] += len(validation.errors)
+                    report.extend(validation.errors)
+
+                    for line, payload in zip(validation.lines, validation.payloads):
+                        if payload["nome"] in batch:
+                            stats["updated"] += 1
+                        batch[payload["nome"]] = (line, payload)
+
+                        if len(batch) >= chunk_size:
+                            ProductService._import_chunk(batch, stats, report, dry_run)
+                            batch = {}
+                            if progress:
+                                progress(stats)
+
+                if batch:
+                    ProductService._import_chunk(batch, stats, report, dry_run)
+                if progress:
+                    progress(stats)
+
+                return stats
+
+        except UnicodeDecodeError as e:
+            raise ServiceError(f"Erro ao processar arquivo: {str(e)}")
+        except ValueError as e:
+            # Cabeçalho inválido (colunas obrigatórias ausentes)
+            raise ServiceError(str(e))
         except Exception as e:
-            raise ServiceError(f"Erro ao criar produto: {str(e)}")
+            raise ServiceError(f"Erro ao processar arquivo: {str(e)}")
 
     @staticmethod
-    def update_product(product_id: int, product: ProductCreate):
-        if not supabase:
-            raise ServiceError("Supabase não configurado")
-        
+    def _import_chunk(batch: Dict[str, Tuple[int, dict]], stats: dict, report: csv_import.ErrorReport,
+                      dry_run: bool = False):
+        timing = {"rows": len(batch), "lookup_ms": 0.0, "write_ms": 0.0}
+        to_write, rejected, events = [], [], None
         try:
-            # Verificar duplicidade se nome mudou
-            existing = supabase.table("produtos").select("id").eq("nome", product.nome).neq("id", product_id).execute()
-            if existing.data:
-                raise ProductAlreadyExistsError(f"Já existe outro produto com o nome '{product.nome}'.")
-
-            data = product.model_dump(exclude_unset=True)
-            response = supabase.table("produtos").update(data).eq("id", product_id).execute()
-            
-            if not response.data:
-                raise ResourceNotFoundError(f"Produto {product_id} não encontrado.")
-                
-            return response.data
-        except (ProductAlreadyExistsError, ResourceNotFoundError):
-            raise
+            started = time.perf_counter()
+            existing = execute(supabase.table("produtos").select(IMPORT_DIFF_COLUMNS).in_("nome", list(batch)), "select")
+            stats["round_trips"] += 1
+            current = {row["nome"]: row for row in existing.data or []}
+            timing["lookup_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+            # Diff por linha: só vai para o banco o que é novo ou mudou
+            created = updated = unchanged = 0
+            plan = []
+            for nome, (line, payload) in batch.items():
+                row = current.get(nome)
+                if row is None and payload["preco"] is None:
+                    rejected.append(csv_import.row_error(line, nome, "preco", "Preço obrigatório para produto novo"))
+                    continue
+                # Preço e estoque vazios: mantém o valor atual (produto novo começa com estoque 0)
+                for field in ("preco", "estoque"):
+                    if payload[field] is None:
+                        payload[field] = row[field] if row else 0
+                if row is None:
+                    created += 1
+                    plan.append({"linha": line, "nome": nome, "acao": "criar", "campos": list(payload)})
+                else:
+                    changed = _changed_fields(payload, row)
+                    if not changed:
+                        unchanged += 1
+                        continue
+                    updated += 1
+                    plan.append({"linha": line, "nome": nome, "acao": "atualizar", "campos": changed})
+                to_write.append(payload)
+
+            if dry_run:
+                # Plano limitado como o relatório de erros (as contagens continuam completas)
+                room = report.limit - len(stats["plan"])
+                stats["plan"].extend(plan[:max(room, 0)])
+            elif to_write:
+                # Criações e atualizações no mesmo comando: upsert pela restrição única em nome
+                started = time.perf_counter()
+                response = execute(supabase.table("produtos").upsert(to_write, on_conflict="nome"), "upsert")
+                stats["round_trips"] += 1
+                ids = {row["nome"]: row["id"] for row in response.data or []}
+                events = [change_event("created" if p["acao"] == "criar" else "updated", ids.get(p["nome"]), p["campos"])
+                          for p in plan]
+                timing["write_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            stats["created"] += created
+            stats["updated"] += updated
+            stats["unchanged"] += unchanged
+            stats["errors"] += len(rejected)
+            report.extend(rejected)
         except Exception as e:
-            raise ServiceError(f"Erro ao atualizar produto: {str(e)}")
+            # Lote inteiro falhou: cada linha entra no relatório (e pode ser reimportada)
+            stats["errors"] += len(batch)
+            report.extend([csv_import.row_error(line, nome, "", f"Erro ao gravar o lote: {e}")
+                           for nome, (line, _) in batch.items()])
+        finally:
+            stats["chunks"].append(timing)
+            if to_write and not dry_run:
+                ProductService._after_write(events)
 
     @staticmethod
-    def delete_product(product_id: int):
-        if not supabase:
-            raise ServiceError("Supabase não configurado")
-            
+    def _after_write(events: Optional[List[Dict]] = None):
+        # Chamado depois da gravação confirmada: falha no cache ou nos eventos não pode
+        # virar erro da requisição (o produto já está no banco)
         try:
-            response = supabase.table("produtos").delete().eq("id", product_id).execute()
-            if not response.data:
-                raise ResourceNotFoundError(f"Produto {product_id} não encontrado.")
-            return True
-        except ResourceNotFoundError:
-            raise
+            # Toda escrita invalida as listagens em cache e avança a versão do catálogo (ETag)
+            product_cache.invalidate()
         except Exception as e:
-            raise ServiceError(f"Erro ao deletar produto: {str(e)}")
-
-    @staticmethod
-    def bulk_import(file_content: bytes):
-        if not supabase:
-            raise ServiceError("Supabase não configurado")
-        
-        import csv
-        import io
-
+            print(f"Aviso: falha ao invalidar o cache de produtos: {e}")
         try:
-            # Decodificar bytes para string (suporte a BOM do Excel)
-            decoded = file_content.decode('utf-8-sig')
-            
-            # Detecção inteligente de delimitador
-            try:
-                # Ler a primeira linha para estimar
-                first_line = decoded.splitlines()[0]
-                dialect = csv.Sniffer().sniff(first_line, delimiters=';,')
-                delimiter = dialect.delimiter
-            except:
-                # Fallback se o Sniffer falhar
-                delimiter = ';' if ';' in decoded.splitlines()[0] else ','
-
-            csv_reader = csv.DictReader(io.StringIO(decoded), delimiter=delimiter)
-
-            # Validação Estrita de Colunas
-            headers = [h.strip().lower() for h in csv_reader.fieldnames or []]
-            headers_set = set(headers)
-            
-            required_cols = {'nome', 'categoria', 'descricao', 'tags', 'preco', 'estoque'}
-            missing = required_cols - headers_set
-            
-            # Se faltar colunas, pode ser que o delimitador detectado esteja errado (ex: ; vs ,)
-            # Tentar forçar o outro se falhar muito feio (nenhuma coluna encontrada)
-            if missing and len(headers) <= 1:
-                # Provavelmente leu tudo como uma coluna só. Tentar o outro.
-                alt_delimiter = ',' if delimiter == ';' else ';'
-                csv_reader = csv.DictReader(io.StringIO(decoded), delimiter=alt_delimiter)
-                headers = [h.strip().lower() for h in csv_reader.fieldnames or []]
-                headers_set = set(headers)
-                missing = required_cols - headers_set
-
-            if missing:
-                raise ServiceError(f"Arquivo inválido. Faltam as colunas: {', '.join(missing)}")
-
-            stats = {"created": 0, "updated": 0, "errors": 0}
-            
-            for i, row_raw in enumerate(csv_reader):
-                try:
-                    # Normalizar chaves para acesso seguro
-                    row = {k.strip().lower(): v.strip() for k, v in row_raw.items() if k}
-                    
-                    nome = row.get('nome')
-                    categoria = row.get('categoria')
-                    preco_str = row.get('preco')
-                    estoque_str = row.get('estoque')
-                    
-                    # Validação de Campos Obrigatórios (apenas dados, não headers)
-                    missing_fields = []
-                    if not nome: missing_fields.append('nome')
-                    if not categoria: missing_fields.append('categoria')
-                    if not preco_str: missing_fields.append('preco')
-                    if not estoque_str: missing_fields.append('estoque')
-                    
-                    if missing_fields:
-                        raise ValueError(f"Campos obrigatórios vazios: {', '.join(missing_fields)}")
-
-                    # Conversão de Tipos
-                    try:
-                        preco = float(preco_str.replace(',', '.'))
-                        if preco < 0: raise ValueError
-                    except:
-                        raise ValueError(f"Preço inválido: {preco_str}")
-
-                    try:
-                        estoque = int(float(estoque_str))
-                        if estoque < 0: raise ValueError
-                    except:
-                        raise ValueError(f"Estoque inválido: {estoque_str}")
-
-                    # Campos Opcionais
-                    descricao = row.get('descricao') or ""
-                    tags_str = row.get('tags') or ""
-                    tags = [t.strip() for t in tags_str.split(',') if t.strip()]
-
-                    # Upsert Logic
-                    existing = supabase.table("produtos").select("id").eq("nome", nome).execute()
-                    
-                    payload = {
-                        "nome": nome,
-                        "preco": preco,
-                        "estoque": estoque,
-                        "categoria": categoria,
-                        "descricao": descricao,
-                        "tags": tags
-                    }
-
-                    if existing.data:
-                        # Update
-                        pid = existing.data[0]['id']
-                        supabase.table("produtos").update(payload).eq("id", pid).execute()
-                        stats["updated"] += 1
-                    else:
-                        # Create
-                        supabase.table("produtos").insert(payload).execute()
-                        stats["created"] += 1
-                        
-                except Exception as e:
-                    # Capturamos o ValueError lançado pela validação acima
-                    print(f"Erro na linha {i+1} ({row.get('nome', 'SemNome')}): {e}")
-                    stats["errors"] += 1
-            
-            return stats
-
+            # Eventos só das gravações confirmadas (GET /products/stream)
+            event_hub.publish(events)
         except Exception as e:
-            raise ServiceError(f"Erro ao processar arquivo: {str(e)}")
+            print(f"Aviso: falha ao publicar eventos do catálogo: {e}")
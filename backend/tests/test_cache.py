@@ -0,0 +1,96 @@
+import sys
+import time
+import types
+from unittest.mock import patch
+from core.cache import MemoryCache, NullCache, RedisCache
+
+def test_memory_cache_hit_and_miss():
+    cache = MemoryCache(ttl=60, max_entries=10)
+    assert cache.get("a") is None
+    cache.set("a", [1, 2])
+    assert cache.get("a") == [1, 2]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_memory_cache_ttl_expires():
+    cache = MemoryCache(ttl=0.01, max_entries=10)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+def test_memory_cache_lru_eviction():
+    """Deve despejar a entrada usada há mais tempo ao passar do limite"""
+    cache = MemoryCache(ttl=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+def test_memory_cache_invalidate():
+    cache = MemoryCache(ttl=60, max_entries=10)
+    cache.set("a", 1)
+    cache.invalidate()
+    assert cache.get("a") is None
+
+def test_null_cache_never_stores():
+    cache = NullCache(ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+def test_null_cache_version_changes_with_time_window():
+    """Sem cache, a versão (ETag) ainda expira a cada TTL: escritas em outro worker não ficam escondidas"""
+    cache = NullCache(ttl=30)
+    with patch("core.cache.time.time", return_value=1000.0):
+        first = cache.version()
+        assert cache.version() == first
+    with patch("core.cache.time.time", return_value=1030.0):
+        assert cache.version() != first
+
+def test_memory_cache_drops_set_after_invalidate():
+    """Leitura que começou antes de uma escrita não grava o resultado velho no cache"""
+    cache = MemoryCache(ttl=60, max_entries=10)
+    version = cache.version()
+    cache.invalidate()
+    cache.set("a", "antes da escrita", version=version)
+    assert cache.get("a") is None
+    cache.set("a", "atual", version=cache.version())
+    assert cache.get("a") == "atual"
+
+class CountingRedis:
+    """Redis mínimo que conta as idas à rede (GET/SET)"""
+
+    def __init__(self):
+        self.data = {}
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        return self.data.get(key)
+
+    def set(self, key, value, px=None):
+        self.calls += 1
+        self.data[key] = value.encode()
+
+    def incr(self, key):
+        self.calls += 1
+        self.data[key] = str(int(self.data.get(key, b"0")) + 1).encode()
+
+def test_redis_cache_reuses_version_read_by_request():
+    """Com a versão já lida (ETag), o cache não consulta a geração de novo"""
+    server = CountingRedis()
+    fake = types.SimpleNamespace(Redis=types.SimpleNamespace(from_url=lambda url: server))
+    with patch.dict(sys.modules, {"redis": fake}):
+        cache = RedisCache("redis://fake", ttl=60)
+
+    version = cache.version()
+    assert cache.get("a", version=version) is None
+    cache.set("a", [1], version=version)
+    assert server.calls == 3
+    assert cache.get("a", version=version) == [1]
+    assert server.calls == 4
+
+    cache.invalidate()
+    assert cache.get("a", version=cache.version()) is None
@@ -0,0 +1,248 @@
+import io
+import tempfile
+import pytest
+from unittest.mock import patch, MagicMock
+from core.exceptions import ServiceError
+from services import csv_import
+from services.product_service import ProductService, _export_chunk
+
+CSV_OK = (
+    "nome;categoria;descricao;tags;preco;estoque\n"
+    "Açaí;Bebidas;Gelado;vegano, fitness;10,50;5\n"
+    "Suco;Bebidas;;;7.00;3\n"
+)
+
+def make_supabase(existing_rows):
+    """Cria um cliente Supabase falso que responde à consulta de nomes existentes"""
+    supabase = MagicMock()
+    table = supabase.table.return_value
+    table.select.return_value.in_.return_value.execute.return_value.data = existing_rows
+    return supabase
+
+COLUMNS = {"nome": 0, "categoria": 1, "descricao": 2, "tags": 3, "preco": 4, "estoque": 5}
+
+def test_validate_batch_converts_types():
+    """Deve converter preço, estoque e tags coluna a coluna"""
+    result = csv_import.validate_batch([[" Açaí ", "Bebidas", "", "a, b,", "10,5", "3.0"]], COLUMNS)
+    assert result.errors == []
+    assert result.payloads == [{"nome": "Açaí", "preco": 10.5, "estoque": 3, "categoria": "Bebidas",
+                                "descricao": "", "tags": ["a", "b"]}]
+
+def test_validate_batch_reports_errors_per_row():
+    """Deve separar linhas válidas e relatar erros com linha, campo e motivo"""
+    rows = [
+        ["X", "C", "", "", "-1", "1"],
+        ["Ok", "C", "", "", "1", "1"],
+        ["Y", "C", "", "", "abc", "1"],
+        ["Z", "C", "", "", "nan", "1"],
+        ["", "C", "", "", "1", ""],
+        ["W", "C", "", "", "1", "1e400"],
+        ["Curta", "C"],
+    ]
+    result = csv_import.validate_batch(rows, COLUMNS, range(10, 17))
+    # Preço e estoque vazios (linha curta) são resolvidos na gravação, contra o banco
+    assert [p["nome"] for p in result.payloads] == ["Ok", "Curta"]
+    assert result.lines == [11, 16]
+    assert result.errors == [
+        {"linha": 10, "nome": "X", "campo": "preco", "motivo": "Preço inválido: -1"},
+        {"linha": 12, "nome": "Y", "campo": "preco", "motivo": "Preço inválido: abc"},
+        {"linha": 13, "nome": "Z", "campo": "preco", "motivo": "Preço inválido: nan"},
+        {"linha": 14, "nome": "SemNome", "campo": "nome", "motivo": "Campos obrigatórios vazios: nome"},
+        {"linha": 15, "nome": "W", "campo": "estoque", "motivo": "Estoque inválido: 1e400"},
+    ]
+
+def test_open_reader_detects_comma_delimiter():
+    """Deve aceitar CSV separado por vírgula e mapear os cabeçalhos normalizados"""
+    source = csv_import.open_reader(io.StringIO(" Nome ,categoria,descricao,tags,preco,ESTOQUE\n\nA,B,C,,1,1\n"))
+    assert source.columns["nome"] == 0 and source.columns["estoque"] == 5
+    assert list(source.rows) == [["A", "B", "C", "", "1", "1"]]
+
+def test_open_reader_missing_columns():
+    """Deve falhar se faltar alguma coluna obrigatória"""
+    with pytest.raises(ValueError):
+        csv_import.open_reader(io.StringIO("nome;preco\nA;1\n"))
+
+def test_bulk_import_batches_writes():
+    """Deve consultar nomes e gravar em lote, em vez de 1-2 chamadas por linha"""
+    supabase = make_supabase([{"id": 7, "nome": "Suco"}])
+    with patch('services.product_service.supabase', supabase):
+        stats = ProductService.bulk_import(CSV_OK.encode('utf-8'))
+
+    assert stats["created"] == 1
+    assert stats["updated"] == 1
+    assert stats["errors"] == 0
+    assert stats["round_trips"] == 2
+    assert len(stats["chunks"]) == 1
+
+    table = supabase.table.return_value
+    rows = table.upsert.call_args[0][0]
+    assert table.upsert.call_args[1] == {"on_conflict": "nome"}
+    assert [p["nome"] for p in rows] == ["Açaí", "Suco"]
+    assert rows[1] == {"nome": "Suco", "preco": 7.0, "estoque": 3, "categoria": "Bebidas",
+                       "descricao": "", "tags": []}
+
+def test_bulk_import_chunk_size():
+    """Deve dividir a escrita em lotes do tamanho configurado"""
+    supabase = make_supabase([])
+    with patch('services.product_service.supabase', supabase):
+        stats = ProductService.bulk_import(CSV_OK.encode('utf-8'), chunk_size=1)
+
+    assert stats["created"] == 2
+    assert len(stats["chunks"]) == 2
+    assert stats["round_trips"] == 4
+    assert supabase.table.return_value.upsert.call_count == 2
+
+def test_bulk_import_stream_keeps_upload_open():
+    """Deve ler o upload em streaming (com BOM) sem fechar o arquivo original"""
+    stream = io.BytesIO(CSV_OK.encode('utf-8-sig'))
+    supabase = make_supabase([])
+    with patch('services.product_service.supabase', supabase):
+        stats = ProductService.bulk_import_stream(stream, chunk_size=1)
+
+    assert stats["created"] == 2
+    assert not stream.closed
+
+class Py39SpooledFile(tempfile.SpooledTemporaryFile):
+    """SpooledTemporaryFile como no Python 3.9 (imagem do Dockerfile): sem readable/seekable/writable"""
+
+    def __getattribute__(self, name):
+        if name in ("readable", "seekable", "writable"):
+            raise AttributeError(name)
+        return super().__getattribute__(name)
+
+def test_bulk_import_stream_from_spooled_upload():
+    """O arquivo do UploadFile (SpooledTemporaryFile) é importado direto, sem cópia"""
+    for upload in (tempfile.SpooledTemporaryFile(), Py39SpooledFile()):
+        upload.write(CSV_OK.encode('utf-8-sig'))
+        upload.seek(0)
+        with patch('services.product_service.supabase', make_supabase([])):
+            stats = ProductService.bulk_import_stream(upload)
+
+        assert stats["created"] == 2
+        assert not upload.closed
+
+def test_bulk_import_counts_invalid_rows():
+    """Linhas inválidas contam como erro e não são gravadas"""
+    content = CSV_OK + "Ruim;Bebidas;;;abc;1\n"
+    supabase = make_supabase([])
+    with patch('services.product_service.supabase', supabase):
+        stats = ProductService.bulk_import(content.encode('utf-8'))
+
+    assert stats["errors"] == 1
+    assert stats["created"] == 2
+    assert stats["rows"] == 3
+
+def test_error_report_is_bounded():
+    """Deve guardar só os primeiros erros, mas contar todos"""
+    report = csv_import.ErrorReport(limit=2)
+    report.extend([csv_import.row_error(i, f"P{i}", "preco", "Preço inválido: x") for i in range(1, 4)])
+    assert report.total == 3
+    assert report.truncated
+    assert report.failed_lines() == {1, 2}
+    assert report.to_csv().splitlines() == ["linha;nome;campo;motivo",
+                                            "1;P1;preco;Preço inválido: x", "2;P2;preco;Preço inválido: x"]
+
+def test_bulk_import_reports_failed_chunk_rows():
+    """Falha ao gravar um lote registra cada linha do lote no relatório"""
+    supabase = make_supabase([])
+    supabase.table.return_value.upsert.return_value.execute.side_effect = Exception("timeout")
+    report = csv_import.ErrorReport(limit=10)
+    with patch('services.product_service.supabase', supabase):
+        stats = ProductService.bulk_import_stream(io.BytesIO(CSV_OK.encode('utf-8')), report=report)
+
+    assert stats["errors"] == 2
+    assert report.failed_lines() == {1, 2}
+    assert report.errors[0]["motivo"] == "Erro ao gravar o lote: timeout"
+
+def test_bulk_import_only_lines():
+    """Reimportação processa só as linhas informadas"""
+    supabase = make_supabase([])
+    with patch('services.product_service.supabase', supabase):
+        stats = ProductService.bulk_import_stream(io.BytesIO(CSV_OK.encode('utf-8')), only_lines={2})
+
+    assert stats["rows"] == 1
+    assert stats["skipped"] == 1
+    rows = supabase.table.return_value.upsert.call_args[0][0]
+    assert [p["nome"] for p in rows] == ["Suco"]
+
+SUCO_ATUAL = {"nome": "Suco", "preco": "7.00", "estoque": 3, "categoria": "Bebidas", "descricao": None, "tags": None}
+
+def test_bulk_import_skips_unchanged_rows():
+    """Linhas idênticas ao banco não são gravadas"""
+    supabase = make_supabase([SUCO_ATUAL])
+    with patch('services.product_service.supabase', supabase):
+        stats = ProductService.bulk_import(CSV_OK.encode('utf-8'))
+
+    assert (stats["created"], stats["updated"], stats["unchanged"]) == (1, 0, 1)
+    rows = supabase.table.return_value.upsert.call_args[0][0]
+    assert [p["nome"] for p in rows] == ["Açaí"]
+
+def test_bulk_import_all_unchanged_skips_write():
+    """Lote sem mudanças não faz o upsert (só a consulta)"""
+    content = "nome;categoria;descricao;tags;preco;estoque\nSuco;Bebidas;;;7,00;3\n"
+    supabase = make_supabase([SUCO_ATUAL])
+    with patch('services.product_service.supabase', supabase):
+        stats = ProductService.bulk_import(content.encode('utf-8'))
+
+    assert stats["unchanged"] == 1
+    assert stats["round_trips"] == 1
+    supabase.table.return_value.upsert.assert_not_called()
+
+def test_bulk_import_dry_run():
+    """dry_run devolve o plano sem gravar nada"""
+    supabase = make_supabase([dict(SUCO_ATUAL, estoque=10)])
+    with patch('services.product_service.supabase', supabase):
+        stats = ProductService.bulk_import_stream(io.BytesIO(CSV_OK.encode('utf-8')), dry_run=True)
+
+    assert (stats["created"], stats["updated"], stats["unchanged"]) == (1, 1, 0)
+    assert stats["plan"][1] == {"linha": 2, "nome": "Suco", "acao": "atualizar", "campos": ["estoque"]}
+    supabase.table.return_value.upsert.assert_not_called()
+
+def test_bulk_import_missing_columns():
+    """Arquivo sem as colunas obrigatórias gera ServiceError"""
+    with patch('services.product_service.supabase', make_supabase([])):
+        with pytest.raises(ServiceError):
+            ProductService.bulk_import(b"nome;preco\nA;1\n")
+
+def test_export_round_trips_into_import():
+    """O CSV exportado volta pela importação com os mesmos valores"""
+    products = [{"id": 1, "nome": "Café; Torrado", "categoria": "Mercearia", "descricao": 'Grão "especial"',
+                 "tags": ["café", "gourmet"], "preco": 32.9, "estoque": 4},
+                {"id": 2, "nome": "Suco", "categoria": "Bebidas", "descricao": None, "tags": [],
+                 "preco": 7, "estoque": 0}]
+    content = _export_chunk(products[:1], "csv", first=True) + _export_chunk(products[1:], "csv", first=False)
+
+    with csv_import.open_stream(io.BytesIO(content.encode("utf-8"))) as source:
+        result = csv_import.validate_batch(list(source.rows), source.columns)
+
+    assert result.errors == []
+    assert result.payloads == [
+        {"nome": "Café; Torrado", "preco": 32.9, "estoque": 4, "categoria": "Mercearia",
+         "descricao": 'Grão "especial"', "tags": ["café", "gourmet"]},
+        {"nome": "Suco", "preco": 7.0, "estoque": 0, "categoria": "Bebidas", "descricao": "", "tags": []},
+    ]
+
+def test_export_with_null_fields_reimports():
+    """Colunas nulas exportadas vazias: a reimportação mantém o produto como está"""
+    atual = {"nome": "Café", "categoria": None, "descricao": "d", "tags": ["a"], "preco": None, "estoque": 2}
+    content = _export_chunk([dict(atual, id=1)], "csv", first=True) + "Novo;;;;;\nSem preço;;;;;3\n"
+    supabase = make_supabase([atual])
+    report = csv_import.ErrorReport(10)
+    with patch('services.product_service.supabase', supabase):
+        stats = ProductService.bulk_import_stream(io.BytesIO(content.encode("utf-8")), report=report)
+
+    assert (stats["created"], stats["unchanged"], stats["errors"]) == (0, 1, 2)
+    assert [(e["linha"], e["motivo"]) for e in report.errors] == [(2, "Preço obrigatório para produto novo"),
+                                                                  (3, "Preço obrigatório para produto novo")]
+    supabase.table.return_value.upsert.assert_not_called()
+
+def test_import_empty_price_and_stock_keep_current_values():
+    content = "nome;categoria;descricao;tags;preco;estoque\nSuco;;;;;\nChá;Bebidas;;;5;\n"
+    supabase = make_supabase([dict(SUCO_ATUAL, categoria="Bebidas")])
+    with patch('services.product_service.supabase', supabase):
+        stats = ProductService.bulk_import(content.encode("utf-8"))
+
+    assert (stats["created"], stats["updated"]) == (1, 1)
+    rows = supabase.table.return_value.upsert.call_args[0][0]
+    assert rows == [{"nome": "Suco", "preco": "7.00", "estoque": 3, "categoria": None, "descricao": "", "tags": []},
+                    {"nome": "Chá", "preco": 5.0, "estoque": 0, "categoria": "Bebidas", "descricao": "", "tags": []}]
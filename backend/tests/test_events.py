@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from unittest.mock import patch, MagicMock, AsyncMock
+from core.events import EventHub, RESYNC, change_event, sse_stream
+from services.async_product_service import AsyncProductService
+
+def test_hub_fans_out_to_every_client():
+    async def scenario():
+        hub = EventHub(queue_size=10)
+        first, second = hub.subscribe(), hub.subscribe()
+        hub.publish([change_event("updated", 1, ["preco"])])
+        await asyncio.sleep(0)
+        return first.get_nowait(), second.get_nowait(), hub.stats()
+
+    first, second, stats = asyncio.run(scenario())
+    assert first == second == {"op": "updated", "id": 1, "fields": ["preco"]}
+    assert stats["clients"] == 2
+
+def test_slow_client_gets_single_resync():
+    """Fila cheia: pendentes descartados e um único resync, sem bloquear quem publica"""
+    async def scenario():
+        hub = EventHub(queue_size=2)
+        queue = hub.subscribe()
+        for i in range(5):
+            hub.publish([change_event("deleted", i)])
+        await asyncio.sleep(0)
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    events = asyncio.run(scenario())
+    assert events[0] == RESYNC
+    assert RESYNC not in events[1:]
+
+def test_large_batch_becomes_resync():
+    async def scenario():
+        hub = EventHub(queue_size=3)
+        queue = hub.subscribe()
+        hub.publish([change_event("created", i) for i in range(10)])
+        await asyncio.sleep(0)
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    assert asyncio.run(scenario()) == [RESYNC]
+
+def test_publish_from_worker_thread():
+    """Importação roda em threads: a entrega é agendada no event loop do cliente"""
+    async def scenario():
+        hub = EventHub(queue_size=10)
+        queue = hub.subscribe()
+        thread = threading.Thread(target=hub.publish, args=([change_event("created", 7)],))
+        thread.start()
+        thread.join()
+        return await asyncio.wait_for(queue.get(), timeout=1)
+
+    assert asyncio.run(scenario())["id"] == 7
+
+def test_sse_stream_formats_events_and_heartbeat():
+    async def scenario():
+        hub = EventHub(queue_size=10)
+        disconnected = asyncio.Event()
+
+        async def is_disconnected():
+            return disconnected.is_set()
+
+        stream = sse_stream(hub, is_disconnected, heartbeat=0.01)
+        chunks = [await stream.__anext__()]
+        hub.publish([change_event("deleted", 3)])
+        chunks.append(await stream.__anext__())
+        chunks.append(await stream.__anext__())
+        disconnected.set()
+        await stream.aclose()
+        return chunks, hub.stats()
+
+    chunks, stats = asyncio.run(scenario())
+    assert chunks == ["retry: 3000\n\n", 'event: deleted\ndata: {"op":"deleted","id":3}\n\n', ": ping\n\n"]
+    assert stats["clients"] == 0
+
+def test_writes_publish_change_events():
+    query = MagicMock()
+    query.execute = AsyncMock(return_value=MagicMock(data=[{"id": 5}]))
+    supabase = MagicMock()
+    supabase.table.return_value.delete.return_value.eq.return_value = query
+    with patch('services.async_product_service.get_async_supabase', AsyncMock(return_value=supabase)), \
+         patch('services.product_service.event_hub') as hub:
+        asyncio.run(AsyncProductService.delete_product(5))
+
+    hub.publish.assert_called_once_with([{"op": "deleted", "id": 5}])
@@ -0,0 +1,74 @@
+import io
+import sys
+import types
+from unittest.mock import patch, MagicMock
+from services.import_jobs import ImportJobManager, RedisJobStore
+
+class FakeRedis:
+    """Redis mínimo (set/mget/pexpire em pipeline) compartilhado pelos "workers" do teste"""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def set(self, key, value, px=None):
+        self.data[key] = value.encode()
+
+    def pexpire(self, key, ms):
+        pass
+
+    def execute(self):
+        pass
+
+    def mget(self, *keys):
+        return [self.data.get(k) for k in keys]
+
+def redis_store(server):
+    fake = types.SimpleNamespace(Redis=types.SimpleNamespace(from_url=lambda url: server))
+    with patch.dict(sys.modules, {"redis": fake}):
+        return RedisJobStore("redis://fake", ttl=60)
+
+def test_redis_store_shares_jobs_between_workers():
+    """Status, relatório de erros e reimportação funcionam em outro worker"""
+    server = FakeRedis()
+    worker_a = ImportJobManager(max_workers=1, store=redis_store(server))
+    worker_b = ImportJobManager(max_workers=1, store=redis_store(server))
+    supabase = MagicMock()
+    supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = []
+    content = "nome;categoria;descricao;tags;preco;estoque\nSuco;Bebidas;;;7;3\nRuim;Bebidas;;;abc;1\n"
+
+    with patch('services.product_service.supabase', supabase):
+        job = worker_a.run(io.BytesIO(content.encode()), "p.csv")
+
+    other = worker_b.get(job.id)
+    assert other.to_dict()["status"] == "completed"
+    assert (other.to_dict()["created"], other.to_dict()["errors"]) == (1, 1)
+    assert other.report.errors == [{"linha": 2, "nome": "Ruim", "campo": "preco", "motivo": "Preço inválido: abc"}]
+    assert worker_b.retry_lines(job.id) == {2}
+    assert worker_b.get("inexistente") is None
+
+def test_job_state_keeps_only_counters():
+    """O estado gravado a cada lote não carrega os tempos por lote (custo constante por gravação)"""
+    server = FakeRedis()
+    saved = []
+    original_set = server.set
+    server.set = lambda key, value, px=None: (saved.append(value), original_set(key, value, px))
+    manager = ImportJobManager(max_workers=1, store=redis_store(server))
+    supabase = MagicMock()
+    supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = []
+    content = "nome;categoria;descricao;tags;preco;estoque\n" + "".join(
+        f"Produto {i};Bebidas;;;7;3\n" for i in range(20))
+
+    with patch('services.product_service.supabase', supabase), \
+         patch('services.product_service.import_chunk_size', 2):
+        job = manager.run(io.BytesIO(content.encode()), "p.csv")
+
+    assert job.stats["created"] == 20
+    assert "chunks" not in job.stats
+    states = [s for s in saved if '"stats"' in s]
+    assert len(states) > 10
+    assert all('"chunks"' not in s for s in states)
+    progress = [s for s in states if '"rows"' in s and '"running"' in s]
+    assert len(progress[-1]) - len(progress[0]) < 20
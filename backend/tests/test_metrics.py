@@ -0,0 +1,55 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
+from core import metrics
+from main import app
+
+client = TestClient(app)
+
+def test_histogram_renders_prometheus_text():
+    """Buckets cumulativos, soma e contagem por combinação de labels"""
+    registry = metrics.Registry()
+    histogram = registry.histogram("latencia_seconds", "Teste", ("rota",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, rota="/a")
+    histogram.observe(0.5, rota="/a")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE latencia_seconds histogram" in lines
+    assert 'latencia_seconds_bucket{rota="/a",le="0.1"} 1' in lines
+    assert 'latencia_seconds_bucket{rota="/a",le="1.0"} 2' in lines
+    assert 'latencia_seconds_bucket{rota="/a",le="+Inf"} 2' in lines
+    assert 'latencia_seconds_count{rota="/a"} 2' in lines
+
+def test_supabase_call_labels_errors():
+    """Falhas contam por código do Postgres e são medidas com outcome=error"""
+    before = metrics.supabase_errors.value(operation="insert", table="teste", error="23505")
+    with pytest.raises(APIError):
+        with metrics.supabase_call("insert", "teste"):
+            raise APIError({"code": "23505", "message": "duplicate key"})
+
+    assert metrics.supabase_errors.value(operation="insert", table="teste", error="23505") == before + 1
+    assert metrics.supabase_request_duration.count(operation="insert", table="teste", outcome="error") >= 1
+
+def test_metrics_endpoint_uses_route_template():
+    """Latência agrupada pelo template da rota, não pelo path cru"""
+    client.get("/products/upload/inexistente")
+    body = client.get("/metrics").text
+
+    assert 'route="/products/upload/{job_id}",status="404"' in body
+    assert "/products/upload/inexistente" not in body
+
+def test_server_timing_header():
+    """Com Server-Timing ligado, tempos do Supabase aparecem na resposta"""
+    demo = FastAPI()
+
+    @demo.get("/demo")
+    def demo_route():
+        with metrics.supabase_call("select", "produtos"):
+            pass
+        return {}
+
+    demo.add_middleware(metrics.MetricsMiddleware, server_timing=True)
+    header = TestClient(demo).get("/demo").headers["server-timing"]
+    assert header.startswith('db-select;dur=')
+    assert 'desc="1x"' in header and "app;dur=" in header
@@ -0,0 +1,397 @@
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from core.cache import product_cache
+from core.exceptions import InvalidParameterError
+from services.async_product_service import AsyncProductService
+from services.product_service import _encode_cursor
+
+
+class FakeQuery:
+    """Query builder falso: registra as chamadas e devolve os dados configurados"""
+
+    def __init__(self, data=None, count=None):
+        self.calls = []
+        self.data = data or []
+        self.count = count
+
+    def __getattr__(self, name):
+        def method(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return method
+
+    def execute(self):
+        return MagicMock(data=self.data, count=self.count)
+
+
+class AsyncFakeQuery(FakeQuery):
+    async def execute(self):
+        return MagicMock(data=self.data, count=self.count)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    product_cache.invalidate()
+    yield
+    product_cache.invalidate()
+
+
+def make_supabase(query):
+    supabase = MagicMock()
+    supabase.table.return_value = query
+    return supabase
+
+
+def list_async(query, *args, **kwargs):
+    with patch('services.async_product_service.get_async_supabase',
+               AsyncMock(return_value=make_supabase(query))):
+        return asyncio.run(AsyncProductService.list_products(*args, **kwargs))
+
+
+def test_list_products_legacy_returns_list():
+    """Sem limit deve devolver a lista completa, como antes"""
+    query = AsyncFakeQuery(data=[{"id": 1}, {"id": 2}])
+    result = list_async(query, "price", "desc")
+
+    assert result == [{"id": 1}, {"id": 2}]
+    assert ("order", ("preco",), {"desc": True, "nullsfirst": False}) in query.calls
+
+
+def test_list_products_page_with_filters():
+    """Com limit deve aplicar filtros no banco e devolver o envelope paginado"""
+    rows = [{"id": i, "nome": f"P{i}", "preco": 10.0} for i in range(1, 4)]
+    query = AsyncFakeQuery(data=rows, count=40)
+    page = list_async(query, "price", "asc", limit=2, categoria="Bebidas", q="suco", fields="nome")
+
+    assert [p["id"] for p in page["items"]] == [1, 2]
+    assert page["total"] == 40
+    assert page["next_cursor"] == _encode_cursor(rows[1], "preco")
+    assert ("select", ("id,nome,preco",), {"count": "exact"}) in query.calls
+    assert ("eq", ("categoria", "Bebidas"), {}) in query.calls
+    assert ("ilike", ("nome", "%suco%"), {}) in query.calls
+    assert ("limit", (3,), {}) in query.calls
+
+
+def test_list_products_last_page_has_no_cursor():
+    page = list_async(AsyncFakeQuery(data=[{"id": 1}], count=1), limit=2)
+
+    assert page["next_cursor"] is None
+
+
+def test_list_products_keyset_cursor():
+    """O cursor deve virar um filtro keyset com desempate pelo id"""
+    cursor = _encode_cursor({"id": 5, "nome": "Açaí, grande"}, "nome")
+    query = AsyncFakeQuery(data=[])
+    list_async(query, "name", "asc", limit=10, cursor=cursor)
+
+    assert ("or_", ('nome.gt."Açaí, grande",and(nome.eq."Açaí, grande",id.gt.5),nome.is.null',), {}) in query.calls
+    # Total só na primeira página
+    assert ("select", ("*",), {"count": None}) in query.calls
+
+
+def test_list_products_cursor_after_null_value():
+    """Preço nulo (linha antiga) fica no fim; o cursor depois dele segue só pelos nulos"""
+    rows = [{"id": 3, "preco": 5.0}, {"id": 7, "preco": None}, {"id": 9, "preco": None}]
+    page = list_async(AsyncFakeQuery(data=rows, count=3), "price", "desc", limit=2)
+    assert page["next_cursor"] == _encode_cursor(rows[1], "preco")
+
+    query = AsyncFakeQuery(data=[])
+    list_async(query, "price", "desc", limit=2, cursor=page["next_cursor"])
+    assert ("is_", ("preco", "null"), {}) in query.calls
+    assert ("filter", ("id", "lt", 7), {}) in query.calls
+    assert not [c for c in query.calls if c[0] == "or_"]
+
+
+def test_list_products_invalid_params():
+    with pytest.raises(InvalidParameterError):
+        list_async(AsyncFakeQuery(), limit=10, cursor="???")
+    with pytest.raises(InvalidParameterError):
+        list_async(AsyncFakeQuery(), fields="senha")
+
+
+def test_list_products_uses_cache_until_write():
+    """Listagens repetidas vêm do cache; qualquer escrita invalida"""
+    query = AsyncFakeQuery(data=[{"id": 1}])
+    supabase = make_supabase(query)
+    with patch('services.async_product_service.get_async_supabase', AsyncMock(return_value=supabase)):
+        asyncio.run(AsyncProductService.list_products("name", "asc"))
+        asyncio.run(AsyncProductService.list_products("name", "ASC"))
+        assert supabase.table.call_count == 1
+
+        asyncio.run(AsyncProductService.delete_product(1))
+        asyncio.run(AsyncProductService.list_products("name", "asc"))
+        assert supabase.table.call_count == 3
+
+
+def test_async_list_products_shares_query_building():
+    """O serviço assíncrono monta a mesma consulta e o mesmo envelope paginado"""
+    query = AsyncFakeQuery(data=[{"id": 1}, {"id": 2}], count=2)
+    with patch('services.async_product_service.get_async_supabase',
+               AsyncMock(return_value=make_supabase(query))):
+        page = asyncio.run(AsyncProductService.list_products("stock", "desc", limit=1))
+
+    assert page["items"] == [{"id": 1}]
+    assert page["total"] == 2
+    assert ("order", ("estoque",), {"desc": True, "nullsfirst": False}) in query.calls
+
+
+def test_async_delete_product_not_found():
+    from core.exceptions import ResourceNotFoundError
+    query = AsyncFakeQuery(data=[])
+    with patch('services.async_product_service.get_async_supabase',
+               AsyncMock(return_value=make_supabase(query))):
+        with pytest.raises(ResourceNotFoundError):
+            asyncio.run(AsyncProductService.delete_product(99))
+
+
+def test_create_product_maps_unique_violation():
+    """Violação da restrição única em nome vira ProductAlreadyExistsError (sem SELECT prévio)"""
+    from postgrest.exceptions import APIError
+    from core.exceptions import ProductAlreadyExistsError
+    from schemas.product import ProductCreate
+
+    supabase = MagicMock()
+    supabase.table.return_value.insert.return_value.execute = AsyncMock(side_effect=APIError(
+        {"code": "23505", "message": "duplicate key value violates unique constraint"}))
+    with patch('services.async_product_service.get_async_supabase', AsyncMock(return_value=supabase)):
+        with pytest.raises(ProductAlreadyExistsError):
+            asyncio.run(AsyncProductService.create_product(ProductCreate(nome="Açaí", preco=10)))
+
+    supabase.table.return_value.select.assert_not_called()
+
+
+def test_create_product_succeeds_when_cache_fails_after_commit():
+    """Produto gravado: falha ao invalidar o cache ou publicar o evento não vira erro"""
+    from schemas.product import ProductCreate
+
+    query = AsyncFakeQuery(data=[{"id": 7, "nome": "Açaí", "preco": 10}])
+    with patch('services.async_product_service.get_async_supabase', AsyncMock(return_value=make_supabase(query))), \
+         patch.object(product_cache, 'invalidate', side_effect=ConnectionError("redis fora")), \
+         patch('services.product_service.event_hub.publish', side_effect=ConnectionError("redis fora")):
+        result = asyncio.run(AsyncProductService.create_product(ProductCreate(nome="Açaí", preco=10)))
+
+    assert result[0]["id"] == 7
+
+
+def run_async_service(coro_factory, data):
+    query = AsyncFakeQuery(data=data)
+    with patch('services.async_product_service.get_async_supabase',
+               AsyncMock(return_value=make_supabase(query))):
+        return asyncio.run(coro_factory()), query
+
+
+def test_list_products_not_cached_when_write_happens_during_query():
+    class WriteDuringQuery(AsyncFakeQuery):
+        async def execute(self):
+            product_cache.invalidate()
+            return await super().execute()
+
+    query = WriteDuringQuery(data=[{"id": 1, "nome": "Antigo"}])
+    with patch('services.async_product_service.get_async_supabase', AsyncMock(return_value=make_supabase(query))):
+        asyncio.run(AsyncProductService.list_products())
+        asyncio.run(AsyncProductService.list_products())
+
+    assert sum(1 for name, _, _ in query.calls if name == "select") == 2
+
+
+def test_create_products_batch_single_insert():
+    """Um único INSERT para o lote; nomes repetidos na requisição viram erro por item"""
+    from schemas.product import ProductCreate
+    products = [ProductCreate(nome="A", preco=1), ProductCreate(nome="B", preco=2),
+                ProductCreate(nome="A", preco=3)]
+    result, query = run_async_service(lambda: AsyncProductService.create_products(products),
+                                      [{"id": 10, "nome": "A"}, {"id": 11, "nome": "B"}])
+
+    assert [r["status"] for r in result["results"]] == ["created", "created", "error"]
+    assert result["results"][1]["id"] == 11
+    assert result["summary"] == {"created": 2, "error": 1}
+    assert [c[0] for c in query.calls].count("insert") == 1
+
+
+def test_update_products_batch_reports_not_found():
+    from schemas.product import ProductBatchUpdate
+    products = [ProductBatchUpdate(id=1, nome="A", preco=1), ProductBatchUpdate(id=2, nome="B", preco=2)]
+    result, query = run_async_service(lambda: AsyncProductService.update_products(products), [{"id": 1}])
+
+    assert [r["status"] for r in result["results"]] == ["updated", "not_found"]
+    upserts = [c for c in query.calls if c[0] == "upsert"]
+    assert len(upserts) == 1
+    assert upserts[0][1][0] == [{"id": 1, "nome": "A", "preco": 1.0}]
+
+
+def test_delete_products_batch():
+    result, query = run_async_service(lambda: AsyncProductService.delete_products([1, 2, 2]), [{"id": 1}])
+
+    assert result["results"] == [{"index": 0, "id": 1, "status": "deleted"},
+                                 {"index": 1, "id": 2, "status": "not_found"}]
+    assert ("in_", ("id", [1, 2]), {}) in query.calls
+
+
+def test_patch_product_stock_delta_uses_rpc():
+    """Só estoque_delta: uma chamada RPC atômica, sem UPDATE nem SELECT"""
+    from schemas.product import ProductUpdate
+    query = AsyncFakeQuery(data=[{"id": 1, "estoque": 7}])
+    supabase = make_supabase(query)
+    supabase.rpc.return_value = query
+    with patch('services.async_product_service.get_async_supabase', AsyncMock(return_value=supabase)):
+        result = asyncio.run(AsyncProductService.patch_product(1, ProductUpdate(estoque_delta=-3)))
+
+    assert result == [{"id": 1, "estoque": 7}]
+    supabase.rpc.assert_called_once_with("ajustar_estoque", {"p_id": 1, "p_delta": -3})
+    supabase.table.assert_not_called()
+
+
+def test_patch_product_columns_and_delta_in_one_rpc():
+    """Colunas + estoque_delta num único comando: nada de UPDATE separado antes do RPC"""
+    from schemas.product import ProductUpdate
+    query = AsyncFakeQuery(data=[{"id": 1, "preco": 9.9, "estoque": 2}])
+    supabase = make_supabase(query)
+    supabase.rpc.return_value = query
+    with patch('services.async_product_service.get_async_supabase', AsyncMock(return_value=supabase)), \
+         patch('services.product_service.event_hub') as hub:
+        asyncio.run(AsyncProductService.patch_product(1, ProductUpdate(preco=9.9, estoque_delta=-1)))
+
+    supabase.rpc.assert_called_once_with("ajustar_estoque", {"p_id": 1, "p_delta": -1, "p_dados": {"preco": 9.9}})
+    supabase.table.assert_not_called()
+    hub.publish.assert_called_once_with([{"op": "updated", "id": 1, "fields": ["estoque", "preco"]}])
+
+
+def test_patch_product_insufficient_stock_writes_nothing():
+    from postgrest.exceptions import APIError
+    from schemas.product import ProductUpdate
+    supabase = MagicMock()
+    supabase.rpc.return_value.execute = AsyncMock(side_effect=APIError({"code": "23514", "message": "estoque"}))
+    with patch('services.async_product_service.get_async_supabase', AsyncMock(return_value=supabase)), \
+         patch('services.product_service.event_hub') as hub:
+        with pytest.raises(InvalidParameterError):
+            asyncio.run(AsyncProductService.patch_product(1, ProductUpdate(nome="Novo", estoque_delta=-99)))
+
+    supabase.table.assert_not_called()
+    hub.publish.assert_not_called()
+
+
+def test_patch_product_sends_only_changed_columns():
+    from schemas.product import ProductUpdate
+    result, query = run_async_service(
+        lambda: AsyncProductService.patch_product(1, ProductUpdate(preco=9.9)), [{"id": 1}])
+
+    assert ("update", ({"preco": 9.9},), {}) in query.calls
+
+
+def test_list_changes_splits_upserts_and_deletes():
+    """Alterações em ordem de versão; página cheia continua depois da última alteração"""
+    data = {"horizonte": "12", "alteracoes": [
+        {"versao": "10", "id": 3, "removido": False, "produto": {"id": 3, "nome": "P3"}},
+        {"versao": "11", "id": 5, "removido": True, "produto": None},
+    ]}
+    query = AsyncFakeQuery(data=data)
+    supabase = make_supabase(query)
+    supabase.rpc.return_value = query
+    with patch('services.async_product_service.get_async_supabase', AsyncMock(return_value=supabase)):
+        page = asyncio.run(AsyncProductService.list_changes(None, limit=2))
+        supabase.rpc.assert_called_once_with("produtos_alteracoes", {"p_versao": "0", "p_id": 0, "p_limite": 2})
+
+        assert page["upserts"] == [{"id": 3, "nome": "P3"}]
+        assert page["deletes"] == [5]
+        assert page["has_more"] is True
+
+        # Página incompleta: o próximo token começa no horizonte
+        asyncio.run(AsyncProductService.list_changes(page["next_token"], limit=3))
+        supabase.rpc.assert_called_with("produtos_alteracoes", {"p_versao": "11", "p_id": 5, "p_limite": 3})
+        last = asyncio.run(AsyncProductService.list_changes(page["next_token"], limit=3))
+        assert last["has_more"] is False
+        asyncio.run(AsyncProductService.list_changes(last["next_token"]))
+        supabase.rpc.assert_called_with("produtos_alteracoes", {"p_versao": "12", "p_id": 0, "p_limite": 1000})
+
+
+def test_list_changes_since_now_returns_current_token():
+    query = AsyncFakeQuery(data={"horizonte": "42", "alteracoes": []})
+    supabase = make_supabase(query)
+    supabase.rpc.return_value = query
+    with patch('services.async_product_service.get_async_supabase', AsyncMock(return_value=supabase)):
+        page = asyncio.run(AsyncProductService.list_changes("now"))
+        asyncio.run(AsyncProductService.list_changes(page["next_token"]))
+
+    assert (page["upserts"], page["deletes"], page["has_more"]) == ([], [], False)
+    supabase.rpc.assert_called_with("produtos_alteracoes", {"p_versao": "42", "p_id": 0, "p_limite": 1000})
+
+
+def test_list_changes_invalid_token():
+    with patch('services.async_product_service.get_async_supabase', AsyncMock(return_value=MagicMock())):
+        for token in ("zzz", _encode_cursor({"versao": "1 or 1=1", "id": 1}, "versao")):
+            with pytest.raises(InvalidParameterError):
+                asyncio.run(AsyncProductService.list_changes(token))
+
+
+def test_get_facets_groups_counts_and_caches():
+    rows = [{"tipo": "total", "valor": "", "total": 3},
+            {"tipo": "categoria", "valor": "B", "total": 1},
+            {"tipo": "categoria", "valor": "A", "total": 2},
+            {"tipo": "tag", "valor": "promo", "total": 3},
+            {"tipo": "tag", "valor": "velha", "total": 0}]
+    query = AsyncFakeQuery(data=rows)
+    supabase = make_supabase(query)
+    with patch('services.async_product_service.get_async_supabase', AsyncMock(return_value=supabase)):
+        facets = asyncio.run(AsyncProductService.get_facets())
+        asyncio.run(AsyncProductService.get_facets())
+
+    assert facets == {"total": 3,
+                      "categorias": [{"valor": "A", "total": 2}, {"valor": "B", "total": 1}],
+                      "tags": [{"valor": "promo", "total": 3}]}
+    # Segunda chamada servida do cache (invalidado a cada escrita)
+    supabase.table.assert_called_once_with("produtos_facetas")
+
+
+def test_search_products_ranked_pages():
+    rows = [{"produto": {"id": i, "nome": f"Café {i}"}, "relevancia": 1.0 - i / 10} for i in range(3)]
+    query = AsyncFakeQuery(data=rows)
+    supabase = make_supabase(query)
+    supabase.rpc.return_value = query
+    with patch('services.async_product_service.get_async_supabase', AsyncMock(return_value=supabase)):
+        page = asyncio.run(AsyncProductService.search_products("  café   torrado ", limit=2))
+        supabase.rpc.assert_called_once_with("buscar_produtos", {"p_q": "café torrado", "p_limite": 3, "p_offset": 0})
+
+        assert [item["id"] for item in page["items"]] == [0, 1]
+        assert page["items"][0]["relevancia"] == 1.0
+
+        asyncio.run(AsyncProductService.search_products("café torrado", limit=2, cursor=page["next_cursor"]))
+        supabase.rpc.assert_called_with("buscar_produtos", {"p_q": "café torrado", "p_limite": 3, "p_offset": 2})
+
+        # Cursor de outra busca é recusado
+        with pytest.raises(InvalidParameterError):
+            asyncio.run(AsyncProductService.search_products("chá", cursor=page["next_cursor"]))
+
+
+def test_export_products_streams_keyset_pages():
+    """Uma página por vez, continuando do último id, até a página vazia"""
+    pages = [[{"id": 1, "nome": "A"}, {"id": 4, "nome": "B"}], [{"id": 9, "nome": "C"}], []]
+    query = AsyncFakeQuery()
+
+    async def execute():
+        return MagicMock(data=pages.pop(0))
+    query.execute = execute
+    supabase = make_supabase(query)
+
+    async def scenario():
+        chunks = await AsyncProductService.export_products("ndjson")
+        first = await chunks.__anext__()
+        # Só a primeira página foi lida até aqui
+        reads = [c for c in query.calls if c[0] == "gt"]
+        rest = [chunk async for chunk in chunks]
+        return first, reads, rest
+
+    with patch('services.async_product_service.get_async_supabase', AsyncMock(return_value=supabase)), \
+         patch('services.async_product_service.export_page_size', 2):
+        first, reads, rest = asyncio.run(scenario())
+
+    assert first == '{"id":1,"nome":"A"}\n{"id":4,"nome":"B"}\n'
+    assert reads == [("gt", ("id", 0), {})]
+    assert rest == ['{"id":9,"nome":"C"}\n']
+    assert [c[1] for c in query.calls if c[0] == "gt"] == [("id", 0), ("id", 4), ("id", 9)]
+    assert pages == []
+
+
+def test_export_products_invalid_format():
+    with pytest.raises(InvalidParameterError):
+        asyncio.run(AsyncProductService.export_products("xlsx"))
@@ -0,0 +1,37 @@
+import ipaddress
+from unittest.mock import patch
+from starlette.requests import Request
+from core.rate_limit import client_ip, user_or_ip
+
+TRAEFIK = [ipaddress.ip_network("10.0.0.0/8")]
+
+def make_request(remote="10.0.0.2", headers=None):
+    scope = {
+        "type": "http",
+        "client": (remote, 12345),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    }
+    return Request(scope)
+
+def test_client_ip_ignores_forwarded_for_without_trusted_proxies():
+    request = make_request("203.0.113.9", {"X-Forwarded-For": "1.2.3.4"})
+    with patch('core.rate_limit._trusted_networks', []):
+        assert client_ip(request) == "203.0.113.9"
+
+def test_client_ip_uses_forwarded_for_from_trusted_proxy():
+    """Atrás do Traefik, cada cliente deve ter o próprio balde"""
+    request = make_request("10.0.0.2", {"X-Forwarded-For": "6.6.6.6, 198.51.100.7, 10.0.0.5"})
+    with patch('core.rate_limit._trusted_networks', TRAEFIK):
+        assert client_ip(request) == "198.51.100.7"
+
+def test_client_ip_untrusted_remote_cannot_spoof():
+    request = make_request("198.51.100.7", {"X-Forwarded-For": "1.1.1.1"})
+    with patch('core.rate_limit._trusted_networks', TRAEFIK):
+        assert client_ip(request) == "198.51.100.7"
+
+def test_user_or_ip_prefers_authenticated_user():
+    request = make_request("198.51.100.7", {"Authorization": "Bearer abc"})
+    assert user_or_ip(request).startswith("token:")
+    request.state.user_id = "user-1"
+    assert user_or_ip(request) == "user:user-1"
+    assert user_or_ip(make_request("198.51.100.7")) == "198.51.100.7"
@@ -1,5 +1,6 @@
+import time
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from main import app
 from core.exceptions import ProductAlreadyExistsError, ResourceNotFoundError
 from core.security import get_current_user
@@ -17,7 +18,7 @@ def test_read_root():
     assert response.status_code == 200
     assert response.json() == {"message": "API de Produtos Rodando!"}
 
-@patch('routers.product_routes.ProductService')
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
 def test_create_product_success(mock_service):
     # Mock do retorno do serviço
     mock_service.create_product.return_value = [{"id": 1, "nome": "Produto Teste", "preco": 10.0}]
@@ -35,7 +36,7 @@ def test_create_product_success(mock_service):
     assert response.json()[0]["nome"] == "Produto Teste"
     mock_service.create_product.assert_called_once()
 
-@patch('routers.product_routes.ProductService')
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
 def test_create_product_duplicate(mock_service):
     # Simula erro de duplicidade
     mock_service.create_product.side_effect = ProductAlreadyExistsError("Nome duplicado")
@@ -46,7 +47,7 @@ def test_create_product_duplicate(mock_service):
     assert response.status_code == 400
     assert response.json()["detail"] == "Nome duplicado"
 
-@patch('routers.product_routes.ProductService')
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
 def test_list_products(mock_service):
     mock_service.list_products.return_value = [{"id": 1, "nome": "P1"}, {"id": 2, "nome": "P2"}]
     
@@ -55,7 +56,7 @@ def test_list_products(mock_service):
     assert response.status_code == 200
     assert len(response.json()) == 2
 
-@patch('routers.product_routes.ProductService')
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
 def test_update_product_success(mock_service):
     mock_service.update_product.return_value = [{"id": 1, "nome": "Atualizado"}]
     
@@ -65,7 +66,7 @@ def test_update_product_success(mock_service):
     assert response.status_code == 200
     assert response.json()[0]["nome"] == "Atualizado"
 
-@patch('routers.product_routes.ProductService')
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
 def test_update_product_not_found(mock_service):
     mock_service.update_product.side_effect = ResourceNotFoundError("Produto não encontrado")
     
@@ -74,7 +75,7 @@ def test_update_product_not_found(mock_service):
     
     assert response.status_code == 404
 
-@patch('routers.product_routes.ProductService')
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
 def test_delete_product_success(mock_service):
     mock_service.delete_product.return_value = True
     
@@ -82,3 +83,232 @@ def test_delete_product_success(mock_service):
     
     assert response.status_code == 200
     assert response.json()["message"] == "Produto deletado com sucesso"
+
+@patch('services.import_jobs.ProductService')
+def test_upload_csv_streams_file(mock_service):
+    mock_service.bulk_import_stream.return_value = {"created": 1, "updated": 0, "errors": 0}
+
+    files = {"file": ("produtos.csv", b"nome;categoria;descricao;tags;preco;estoque\n", "text/csv")}
+    response = client.post("/products/upload/", files=files)
+
+    assert response.status_code == 200
+    assert response.json()["details"]["created"] == 1
+    assert response.json()["job_id"]
+    mock_service.bulk_import_stream.assert_called_once()
+
+def test_upload_error_report_and_retry():
+    supabase = MagicMock()
+    supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = []
+    header = "nome;categoria;descricao;tags;preco;estoque\n"
+    original = header + "Suco;Bebidas;;;7;3\nRuim;Bebidas;;;abc;1\n"
+
+    with patch('services.product_service.supabase', supabase):
+        response = client.post("/products/upload/", files={"file": ("p.csv", original.encode(), "text/csv")})
+        job_id = response.json()["job_id"]
+        assert response.json()["details"]["errors"] == 1
+
+        report = client.get(f"/products/upload/{job_id}/errors").json()
+        assert report["errors"] == [{"linha": 2, "nome": "Ruim", "campo": "preco", "motivo": "Preço inválido: abc"}]
+
+        download = client.get(f"/products/upload/{job_id}/errors?format=csv")
+        assert download.headers["content-type"].startswith("text/csv")
+        assert download.content.decode("utf-8-sig").splitlines()[1] == "2;Ruim;preco;Preço inválido: abc"
+
+        # Arquivo corrigido: só a linha que falhou é reprocessada
+        fixed = header + "Suco;Bebidas;;;7;3\nRuim;Bebidas;;;8;1\n"
+        retry = client.post(f"/products/upload/?retry_of={job_id}", files={"file": ("p.csv", fixed.encode(), "text/csv")})
+
+    details = retry.json()["details"]
+    assert (details["rows"], details["skipped"], details["created"], details["errors"]) == (1, 1, 1, 0)
+    assert [p["nome"] for p in supabase.table.return_value.upsert.call_args[0][0]] == ["Ruim"]
+
+def test_upload_retry_requires_failed_rows():
+    with patch('services.import_jobs.ProductService') as mock_service:
+        mock_service.bulk_import_stream.return_value = {"rows": 1, "errors": 0}
+        files = {"file": ("p.csv", b"x", "text/csv")}
+        job_id = client.post("/products/upload/", files=files).json()["job_id"]
+
+        assert client.post(f"/products/upload/?retry_of={job_id}", files=files).status_code == 400
+        assert client.post("/products/upload/?retry_of=inexistente", files=files).status_code == 404
+
+def test_upload_rejects_non_csv():
+    files = {"file": ("produtos.txt", b"x", "text/plain")}
+    response = client.post("/products/upload/", files=files)
+
+    assert response.status_code == 400
+
+@patch('services.import_jobs.ProductService')
+def test_upload_csv_background_job(mock_service):
+    mock_service.bulk_import_stream.return_value = {"rows": 3, "created": 2, "updated": 1, "errors": 0}
+
+    files = {"file": ("produtos.csv", b"nome;categoria;descricao;tags;preco;estoque\n", "text/csv")}
+    response = client.post("/products/upload/?background=true", files=files)
+
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    for _ in range(50):
+        status = client.get(f"/products/upload/{job_id}").json()
+        if status["status"] == "completed":
+            break
+        time.sleep(0.02)
+
+    assert status["status"] == "completed"
+    assert status["rows_processed"] == 3
+    assert status["created"] == 2
+
+def test_upload_status_not_found():
+    response = client.get("/products/upload/inexistente")
+
+    assert response.status_code == 404
+
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
+def test_list_products_paginated(mock_service):
+    mock_service.list_products.return_value = {"items": [{"id": 1, "nome": "Suco"}], "total": 1, "next_cursor": None}
+
+    response = client.get("/products/?limit=1&categoria=Bebidas&q=suco")
+
+    assert response.status_code == 200
+    assert response.json()["total"] == 1
+    kwargs = mock_service.list_products.call_args.kwargs
+    assert kwargs["limit"] == 1
+    assert kwargs["categoria"] == "Bebidas"
+    assert kwargs["q"] == "suco"
+
+def test_list_products_limit_too_large():
+    response = client.get("/products/?limit=100000")
+
+    assert response.status_code == 422
+
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
+def test_list_changes(mock_service):
+    mock_service.list_changes.return_value = {"upserts": [{"id": 1}], "deletes": [2],
+                                              "next_token": "abc", "has_more": False}
+
+    response = client.get("/products/changes?since=xyz&limit=50")
+
+    assert response.status_code == 200
+    assert response.json()["deletes"] == [2]
+    mock_service.list_changes.assert_called_once_with("xyz", 50)
+
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
+def test_batch_routes(mock_service):
+    mock_service.create_products.return_value = {"results": [], "summary": {"created": 2}}
+    mock_service.update_products.return_value = {"results": [], "summary": {"updated": 1}}
+    mock_service.delete_products.return_value = {"results": [], "summary": {"deleted": 2}}
+
+    response = client.post("/products/batch", json=[{"nome": "A", "preco": 1}, {"nome": "B", "preco": 2}])
+    assert response.status_code == 200
+    assert len(mock_service.create_products.call_args[0][0]) == 2
+
+    response = client.patch("/products/batch", json=[{"id": 1, "nome": "A", "preco": 1}])
+    assert response.status_code == 200
+
+    response = client.request("DELETE", "/products/batch", json={"ids": [1, 2]})
+    assert response.status_code == 200
+    mock_service.delete_products.assert_called_once_with([1, 2])
+
+def test_batch_create_validates_items():
+    response = client.post("/products/batch", json=[{"nome": "A", "preco": -1}])
+
+    assert response.status_code == 422
+
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
+def test_patch_product_stock_delta(mock_service):
+    mock_service.patch_product.return_value = [{"id": 1, "nome": "P1", "estoque": 4}]
+
+    response = client.patch("/products/1", json={"estoque_delta": -1})
+
+    assert response.status_code == 200
+    product_id, changes = mock_service.patch_product.call_args[0]
+    assert product_id == 1
+    assert changes.model_dump(exclude_unset=True) == {"estoque_delta": -1}
+
+def test_patch_product_rejects_null_delta():
+    response = client.patch("/products/1", json={"estoque_delta": None})
+
+    assert response.status_code == 422
+
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
+def test_list_products_conditional_get(mock_service):
+    """Com If-None-Match do ETag atual responde 304 sem consultar o serviço"""
+    mock_service.list_products.return_value = [{"id": 1, "nome": "P1"}]
+
+    first = client.get("/products/?order_by=name")
+    etag = first.headers["etag"]
+    second = client.get("/products/?order_by=name", headers={"If-None-Match": etag})
+
+    assert second.status_code == 304
+    assert mock_service.list_products.call_count == 1
+
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
+def test_list_products_etag_changes_after_write(mock_service):
+    from services.product_service import ProductService
+    mock_service.list_products.return_value = [{"id": 1, "nome": "P1"}]
+
+    etag = client.get("/products/").headers["etag"]
+    ProductService._after_write()
+    response = client.get("/products/", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
+def test_list_products_compressed(mock_service):
+    mock_service.list_products.return_value = [{"id": i, "nome": f"Produto {i}"} for i in range(200)]
+
+    response = client.get("/products/", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 200
+
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
+def test_facets_conditional_get(mock_service):
+    mock_service.get_facets.return_value = {"total": 1, "categorias": [{"valor": "A", "total": 1}], "tags": []}
+
+    first = client.get("/products/facets")
+    second = client.get("/products/facets", headers={"If-None-Match": first.headers["etag"]})
+
+    assert first.json()["categorias"] == [{"valor": "A", "total": 1}]
+    assert second.status_code == 304
+    assert mock_service.get_facets.call_count == 1
+
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
+def test_search_products(mock_service):
+    mock_service.search_products.return_value = {"items": [{"id": 1, "nome": "Café", "relevancia": 0.9}],
+                                                 "next_cursor": None}
+
+    response = client.get("/products/search?q=cafe&limit=5")
+
+    assert response.status_code == 200
+    mock_service.search_products.assert_called_once_with("cafe", 5, None)
+    assert client.get("/products/search").status_code == 422
+
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
+def test_export_products_streams_csv(mock_service):
+    async def chunks():
+        yield "\ufeffnome;categoria;descricao;tags;preco;estoque\n"
+        yield "Café;Mercearia;;;10,5;2\n"
+    mock_service.export_products.return_value = chunks()
+
+    response = client.get("/products/export?format=csv")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    assert response.headers["content-disposition"] == 'attachment; filename="produtos.csv"'
+    assert response.content.decode("utf-8-sig").splitlines()[1] == "Café;Mercearia;;;10,5;2"
+    mock_service.export_products.assert_called_once_with("csv")
+
+@patch('routers.product_routes.AsyncProductService', new_callable=AsyncMock)
+def test_list_products_response_model(mock_service):
+    """Resposta no formato de Product: colunas internas ficam de fora; fields= segue como veio do banco"""
+    mock_service.list_products.return_value = [{"id": 1, "nome": "P1", "preco": 2.5, "estoque": 3,
+                                                "versao": "42", "updated_at": "2026-01-01T00:00:00Z"}]
+
+    full = client.get("/products/")
+    projected = client.get("/products/?fields=id,nome")
+
+    assert full.json() == [{"id": 1, "nome": "P1", "descricao": None, "categoria": None, "tags": None,
+                            "preco": 2.5, "estoque": 3}]
+    assert projected.json()[0]["versao"] == "42"
+    assert projected.headers["etag"] == client.get("/products/?fields=id,nome").headers["etag"]
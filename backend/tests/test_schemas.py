@@ -46,3 +46,25 @@ def test_product_create_rounding():
     """Deve arredondar o preço para 2 casas decimais"""
     product = ProductCreate(nome="Teste", preco=10.5555, estoque=1)
     assert product.preco == 10.56
+
+def test_product_update_partial():
+    """Atualização parcial só marca os campos enviados"""
+    from schemas.product import ProductUpdate
+    changes = ProductUpdate(estoque=5)
+    assert changes.model_dump(exclude_unset=True) == {"estoque": 5}
+
+def test_product_update_reuses_validations():
+    from schemas.product import ProductUpdate
+    with pytest.raises(ValidationError):
+        ProductUpdate(nome="<b>x</b>")
+    with pytest.raises(ValidationError):
+        ProductUpdate(preco=0)
+    assert ProductUpdate(preco=10.5555).preco == 10.56
+
+def test_product_update_rejects_empty_and_conflicting():
+    """Deve exigir ao menos um campo e não aceitar estoque junto com estoque_delta"""
+    from schemas.product import ProductUpdate
+    with pytest.raises(ValidationError):
+        ProductUpdate()
+    with pytest.raises(ValidationError):
+        ProductUpdate(estoque=1, estoque_delta=2)
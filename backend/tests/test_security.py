@@ -0,0 +1,56 @@
+import time
+import jwt
+import pytest
+from unittest.mock import patch, MagicMock
+from core import security
+
+SECRET = "segredo-de-teste-com-tamanho-suficiente-32b"
+
+def make_token(exp_in=3600, secret=SECRET):
+    claims = {"sub": "user-1", "email": "a@b.com", "role": "authenticated",
+              "aud": "authenticated", "exp": int(time.time()) + exp_in}
+    return jwt.encode(claims, secret, algorithm="HS256")
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    security.token_cache.invalidate()
+    yield
+    security.token_cache.invalidate()
+
+def test_remote_verification_is_cached():
+    """Tokens válidos não devem chamar o Supabase Auth de novo"""
+    supabase = MagicMock()
+    supabase.auth.get_user.return_value = {"id": "user-1"}
+    token = make_token()
+    with patch('core.security.supabase', supabase):
+        assert security.verify_token(token) == {"id": "user-1"}
+        assert security.verify_token(token) == {"id": "user-1"}
+
+    supabase.auth.get_user.assert_called_once_with(token)
+    assert security.auth_stats()["hits"] >= 1
+
+def test_expired_token_is_not_cached():
+    """Tokens sem validade restante nunca entram no cache"""
+    supabase = MagicMock()
+    supabase.auth.get_user.return_value = {"id": "user-1"}
+    token = make_token(exp_in=-10)
+    with patch('core.security.supabase', supabase):
+        security.verify_token(token)
+        security.verify_token(token)
+
+    assert supabase.auth.get_user.call_count == 2
+
+def test_local_verification_with_secret():
+    token = make_token()
+    with patch('core.security.auth_verify_mode', 'local'), \
+         patch('core.security.supabase_jwt_secret', SECRET):
+        user = security.verify_token(token)
+
+    assert user["id"] == "user-1"
+
+def test_local_verification_rejects_bad_signature():
+    token = make_token(secret="outro-segredo-com-tamanho-suficiente-32b")
+    with patch('core.security.auth_verify_mode', 'local'), \
+         patch('core.security.supabase_jwt_secret', SECRET):
+        with pytest.raises(jwt.InvalidSignatureError):
+            security.verify_token(token)
@@ -0,0 +1,36 @@
+-- =========================================
+-- SCRIPT: Nome de produto único (índice UNIQUE em produtos.nome)
+-- =========================================
+-- A API não consulta mais "já existe produto com esse nome?" antes de gravar:
+-- o próprio banco garante a unicidade. Assim cada criação/edição é um único
+-- comando (metade das idas ao Supabase) e dois cadastros simultâneos com o
+-- mesmo nome não passam mais os dois pela verificação.
+--
+-- O backend converte o erro de violação (código 23505) em
+-- "Já existe um produto com o nome ..." (HTTP 400), como antes.
+-- A importação de CSV também usa esta restrição (upsert por nome).
+--
+-- COMO USAR:
+-- 1. Rode primeiro a VERIFICAÇÃO abaixo e resolva nomes duplicados, se houver
+-- 2. Abra Supabase Dashboard → SQL Editor
+-- 3. Cole este arquivo e clique em RUN (depois do enable_rls.sql)
+-- =========================================
+
+-- VERIFICAÇÃO: nomes repetidos impedem a criação da restrição
+SELECT nome, COUNT(*) AS quantidade
+FROM produtos
+GROUP BY nome
+HAVING COUNT(*) > 1;
+
+-- PASSO 1: Criar a restrição de unicidade (cria o índice UNIQUE automaticamente)
+ALTER TABLE produtos
+ADD CONSTRAINT produtos_nome_key UNIQUE (nome);
+
+-- =========================================
+-- VERIFICAÇÃO (Opcional - Execute depois)
+-- =========================================
+
+-- Deve listar o índice produtos_nome_key
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'produtos' AND indexname = 'produtos_nome_key';
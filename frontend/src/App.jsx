@@ -1,4 +1,4 @@
-import { useState, useEffect, useMemo } from 'react'
+import { useState, useEffect, useMemo, useRef } from 'react'
 import toast, { Toaster } from 'react-hot-toast';
 import ProductList from './components/ProductList'
 import ProductForm from './components/ProductForm'
@@ -10,11 +10,35 @@ import { supabase } from './supabaseClient'
 // API URL CONFIG
 const API_URL = (import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000') + '/products/';
 
+// Mesma ordem do GET /products/ (coluna, depois id; nulos por último na ordem crescente)
+const SORT_COLUMNS = { id: 'id', name: 'nome', price: 'preco', stock: 'estoque' }
+
+const compareProducts = (a, b, { orderBy, direction }) => {
+  const column = SORT_COLUMNS[orderBy] || 'id'
+  const x = a[column], y = b[column]
+  let result = 0
+  if (x !== y) {
+    if (x == null) result = 1
+    else if (y == null) result = -1
+    else result = typeof x === 'string' ? x.localeCompare(y) : x - y
+  }
+  if (result === 0) result = a.id - b.id
+  return direction === 'desc' ? -result : result
+}
+
+// Coloca um produto novo ou alterado na posição da ordenação atual, sem reordenar o resto
+const insertSorted = (list, product, sortConfig) => {
+  const index = list.findIndex(p => compareProducts(product, p, sortConfig) < 0)
+  return index === -1 ? [...list, product] : [...list.slice(0, index), product, ...list.slice(index)]
+}
+
 function App() {
   console.log("Current API URL:", API_URL);
   const [products, setProducts] = useState([])
+  const [facets, setFacets] = useState(null)
   const [selectedCategory, setSelectedCategory] = useState('Todas')
   const [searchTerm, setSearchTerm] = useState('')
+  const [searchResults, setSearchResults] = useState(null)
   const [currentProduct, setCurrentProduct] = useState(null)
   const [showForm, setShowForm] = useState(false)
 
@@ -74,22 +98,76 @@ function App() {
   // Sorting State
   const [sortConfig, setSortConfig] = useState({ orderBy: 'id', direction: 'asc' })
 
+  // Ordenação atual para quem roda fora do render (eventos do stream, sincronização)
+  const sortRef = useRef(sortConfig)
+  sortRef.current = sortConfig
+  // Token de GET /products/changes: alterações posteriores à última carga da lista
+  const syncToken = useRef(null)
+
   // Validate Sort Config on change
   useEffect(() => {
     fetchProducts()
   }, [sortConfig]) // Refetch when sort changes
 
-  const fetchProducts = async () => {
-    setIsLoading(true)
+  // Alterações ao vivo (GET /products/stream): outros operadores e importações aparecem sem clicar em atualizar.
+  // created/updated/deleted só avisam; o que mudou vem de /products/changes (uma requisição por rajada).
+  // resync (cliente atrasado ou lote grande) recarrega a lista inteira.
+  useEffect(() => {
+    const source = new EventSource(`${API_URL}stream`)
+    let timer = null
+    let pending = null
+    let facetsChanged = false
+    const flush = () => {
+      const full = pending === 'resync'
+      pending = null
+      if (full) {
+        fetchProducts({ silent: true })
+      } else {
+        syncChanges({ facets: facetsChanged })
+      }
+      facetsChanged = false
+    }
+    const schedule = (kind) => {
+      if (pending !== 'resync') pending = kind
+      // Várias alterações seguidas viram uma única consulta; resync espera a rajada (importação) acabar
+      clearTimeout(timer)
+      timer = setTimeout(flush, pending === 'resync' ? 2000 : 500)
+    }
+    const onChange = (e) => {
+      const { op, id, fields } = JSON.parse(e.data)
+      if (op === 'deleted') setProducts(prev => prev.filter(p => p.id !== id))
+      if (op !== 'updated' || fields?.some(f => f === 'categoria' || f === 'tags')) facetsChanged = true
+      schedule('delta')
+    }
+    source.addEventListener('created', onChange)
+    source.addEventListener('updated', onChange)
+    source.addEventListener('deleted', onChange)
+    source.addEventListener('resync', () => schedule('resync'))
+    return () => {
+      clearTimeout(timer)
+      source.close()
+    }
+  }, [])
+
+  const fetchProducts = async ({ silent = false } = {}) => {
+    if (!silent) setIsLoading(true)
     setError(null)
     try {
-      const url = `${API_URL}?order_by=${sortConfig.orderBy}&direction=${sortConfig.direction}`
+      // Token lido antes da lista: o que mudar durante a carga volta em /changes (reaplicar é inofensivo)
+      syncToken.current = null
+      const tokenResponse = await fetch(`${API_URL}changes?since=now`)
+      const token = tokenResponse.ok ? (await tokenResponse.json()).next_token : null
+
+      const { orderBy, direction } = sortRef.current
+      const url = `${API_URL}?order_by=${orderBy}&direction=${direction}`
       const response = await fetch(url)
 
       if (response.status === 429) throw new Error('429')
       if (!response.ok) throw new Error('Falha na conexão')
       const data = await response.json()
       setProducts(data)
+      syncToken.current = token
+      fetchFacets()
     } catch (error) {
       console.error("Erro ao buscar produtos:", error)
       if (error.message.includes("429")) {
@@ -103,29 +181,99 @@ function App() {
     }
   }
 
+  // Aplica só o que mudou desde a última carga (GET /products/changes); sem token, recarrega tudo
+  const syncChanges = async ({ facets = true } = {}) => {
+    const token = syncToken.current
+    if (!token) return fetchProducts({ silent: true })
+    try {
+      const response = await fetch(`${API_URL}changes?since=${encodeURIComponent(token)}&limit=1000`)
+      if (response.status === 429) throw new Error('429')
+      if (!response.ok) throw new Error('Falha na sincronização')
+      const page = await response.json()
+      // Outra carga completa começou no meio: o resultado dela vale mais que esta página
+      if (syncToken.current !== token) return
+      if (page.has_more) return fetchProducts({ silent: true })
+      syncToken.current = page.next_token
+      if (page.upserts.length || page.deletes.length) {
+        const removed = new Set([...page.deletes, ...page.upserts.map(p => p.id)])
+        setProducts(prev => page.upserts.reduce(
+          (list, product) => insertSorted(list, product, sortRef.current),
+          prev.filter(p => !removed.has(p.id))
+        ))
+        // Resultado da busca aberto: troca os itens alterados no lugar, sem consultar de novo
+        const changed = new Map(page.upserts.map(p => [p.id, p]))
+        const deleted = new Set(page.deletes)
+        setSearchResults(prev => prev && prev
+          .filter(p => !deleted.has(p.id))
+          .map(p => changed.get(p.id) || p))
+      }
+      if (facets) fetchFacets()
+    } catch (error) {
+      console.error("Erro ao sincronizar produtos:", error)
+      // 429: recarregar tudo só gastaria mais leituras; o próximo evento tenta de novo com o mesmo token
+      if (error.message !== '429') fetchProducts({ silent: true })
+    }
+  }
+
+  // Contagens por categoria/tag calculadas no banco (GET /products/facets)
+  const fetchFacets = async () => {
+    try {
+      const response = await fetch(`${API_URL}facets`)
+      if (response.ok) setFacets(await response.json())
+    } catch (error) {
+      // Sem facetas o filtro continua funcionando com as categorias da lista
+      console.error("Erro ao buscar categorias:", error)
+    }
+  }
+
+  // Busca no servidor (GET /products/search): nome, tags e descrição, sem acentos e com erros de digitação
+  useEffect(() => {
+    const term = searchTerm.trim()
+    if (!term) {
+      setSearchResults(null)
+      return
+    }
+    const controller = new AbortController()
+    // Espera a pessoa parar de digitar antes de consultar
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(`${API_URL}search?q=${encodeURIComponent(term)}&limit=100`, { signal: controller.signal })
+        if (!response.ok) throw new Error('Falha na busca')
+        const data = await response.json()
+        setSearchResults(data.items)
+      } catch (error) {
+        if (error.name !== 'AbortError') console.error("Erro ao buscar:", error)
+      }
+    }, 300)
+    return () => {
+      clearTimeout(timer)
+      controller.abort()
+    }
+  }, [searchTerm]) // Alterações no catálogo chegam ao resultado por syncChanges
+
   // Derived State (Memoized)
+  const categoryCounts = useMemo(() => {
+    return Object.fromEntries((facets?.categorias || []).map(c => [c.valor, c.total]))
+  }, [facets])
+
   const categories = useMemo(() => {
+    if (facets) return ['Todas', ...facets.categorias.map(c => c.valor)]
     const rawCategories = products.map(p => p.categoria).filter(Boolean)
     const uniqueCats = [...new Set(rawCategories)]
     return ['Todas', ...uniqueCats]
-  }, [products])
+  }, [facets, products])
 
   const filteredProducts = useMemo(() => {
-    let result = products
+    // Com termo digitado, a lista vem da busca (ordenada por relevância)
+    let result = searchTerm.trim() && searchResults ? searchResults : products
 
     // 1. Filter by Category
     if (selectedCategory !== 'Todas') {
       result = result.filter(p => p.categoria === selectedCategory)
     }
 
-    // 2. Filter by Search Term (Name Only)
-    if (searchTerm) {
-      const lowerTerm = searchTerm.toLowerCase()
-      result = result.filter(p => p.nome.toLowerCase().includes(lowerTerm))
-    }
-
     return result
-  }, [products, selectedCategory, searchTerm])
+  }, [products, selectedCategory, searchTerm, searchResults])
 
   // Auto-switch to 'Todas' if selected category is empty
   useEffect(() => {
@@ -225,7 +373,7 @@ function App() {
 
       setShowForm(false)
       setCurrentProduct(null)
-      fetchProducts()
+      // A lista se atualiza pelo evento do stream (um único /changes por rajada)
       toast.success(product.id ? 'Produto atualizado!' : 'Produto criado!')
     } catch (error) {
       console.error("Erro ao salvar:", error)
@@ -247,7 +395,9 @@ function App() {
         }
         throw new Error('Erro ao deletar')
       }
-      fetchProducts()
+      // Sai da tela na hora; o evento 'deleted' do stream faz o resto
+      setProducts(prev => prev.filter(p => p.id !== id))
+      setSearchResults(prev => prev && prev.filter(p => p.id !== id))
       toast.success("Produto excluído!")
     } catch (error) {
       console.error("Erro ao deletar:", error)
@@ -315,7 +465,7 @@ function App() {
               <input
                 type="text"
                 className="flex-1 md:w-64 bg-slate-900/50 border border-slate-700 rounded-lg px-4 py-2 text-white placeholder-slate-500 focus:outline-none focus:ring-2 focus:ring-blue-500 transition"
-                placeholder="Buscar por nome..."
+                placeholder="Buscar por nome, tag ou descrição..."
                 value={searchTerm}
                 onChange={(e) => setSearchTerm(e.target.value)}
               />
@@ -344,7 +494,7 @@ function App() {
               >
                 {categories.map(cat => (
                   <option key={cat} value={cat} className="bg-slate-900 text-white">
-                    {cat}
+                    {categoryCounts[cat] ? `${cat} (${categoryCounts[cat]})` : cat}
                   </option>
                 ))}
               </select>
@@ -359,6 +509,16 @@ function App() {
                 <span>📥</span> Modelo
               </button>
 
+              {/* Link direto: o navegador grava o arquivo conforme chega, sem montar o catálogo em memória */}
+              <a
+                className="hidden md:flex px-4 py-2 bg-slate-700 hover:bg-slate-600 text-white rounded-lg transition font-medium shadow-lg shadow-slate-900/20 items-center justify-center gap-2"
+                href={`${API_URL}export?format=csv`}
+                download="produtos.csv"
+                title="Exportar o catálogo no formato da importação"
+              >
+                <span>📤</span> Exportar
+              </a>
+
               <label className="hidden md:flex cursor-pointer px-6 py-2 bg-emerald-600 hover:bg-emerald-700 text-white rounded-lg transition font-medium shadow-lg shadow-emerald-900/20 items-center justify-center gap-2">
                 <input
                   type="file"
@@ -376,11 +536,12 @@ function App() {
                     try {
                       const { data: { session } } = await supabase.auth.getSession();
 
-                      const response = await fetch(`${API_URL}/upload/`, {
+                      const headers = { 'Authorization': `Bearer ${session?.access_token}` };
+
+                      // Importação roda em segundo plano no backend; acompanhamos pelo job
+                      const response = await fetch(`${API_URL}/upload/?background=true`, {
                         method: 'POST',
-                        headers: {
-                          'Authorization': `Bearer ${session?.access_token}`
-                        },
+                        headers,
                         body: formData
                       });
 
@@ -390,7 +551,36 @@ function App() {
                         throw new Error(result.detail || 'Erro na importação');
                       }
 
-                      toast.success(`Importação: ${result.details.created} criados, ${result.details.updated} atualizados!`, { id: toastId });
+                      let job = result;
+                      while (job.status === 'queued' || job.status === 'running') {
+                        await new Promise(resolve => setTimeout(resolve, 1000));
+                        const statusResponse = await fetch(`${API_URL}/upload/${result.job_id}`, { headers });
+                        job = await statusResponse.json();
+                        if (!statusResponse.ok) {
+                          throw new Error(job.detail || 'Erro ao consultar importação');
+                        }
+                        toast.loading(`Importando produtos... ${job.rows_processed} linhas`, { id: toastId });
+                      }
+
+                      if (job.status === 'failed') {
+                        throw new Error(job.error || 'Erro na importação');
+                      }
+
+                      toast.success(`Importação: ${job.created} criados, ${job.updated} atualizados!`, { id: toastId });
+
+                      if (job.errors > 0) {
+                        // Relatório das linhas com erro (linha, nome, campo, motivo) para corrigir e reenviar
+                        const reportResponse = await fetch(`${API_URL}/upload/${result.job_id}/errors?format=csv`, { headers });
+                        if (reportResponse.ok) {
+                          const url = URL.createObjectURL(await reportResponse.blob());
+                          const link = document.createElement('a');
+                          link.href = url;
+                          link.download = `erros-importacao-${result.job_id}.csv`;
+                          link.click();
+                          URL.revokeObjectURL(url);
+                        }
+                        toast.error(`${job.errors} linhas com erro. Relatório baixado.`);
+                      }
                       fetchProducts();
                     } catch (error) {
                       console.error(error);